@@ -0,0 +1,89 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+class ConvexStubState:
+    """In-memory tables behind the Convex stand-in"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency  # simulated round trip per call, in seconds
+        self.users: Dict[str, Dict[str, Any]] = {}
+        self.applied_batches = 0
+        self.calls = 0
+
+    def upsert_user(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        now = time.time() * 1000
+        user = self.users.get(args["clerkId"])
+        if user is None:
+            user = self.users[args["clerkId"]] = {
+                "_id": f"user_{len(self.users) + 1}",
+                "clerkId": args["clerkId"],
+                "createdAt": now,
+            }
+        user.update({
+            "email": args["email"],
+            "firstName": args.get("firstName"),
+            "lastName": args.get("lastName"),
+            "imageUrl": args.get("imageUrl"),
+            "updatedAt": now,
+        })
+        return user
+
+    def list_users(self, pagination: Dict[str, Any]) -> Dict[str, Any]:
+        users: List[Dict[str, Any]] = list(self.users.values())
+        start = int(pagination.get("cursor") or 0)
+        end = start + int(pagination.get("numItems", 100))
+        return {"page": users[start:end], "isDone": end >= len(users), "continueCursor": str(end)}
+
+
+def create_convex_stub(latency: float = 0.0) -> FastAPI:
+    """ASGI app answering the Convex HTTP API calls the backend makes (users:* and projects:applyBatch)"""
+    app = FastAPI()
+    state = app.state.convex = ConvexStubState(latency)
+
+    queries = {
+        "users:getUserByClerkId": lambda args: state.users.get(args["clerkId"]),
+        "users:getAllUsers": lambda args: list(state.users.values()),
+        "users:listUsers": lambda args: state.list_users(args["paginationOpts"]),
+        "users:getUsersByClerkIds": lambda args: [state.users.get(clerk_id) for clerk_id in args["clerkIds"]],
+    }
+
+    def create_or_update_user(args: Dict[str, Any]) -> Any:
+        user = state.upsert_user(args)
+        return user if args.get("returnUser") else user["_id"]
+
+    def delete_user(args: Dict[str, Any]) -> Dict[str, bool]:
+        return {"success": state.users.pop(args["clerkId"], None) is not None}
+
+    def apply_batch(args: Dict[str, Any]) -> List[Dict[str, Any]]:
+        state.applied_batches += 1
+        return [{"projectId": batch["projectId"], "applied": True} for batch in args["batches"]]
+
+    mutations = {
+        "users:createOrUpdateUser": create_or_update_user,
+        "users:deleteUser": delete_user,
+        "projects:applyBatch": apply_batch,
+    }
+
+    async def call(request: Request, handlers: Dict[str, Any]) -> JSONResponse:
+        body = await request.json()
+        state.calls += 1
+        if state.latency:
+            await asyncio.sleep(state.latency)
+        handler: Optional[Any] = handlers.get(body.get("path"))
+        if handler is None:
+            return JSONResponse({"status": "error", "errorMessage": f"Unknown function {body.get('path')}"}, 400)
+        return JSONResponse({"status": "success", "value": handler(body.get("args", {}))})
+
+    @app.post("/api/query")
+    async def query(request: Request):
+        return await call(request, queries)
+
+    @app.post("/api/mutation")
+    async def mutation(request: Request):
+        return await call(request, mutations)
+
+    return app
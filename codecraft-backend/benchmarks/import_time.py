@@ -0,0 +1,78 @@
+"""Cold import time of the backend modules, measured in fresh interpreters
+
+Usage (from codecraft-backend/):
+    python benchmarks/import_time.py [--runs 10] [--module main] [--json] [--max-seconds 1.0]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that should only load once the AI model is actually called
+HEAVY_MODULES = ["google.generativeai"]
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def measure(module: str, runs: int) -> dict:
+    """Import `module` in `runs` fresh interpreters and summarize the timings"""
+    probe = _PROBE.format(module=module, heavy=HEAVY_MODULES)
+    # No API key, as on a cold start that only serves /health or user routes
+    env = {key: value for key, value in os.environ.items() if key != "GEMINI_API_KEY"}
+    timings = []
+    loaded = set()
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", probe], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        timings.append(result["seconds"])
+        loaded.update(result["loaded"])
+    return {
+        "module": module,
+        "runs": runs,
+        "median_seconds": round(statistics.median(timings), 4),
+        "min_seconds": round(min(timings), 4),
+        "max_seconds": round(max(timings), 4),
+        "heavy_modules_loaded": sorted(loaded),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--module", action="append", help="module to import (default: main)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--max-seconds", type=float, help="fail if a median import time exceeds this")
+    args = parser.parse_args()
+
+    results = [measure(module, args.runs) for module in args.module or ["main"]]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            print(
+                f"{result['module']}: median {result['median_seconds']:.3f}s "
+                f"(min {result['min_seconds']:.3f}s, max {result['max_seconds']:.3f}s, {result['runs']} runs)"
+            )
+            if result["heavy_modules_loaded"]:
+                print(f"  loaded at import: {', '.join(result['heavy_modules_loaded'])}")
+
+    failed = any(result["heavy_modules_loaded"] for result in results)
+    if args.max_seconds is not None:
+        failed = failed or any(result["median_seconds"] > args.max_seconds for result in results)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
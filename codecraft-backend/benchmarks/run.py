@@ -0,0 +1,337 @@
+"""Latency and throughput benchmarks for the backend API
+
+The app runs in-process behind an ASGI transport, with the fake AI backend and an in-process Convex
+stand-in, so results measure the backend itself and need no network or API quota.
+
+Usage (from codecraft-backend/):
+    python -m benchmarks.run [--scenario chat ...] [--sizes 10 100 500] [--concurrency 1 8 32]
+                             [--requests 100] [--output results.json] [--baseline baseline.json]
+"""
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Requests take (index, worker) and return (method, url, json body or None)
+RequestFactory = Callable[[int, int], Tuple[str, str, Optional[Dict[str, Any]]]]
+
+# Scenarios whose cost depends on the number of files in the project
+SIZED_SCENARIOS = ["chat", "files", "files_patch", "user_projects"]
+SCENARIOS = ["generate", "create", "user"] + SIZED_SCENARIOS
+
+
+def configure_environment(args: argparse.Namespace) -> None:
+    """Point the app at the fake AI backend; must run before main is imported"""
+    os.environ.pop("GEMINI_API_KEY", None)
+    os.environ["AI_BACKEND"] = "fake"
+    os.environ["AI_FAKE_LATENCY"] = str(args.ai_latency)
+    os.environ["AI_FAKE_CHUNK_INTERVAL"] = str(args.ai_chunk_interval)
+    os.environ["CONVEX_URL"] = "http://convex-stub"
+    os.environ["CONVEX_PROJECT_SYNC"] = "true" if args.convex_sync else "false"
+    # Every benchmark user gets its own AI queue, so concurrency is limited only by AI_MAX_IN_FLIGHT
+    os.environ.setdefault("AI_MAX_QUEUE_DEPTH", "1024")
+
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def make_file(index: int, count: int) -> Dict[str, str]:
+    """A component of typical size that imports the next one, so projects have an import graph"""
+    name = f"components/Component{index}.js"
+    next_import = f"import Component{index + 1} from './Component{index + 1}';\n" if index + 1 < count else ""
+    body = "\n".join(f"      <li key=\"{line}\">Item {line} of component {index}</li>" for line in range(30))
+    content = (
+        f"import React, {{ useState }} from 'react';\n{next_import}import './Component{index}.css';\n\n"
+        f"export default function Component{index}() {{\n  const [open, setOpen] = useState(false);\n"
+        f"  return (\n    <ul className=\"component-{index}\" onClick={{() => setOpen(!open)}}>\n{body}\n    </ul>\n  );\n}}\n"
+    )
+    return {"name": name, "content": content, "language": "javascript"}
+
+
+class Fixture:
+    """Users and projects seeded through the API before measuring"""
+
+    def __init__(self):
+        self.users: List[str] = []
+        self.projects: Dict[int, List[str]] = {}  # size -> project ids
+        self.owners: Dict[int, str] = {}  # size -> owning user
+
+
+async def seed(client, sizes: List[int], projects_per_size: int) -> Fixture:
+    fixture = Fixture()
+    for index in range(50):
+        clerk_id = f"bench-user-{index}"
+        response = await client.post("/api/users/register", json={"clerk_id": clerk_id, "email": f"{clerk_id}@example.com"})
+        response.raise_for_status()
+        fixture.users.append(clerk_id)
+
+    for size in sizes:
+        owner = fixture.owners[size] = f"bench-owner-{size}"
+        files = {}
+        for index in range(size):
+            file = make_file(index, size)
+            files[file["name"]] = file
+        files["App.js"] = {
+            "name": "App.js",
+            "content": "import Component0 from './components/Component0';\nexport default function App() {\n  return <Component0 />;\n}\n",
+            "language": "javascript",
+        }
+        ids = []
+        for _ in range(projects_per_size):
+            response = await client.post("/api/projects/create", json={"title": f"Bench {size}", "user_clerk_id": owner})
+            response.raise_for_status()
+            project_id = response.json()["id"]
+            (await client.put(f"/api/projects/{project_id}/files", json={"files": files}, params={"fields": "id"})).raise_for_status()
+            ids.append(project_id)
+        fixture.projects[size] = ids
+    return fixture
+
+
+def request_factory(scenario: str, fixture: Fixture, size: Optional[int]) -> RequestFactory:
+    """Requests for one scenario; workers get their own project so session locks don't serialize them"""
+    run_id = int(time.time() * 1000)
+
+    if scenario == "generate":
+        # Unique prompts, so every request misses the generation cache and reaches the model
+        return lambda i, worker: ("POST", "/api/projects/generate", {
+            "prompt": f"Build a todo app variant {run_id}-{i}", "user_clerk_id": f"bench-ai-{worker}",
+        })
+    if scenario == "create":
+        return lambda i, worker: ("POST", "/api/projects/create", {
+            "title": f"Created {i}", "user_clerk_id": f"bench-ai-{worker}",
+            "initial_prompt": f"Build a notes app variant {run_id}-{i}",
+        })
+    if scenario == "user":
+        return lambda i, worker: ("GET", f"/api/users/{fixture.users[i % len(fixture.users)]}", None)
+
+    projects = fixture.projects[size]
+    if scenario == "chat":
+        return lambda i, worker: ("POST", f"/api/projects/{projects[worker % len(projects)]}/chat", {
+            "message": f"Make Component{i % size}.js use a darker theme", "project_id": projects[worker % len(projects)],
+        })
+    if scenario == "files":
+        def save_all(i: int, worker: int):
+            files = {}
+            for index in range(size):
+                file = make_file(index, size)
+                files[file["name"]] = file
+            return "PUT", f"/api/projects/{projects[worker % len(projects)]}/files?fields=id,updated_at", {"files": files}
+        return save_all
+    if scenario == "files_patch":
+        return lambda i, worker: ("PATCH", f"/api/projects/{projects[worker % len(projects)]}/files", {
+            "operations": [{"op": "set", "path": f"components/Component{i % size}.js", "text": f"// edit {i}\n"}],
+        })
+    if scenario == "user_projects":
+        return lambda i, worker: ("GET", f"/api/projects/user/{fixture.owners[size]}", None)
+    raise ValueError(f"Unknown scenario: {scenario}")
+
+
+async def check_files_patch(client, fixture: Fixture, size: int) -> None:
+    """Make sure files_patch really rewrites the file, so it measures an edit and not a rejected request"""
+    from services.file_patch import content_hash
+
+    factory = request_factory("files_patch", fixture, size)
+    hashes = []
+    for i in range(2):
+        method, url, body = factory(i, 0)
+        response = await client.request(method, url, json=body)
+        response.raise_for_status()
+        operation = body["operations"][0]
+        file_hash = response.json()["file_hashes"][operation["path"]]
+        if file_hash != content_hash(operation["text"]):
+            raise RuntimeError(f"files_patch did not write the edit to {operation['path']}")
+        hashes.append(file_hash)
+    if hashes[0] == hashes[1]:
+        raise RuntimeError("files_patch edits did not change the file hash")
+
+
+async def measure(client, factory: RequestFactory, concurrency: int, total: int, warmup: int) -> Dict[str, Any]:
+    """Run `total` requests from `concurrency` workers and summarize latency and throughput"""
+    for i in range(warmup):
+        method, url, body = factory(i, 0)
+        await client.request(method, url, json=body)
+
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    counter = itertools.count()
+
+    async def worker(worker_id: int) -> None:
+        while True:
+            i = next(counter)
+            if i >= total:
+                return
+            method, url, body = factory(warmup + i, worker_id)
+            start = time.perf_counter()
+            response = await client.request(method, url, json=body)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors[str(response.status_code)] = errors.get(str(response.status_code), 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(worker_id) for worker_id in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "throughput_rps": round(total / elapsed, 2),
+    }
+
+
+async def run_suite(args: argparse.Namespace) -> Dict[str, Any]:
+    import httpx
+    import main
+    from benchmarks.convex_stub import create_convex_stub
+    from endpoints import projects
+    from endpoints.user_endpoints import user_service
+
+    convex = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=create_convex_stub(args.convex_latency)), base_url="http://convex-stub"
+    )
+    user_service.client = convex
+    if projects.convex_writer is not None:
+        projects.convex_writer.client = convex
+
+    scenarios = args.scenario or SCENARIOS
+    results = []
+    # Sampled request logs go to stdout; keep them out of the terminal and the results
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        async with main.lifespan(main.app):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+                sized = [scenario for scenario in scenarios if scenario in SIZED_SCENARIOS]
+                fixture = await seed(client, args.sizes if sized else [], max(args.concurrency))
+
+                for scenario in scenarios:
+                    for size in (args.sizes if scenario in SIZED_SCENARIOS else [None]):
+                        if scenario == "files_patch":
+                            await check_files_patch(client, fixture, size)
+                        for concurrency in args.concurrency:
+                            factory = request_factory(scenario, fixture, size)
+                            result = await measure(client, factory, concurrency, args.requests, args.warmup)
+                            result.update({"scenario": scenario, "files": size, "concurrency": concurrency})
+                            results.append(result)
+                            print(format_result(result), file=sys.stderr)
+
+    return {"meta": environment_info(args), "results": results}
+
+
+def environment_info(args: argparse.Namespace) -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "project_store": os.getenv("PROJECT_STORE", "memory"),
+        "ai_latency": args.ai_latency,
+        "ai_chunk_interval": args.ai_chunk_interval,
+        "convex_latency": args.convex_latency,
+        "convex_sync": args.convex_sync,
+        "requests_per_case": args.requests,
+    }
+
+
+def case_key(result: Dict[str, Any]) -> Tuple[str, Optional[int], int]:
+    return result["scenario"], result["files"], result["concurrency"]
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], threshold: float) -> List[Dict[str, Any]]:
+    """Per-case change against a baseline; a case regresses if p95 rises or throughput falls by more than threshold"""
+    previous = {case_key(result): result for result in baseline}
+    comparisons = []
+    for result in results:
+        before = previous.get(case_key(result))
+        if before is None:
+            continue
+        p95_change = result["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0.0
+        throughput_change = result["throughput_rps"] / before["throughput_rps"] - 1 if before["throughput_rps"] else 0.0
+        comparisons.append({
+            "scenario": result["scenario"],
+            "files": result["files"],
+            "concurrency": result["concurrency"],
+            "p95_change": round(p95_change, 4),
+            "throughput_change": round(throughput_change, 4),
+            "regression": p95_change > threshold or throughput_change < -threshold,
+        })
+    return comparisons
+
+
+def format_result(result: Dict[str, Any]) -> str:
+    files = f"{result['files']} files" if result["files"] is not None else "-"
+    errors = f"  errors {result['errors']}" if result["errors"] else ""
+    return (
+        f"{result['scenario']:<14} {files:>10}  c={result['concurrency']:<3} "
+        f"p50 {result['p50_ms']:>9.2f}ms  p95 {result['p95_ms']:>9.2f}ms  p99 {result['p99_ms']:>9.2f}ms  "
+        f"{result['throughput_rps']:>9.1f} req/s{errors}"
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="scenario to run (default: all)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500], help="files per project")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=100, help="measured requests per case")
+    parser.add_argument("--warmup", type=int, default=5, help="unmeasured requests per case")
+    parser.add_argument("--ai-latency", type=float, default=0.05, help="fake model seconds to first chunk")
+    parser.add_argument("--ai-chunk-interval", type=float, default=0.0, help="fake model seconds between chunks")
+    parser.add_argument("--convex-latency", type=float, default=0.005, help="Convex stand-in seconds per call")
+    parser.add_argument("--convex-sync", action="store_true", help="mirror project writes to the Convex stand-in")
+    parser.add_argument("--output", help="write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative change counted as a regression")
+    args = parser.parse_args()
+
+    configure_environment(args)
+    report = asyncio.run(run_suite(args))
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+        report["comparison"] = compare(report["results"], baseline["results"], args.threshold)
+        regressions = [item for item in report["comparison"] if item["regression"]]
+        for item in regressions:
+            print(
+                f"REGRESSION {item['scenario']} files={item['files']} c={item['concurrency']}: "
+                f"p95 {item['p95_change']:+.1%}, throughput {item['throughput_change']:+.1%}",
+                file=sys.stderr,
+            )
+        exit_code = 1 if regressions else 0
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(output + "\n")
+    else:
+        print(output)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from fastapi.responses import JSONResponse
+from typing import Any, Dict, List, Optional
+from services.profiler import RequestProfiler
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+
+# Shared profiler; ProfilingMiddleware in main.py records into it
+profiler = RequestProfiler()
+
+def _check_token(token: Optional[str]) -> None:
+    if not profiler.token:
+        # Profile endpoints are disabled until PROFILE_TOKEN is configured
+        raise HTTPException(status_code=404, detail="Not found")
+    if not profiler.authorized(token):
+        raise HTTPException(status_code=403, detail="Invalid profile token")
+
+@router.get("/profiles")
+async def list_profiles(x_profile_token: Optional[str] = Header(None)) -> List[Dict[str, Any]]:
+    """List buffered request profiles, newest first"""
+    _check_token(x_profile_token)
+    return profiler.list()
+
+@router.get("/profiles/{profile_id}")
+async def download_profile(
+    profile_id: str,
+    format: str = Query("speedscope", pattern="^(speedscope|pstats)$"),
+    x_profile_token: Optional[str] = Header(None)
+):
+    """Download a profile as a speedscope JSON file or a pstats file"""
+    _check_token(x_profile_token)
+    profile = profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    if format == "pstats":
+        return Response(
+            profile.to_pstats(),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="{profile_id}.prof"'}
+        )
+    return JSONResponse(
+        profile.to_speedscope(),
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.speedscope.json"'}
+    )
@@ -0,0 +1,57 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+import json
+from models.job import JobResponse
+from services.job_queue import Job, JobQueue
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+# Shared worker pool for background work (e.g. POST /api/projects/create?background=true)
+job_queue = JobQueue()
+
+# Seconds between SSE keepalive comments while a job is unchanged
+SSE_KEEPALIVE_INTERVAL = 15.0
+
+def _get_job(job_id: str) -> Job:
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    """Get the status of a background job, with its result once it succeeded"""
+    return _get_job(job_id).to_dict()
+
+@router.get("/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Stream job status changes as server-sent events until the job finishes"""
+    job = _get_job(job_id)
+
+    async def sse_events():
+        sent = None
+        while True:
+            if job.status != sent:
+                sent = job.status
+                yield f"event: {job.status}\ndata: {json.dumps(job.to_dict())}\n\n"
+                if job.finished:
+                    return
+                continue
+            if not await job.wait_for_change(SSE_KEEPALIVE_INTERVAL):
+                # Keep proxies from closing an idle connection
+                yield ": keepalive\n\n"
+
+    return StreamingResponse(
+        sse_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.delete("/{job_id}", response_model=JobResponse)
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job"""
+    job = _get_job(job_id)
+    if job.finished:
+        raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+    job_queue.cancel(job_id)
+    return job.to_dict()
@@ -1,214 +1,665 @@
-from fastapi import APIRouter, HTTPException
-from typing import List, Dict, Any
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import List, Dict, Any, Optional, Tuple
+import json
 import uuid
 from datetime import datetime
 
 from models.project import (
-    ProjectCreate, ProjectUpdate, ProjectResponse,
+    ProjectCreate, ProjectUpdate, ProjectResponse, ProjectSummary, ProjectSummaryPage,
+    ProjectFilesPatch, ProjectFilesPatchResponse,
     GenerateCodeRequest, GenerateCodeResponse,
-    ChatRequest, ChatResponse, ProjectFile, ChatMessage
+    ChatRequest, ChatResponse, ChatHistoryPage, ProjectFile, ChatMessage,
+    ProjectVersion, ProjectDiffResponse
 )
 from services.project_service import ProjectService
+from services.ai_scheduler import SchedulerBusyError
+from services.project_store import RevisionConflictError, create_project_store
+from services.file_patch import PatchError, apply_replace_range, apply_unified_diff, content_hash, make_unified_diff
+from services.convex_writer import create_convex_writer
+from services.job_queue import JobQueueFullError
+from endpoints.jobs import job_queue
 
 router = APIRouter(prefix="/api/projects", tags=["projects"])
 project_service = ProjectService()
 
-# In-memory storage for demo (replace with Convex DB integration)
-projects_db: Dict[str, Dict[str, Any]] = {}
+# Project persistence, selected with PROJECT_STORE (memory or sqlite)
+project_store = create_project_store()
+
+# Optional write-behind mirror of chat and file changes to Convex (CONVEX_PROJECT_SYNC=true)
+convex_writer = create_convex_writer()
+
+def _mirror_to_convex(project_id: str, user_clerk_id: str, **changes) -> None:
+    """Queue project writes for the Convex mirror without waiting for them to be flushed"""
+    if convex_writer is not None and not convex_writer.closed:
+        convex_writer.enqueue(project_id, user_clerk_id, **changes)
+
+def _busy_exception(error: SchedulerBusyError) -> HTTPException:
+    """Map a scheduler rejection to a retryable HTTP error"""
+    return HTTPException(status_code=error.status_code, detail=str(error), headers={"Retry-After": "1"})
+
+async def _chat_history_for(project_id: Optional[str]) -> List[Dict[str, Any]]:
+    """Stored chat history of a project, or an empty list for standalone generations"""
+    if not project_id:
+        return []
+    project_data = await project_store.get_project(project_id)
+    return project_data["chat_history"] if project_data else []
+
+# Fields of ProjectResponse, in response order
+PROJECT_FIELDS = (
+    "id", "title", "description", "template", "files", "chat_history",
+    "user_clerk_id", "created_at", "updated_at"
+)
+# Potentially large fields, only returned when selected
+DETAIL_FIELDS = ("files", "chat_history")
+
+def _select_fields(fields: Optional[str], include: Optional[str]) -> Tuple[str, ...]:
+    """Resolve the fields=/include= query parameters into the project fields to return
+
+    Without either parameter the whole project is returned. `fields` picks an exact
+    set of fields; `include` adds detail fields to the metadata (or to `fields`).
+    """
+    if fields is None and include is None:
+        return PROJECT_FIELDS
+    
+    if fields is not None:
+        selected = {name.strip() for name in fields.split(",") if name.strip()}
+    else:
+        selected = {name for name in PROJECT_FIELDS if name not in DETAIL_FIELDS}
+    if include:
+        selected |= {name.strip() for name in include.split(",") if name.strip()}
+    
+    unknown = selected - set(PROJECT_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown project fields: {', '.join(sorted(unknown))}")
+    
+    return tuple(name for name in PROJECT_FIELDS if name in selected)
+
+def _project_etag(revision: int) -> str:
+    """ETag for a project revision"""
+    return f'"{revision}"'
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    """True if an If-None-Match header lists the ETag (or *)"""
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
+def _if_match_revision(if_match: Optional[str]) -> Optional[int]:
+    """Project revision required by an If-Match header (None when absent or *)"""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    tag = if_match.split(",")[0].strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    try:
+        return int(tag.strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=412, detail="If-Match does not name a project revision")
+
+def _conflict_exception(error: RevisionConflictError) -> HTTPException:
+    """Map a failed conditional write to 412 with the current ETag"""
+    return HTTPException(
+        status_code=412, detail=str(error), headers={"ETag": _project_etag(error.current_revision)}
+    )
+
+def _serialize_file(file_data: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON body of a stored file"""
+    return {"name": file_data["name"], "content": file_data["content"], "language": file_data["language"]}
+
+def _serialize_message(msg_data: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON body of a stored chat message"""
+    return {
+        "id": msg_data["id"],
+        "content": msg_data["content"],
+        "sender": msg_data["sender"],
+        "timestamp": msg_data["timestamp"].isoformat()
+    }
+
+def _serialize_project(project_data: Dict[str, Any], selected: Tuple[str, ...] = PROJECT_FIELDS) -> Dict[str, Any]:
+    """Build the JSON body for the selected fields straight from stored data
+
+    Stored data was validated on write, so reads skip the ProjectFile/ChatMessage
+    round trip and only touch the fields the client asked for.
+    """
+    body = {}
+    for name in selected:
+        value = project_data[name]
+        if name == "files":
+            value = {path: _serialize_file(file_data) for path, file_data in value.items()}
+        elif name == "chat_history":
+            value = [_serialize_message(msg_data) for msg_data in value]
+        elif name == "created_at" or name == "updated_at":
+            value = value.isoformat()
+        body[name] = value
+    return body
 
 @router.post("/generate", response_model=GenerateCodeResponse)
 async def generate_code(request: GenerateCodeRequest):
     """Generate code based on user prompt"""
     try:
-        response = await project_service.generate_code(request)
+        chat_history = await _chat_history_for(request.project_id)
+        response = await project_service.generate_code(request, chat_history)
         return response
+    except SchedulerBusyError as e:
+        raise _busy_exception(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/generate/stream")
+async def generate_code_stream(request: GenerateCodeRequest):
+    """Generate code and stream each field and file as NDJSON as soon as it is complete"""
+    chat_history = await _chat_history_for(request.project_id)
+    events = project_service.generate_code_stream(request, chat_history)
+    
+    # Wait for the scheduler to admit the request so rejections still get a proper status code
+    try:
+        first_event = await events.__anext__()
+    except SchedulerBusyError as e:
+        raise _busy_exception(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    async def ndjson_lines():
+        yield json.dumps(first_event) + "\n"
+        try:
+            async for event in events:
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            yield json.dumps({"event": "error", "detail": str(e)}) + "\n"
+    
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Hit/miss counters for the generation cache"""
+    return {**project_service.cache.stats(), "single_flight": project_service.flights.stats()}
+
 @router.post("/create", response_model=ProjectResponse)
-async def create_project(request: ProjectCreate):
-    """Create a new project"""
+async def create_project(request: ProjectCreate, background: bool = Query(False)):
+    """Create a new project
+
+    With background=true the project is created by a background job: the response is 202 with
+    the job (see /api/jobs/{job_id}), whose result is the project once it succeeded.
+    """
     try:
-        project_id = str(uuid.uuid4())
+        if background:
+            job = await job_queue.submit(
+                "project.create", lambda: _create_project(request), owner=request.user_clerk_id
+            )
+            return JSONResponse(job.to_dict(), status_code=202, headers={"Location": f"/api/jobs/{job.id}"})
         
-        # Generate initial code if prompt provided
-        initial_files = {}
-        initial_chat = []
+        return JSONResponse(await _create_project(request))
         
-        if request.initial_prompt:
-            # Generate code based on initial prompt
-            gen_request = GenerateCodeRequest(
-                prompt=request.initial_prompt,
-                template=request.template
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": "1"})
+    except SchedulerBusyError as e:
+        raise _busy_exception(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _create_project(request: ProjectCreate) -> Dict[str, Any]:
+    """Generate (if there is an initial prompt) and store a new project; returns its JSON body"""
+    project_id = str(uuid.uuid4())
+    
+    # Generate initial code if prompt provided
+    initial_files = {}
+    initial_chat = []
+    
+    if request.initial_prompt:
+        # Generate code based on initial prompt
+        gen_request = GenerateCodeRequest(
+            prompt=request.initial_prompt,
+            project_id=project_id,
+            template=request.template,
+            user_clerk_id=request.user_clerk_id,
+            bypass_cache=request.bypass_cache,
+            mode=request.generation_mode
+        )
+        gen_response = await project_service.generate_code(gen_request)
+        
+        # Convert generated files to ProjectFile objects
+        initial_files = project_service.convert_ai_files_to_project_files(gen_response.files)
+        
+        # Add initial chat messages
+        initial_chat = [
+            ChatMessage(
+                id=str(uuid.uuid4()),
+                content=request.initial_prompt,
+                sender="user",
+                timestamp=datetime.now()
+            ),
+            ChatMessage(
+                id=str(uuid.uuid4()),
+                content=gen_response.explanation,
+                sender="ai",
+                timestamp=datetime.now()
             )
-            gen_response = await project_service.generate_code(gen_request)
-            
-            # Convert generated files to ProjectFile objects
-            initial_files = project_service.convert_ai_files_to_project_files(gen_response.files)
-            
-            # Add initial chat messages
-            initial_chat = [
-                ChatMessage(
-                    id=str(uuid.uuid4()),
-                    content=request.initial_prompt,
-                    sender="user",
-                    timestamp=datetime.now()
+        ]
+    else:
+        # Create default files for the template
+        if request.template == "react":
+            initial_files = {
+                "App.js": ProjectFile(
+                    name="App.js",
+                    content="export default function App() {\n  return <div>Hello World</div>;\n}",
+                    language="javascript"
                 ),
-                ChatMessage(
-                    id=str(uuid.uuid4()),
-                    content=gen_response.explanation,
-                    sender="ai",
-                    timestamp=datetime.now()
+                "index.js": ProjectFile(
+                    name="index.js",
+                    content="import React from 'react';\nimport ReactDOM from 'react-dom/client';\nimport App from './App';\n\nconst root = ReactDOM.createRoot(document.getElementById('root'));\nroot.render(<App />);",
+                    language="javascript"
                 )
-            ]
-        else:
-            # Create default files for the template
-            if request.template == "react":
-                initial_files = {
-                    "App.js": ProjectFile(
-                        name="App.js",
-                        content="export default function App() {\n  return <div>Hello World</div>;\n}",
-                        language="javascript"
-                    ),
-                    "index.js": ProjectFile(
-                        name="index.js",
-                        content="import React from 'react';\nimport ReactDOM from 'react-dom/client';\nimport App from './App';\n\nconst root = ReactDOM.createRoot(document.getElementById('root'));\nroot.render(<App />);",
-                        language="javascript"
-                    )
-                }
-        
-        # Create project
-        project_data = {
-            "id": project_id,
-            "title": request.title,
-            "description": request.description,
-            "template": request.template,
-            "files": {name: file.dict() for name, file in initial_files.items()},
-            "chat_history": [msg.dict() for msg in initial_chat],
-            "user_clerk_id": request.user_clerk_id,
-            "created_at": datetime.now(),
-            "updated_at": datetime.now()
-        }
+            }
+    
+    # Create project
+    project_data = {
+        "id": project_id,
+        "title": request.title,
+        "description": request.description,
+        "template": request.template,
+        "files": {name: file.dict() for name, file in initial_files.items()},
+        "chat_history": [msg.dict() for msg in initial_chat],
+        "user_clerk_id": request.user_clerk_id,
+        "created_at": datetime.now(),
+        "updated_at": datetime.now()
+    }
+    
+    await project_store.create_project(project_data)
+    _mirror_to_convex(
+        project_id, request.user_clerk_id,
+        title=request.title, files=project_data["files"], messages=project_data["chat_history"]
+    )
+    
+    return _serialize_project(project_data)
+
+@router.get("/user/{user_clerk_id}", response_model=List[ProjectResponse])
+async def get_user_projects(
+    user_clerk_id: str,
+    fields: Optional[str] = None,
+    include: Optional[str] = None
+):
+    """Get all projects for a user"""
+    selected = _select_fields(fields, include)
+    try:
+        user_projects = await project_store.list_user_projects(
+            user_clerk_id, include_files="files" in selected, include_chat="chat_history" in selected
+        )
+        return JSONResponse([_serialize_project(project_data, selected) for project_data in user_projects])
         
-        projects_db[project_id] = project_data
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/user/{user_clerk_id}/summaries", response_model=ProjectSummaryPage)
+async def get_user_project_summaries(
+    user_clerk_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None
+):
+    """Get one page of a user's projects, most recently updated first, without files or chat"""
+    try:
+        summaries, next_cursor = await project_store.list_user_project_summaries(user_clerk_id, limit, cursor)
+        return ProjectSummaryPage(
+            items=[ProjectSummary(**summary) for summary in summaries],
+            next_cursor=next_cursor
+        )
         
-        return ProjectResponse(
-            id=project_id,
-            title=request.title,
-            description=request.description,
-            template=request.template,
-            files=initial_files,
-            chat_history=initial_chat,
-            user_clerk_id=request.user_clerk_id,
-            created_at=project_data["created_at"],
-            updated_at=project_data["updated_at"]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{project_id}", response_model=ProjectResponse)
+async def get_project(
+    project_id: str,
+    fields: Optional[str] = None,
+    include: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None)
+):
+    """Get a specific project, optionally limited to selected fields"""
+    selected = _select_fields(fields, include)
+    try:
+        # Answer revalidation from metadata alone when the client's copy is current
+        if if_none_match:
+            project_meta = await project_store.get_project(project_id, include_files=False, include_chat=False)
+            if project_meta is None:
+                raise HTTPException(status_code=404, detail="Project not found")
+            etag = _project_etag(project_meta["revision"])
+            if _etag_matches(if_none_match, etag):
+                return Response(status_code=304, headers={"ETag": etag})
+        
+        project_data = await project_store.get_project(
+            project_id, include_files="files" in selected, include_chat="chat_history" in selected
+        )
+        if project_data is None:
+            raise HTTPException(status_code=404, detail="Project not found")
+        
+        return JSONResponse(
+            _serialize_project(project_data, selected),
+            headers={"ETag": _project_etag(project_data["revision"])}
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/user/{user_clerk_id}", response_model=List[ProjectResponse])
-async def get_user_projects(user_clerk_id: str):
-    """Get all projects for a user"""
+@router.get("/{project_id}/files/{file_path:path}", response_model=ProjectFile)
+async def get_project_file(project_id: str, file_path: str, if_none_match: Optional[str] = Header(None)):
+    """Get a single project file"""
     try:
-        user_projects = []
-        for project_data in projects_db.values():
-            if project_data["user_clerk_id"] == user_clerk_id:
-                # Convert stored data back to response format
-                files = {}
-                for name, file_data in project_data["files"].items():
-                    files[name] = ProjectFile(**file_data)
-                
-                chat_history = []
-                for msg_data in project_data["chat_history"]:
-                    chat_history.append(ChatMessage(**msg_data))
-                
-                user_projects.append(ProjectResponse(
-                    id=project_data["id"],
-                    title=project_data["title"],
-                    description=project_data["description"],
-                    template=project_data["template"],
-                    files=files,
-                    chat_history=chat_history,
-                    user_clerk_id=project_data["user_clerk_id"],
-                    created_at=project_data["created_at"],
-                    updated_at=project_data["updated_at"]
-                ))
-        
-        return user_projects
+        file_data = await project_store.get_file(project_id, file_path)
+        if file_data is None:
+            raise HTTPException(status_code=404, detail="File not found")
         
+        etag = f'"{file_data.hash}"'
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        
+        return JSONResponse(_serialize_file(file_data), headers={"ETag": etag})
+        
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/{project_id}", response_model=ProjectResponse)
-async def get_project(project_id: str):
-    """Get a specific project"""
+@router.get("/{project_id}/chat", response_model=ChatHistoryPage)
+async def get_chat_history(
+    project_id: str,
+    limit: int = Query(50, ge=1, le=500),
+    before: Optional[int] = Query(None, ge=0)
+):
+    """Get a page of chat history, newest page first; pass next_before to go further back"""
     try:
-        if project_id not in projects_db:
+        page = await project_store.get_chat_page(project_id, limit, before)
+        if page is None:
             raise HTTPException(status_code=404, detail="Project not found")
         
-        project_data = projects_db[project_id]
+        messages, total = page
+        end = total if before is None else min(before, total)
+        start = end - len(messages)
         
-        # Convert stored data back to response format
-        files = {}
-        for name, file_data in project_data["files"].items():
-            files[name] = ProjectFile(**file_data)
-        
-        chat_history = []
-        for msg_data in project_data["chat_history"]:
-            chat_history.append(ChatMessage(**msg_data))
-        
-        return ProjectResponse(
-            id=project_data["id"],
-            title=project_data["title"],
-            description=project_data["description"],
-            template=project_data["template"],
-            files=files,
-            chat_history=chat_history,
-            user_clerk_id=project_data["user_clerk_id"],
-            created_at=project_data["created_at"],
-            updated_at=project_data["updated_at"]
+        return JSONResponse({
+            "messages": [_serialize_message(msg_data) for msg_data in messages],
+            "total": total,
+            "next_before": start if start > 0 else None
+        })
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{project_id}/versions", response_model=List[ProjectVersion])
+async def list_project_versions(project_id: str):
+    """List the retained versions of a project's files, newest first"""
+    try:
+        versions = await project_store.list_versions(project_id)
+        if versions is None:
+            raise HTTPException(status_code=404, detail="Project not found")
+        
+        return JSONResponse([
+            {**version, "created_at": version["created_at"].isoformat()} for version in versions
+        ])
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{project_id}/versions/diff", response_model=ProjectDiffResponse)
+async def diff_project_versions(
+    project_id: str,
+    from_version: int = Query(..., alias="from"),
+    to_version: Optional[int] = Query(None, alias="to"),
+    context: int = Query(3, ge=0, le=100)
+):
+    """Unified diffs of the files that differ between two versions (`to` defaults to the current files)"""
+    try:
+        old_files = await project_store.get_version_files(project_id, from_version)
+        if old_files is None:
+            raise HTTPException(status_code=404, detail=f"Version {from_version} not found")
+        
+        if to_version is None:
+            project_data = await project_store.get_project(project_id, include_chat=False)
+            if project_data is None:
+                raise HTTPException(status_code=404, detail="Project not found")
+            new_files = project_data["files"]
+        else:
+            new_files = await project_store.get_version_files(project_id, to_version)
+            if new_files is None:
+                raise HTTPException(status_code=404, detail=f"Version {to_version} not found")
+        
+        diffs = []
+        for path in sorted(set(old_files) | set(new_files)):
+            old, new = old_files.get(path), new_files.get(path)
+            if old is not None and new is not None and old.hash == new.hash:
+                continue
+            status = "added" if old is None else "deleted" if new is None else "modified"
+            diffs.append({
+                "path": path,
+                "status": status,
+                "diff": make_unified_diff(old.content if old else "", new.content if new else "", path, context)
+            })
+        
+        return JSONResponse({"from_version": from_version, "to_version": to_version, "files": diffs})
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{project_id}/versions/{version}/files/{file_path:path}", response_model=ProjectFile)
+async def get_project_file_version(project_id: str, version: int, file_path: str):
+    """Get a single file as it was at a version"""
+    try:
+        files = await project_store.get_version_files(project_id, version, [file_path])
+        if files is None:
+            raise HTTPException(status_code=404, detail="Version not found")
+        if file_path not in files:
+            raise HTTPException(status_code=404, detail="File not found")
+        
+        file_data = files[file_path]
+        return JSONResponse(
+            _serialize_file(file_data),
+            headers={"ETag": f'"{file_data.hash}"', "Cache-Control": "private, max-age=31536000, immutable"}
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/{project_id}/versions/{version}/restore", response_model=ProjectFilesPatchResponse)
+async def restore_project_version(project_id: str, version: int, if_match: Optional[str] = Header(None)):
+    """Make a version's files the current files; this is recorded as a new version"""
+    try:
+        target_files = await project_store.get_version_files(project_id, version)
+        if target_files is None:
+            raise HTTPException(status_code=404, detail="Version not found")
+        
+        project_data = await project_store.get_project(project_id, include_chat=False)
+        if project_data is None:
+            raise HTTPException(status_code=404, detail="Project not found")
+        expected_revision = _if_match_revision(if_match)
+        if expected_revision is None:
+            expected_revision = project_data["revision"]
+        elif expected_revision != project_data["revision"]:
+            raise RevisionConflictError(project_data["revision"])
+        
+        current_files = project_data["files"]
+        files = {
+            path: _serialize_file(file_data) for path, file_data in target_files.items()
+            if path not in current_files or current_files[path].hash != file_data.hash
+            or current_files[path].language != file_data.language
+        }
+        deleted_files = [path for path in current_files if path not in target_files]
+        if not files and not deleted_files:
+            # Already at that state
+            return JSONResponse(
+                {
+                    "revision": project_data["revision"],
+                    "updated_at": project_data["updated_at"].isoformat(),
+                    "file_hashes": {}
+                },
+                headers={"ETag": _project_etag(project_data["revision"])}
+            )
+        
+        updated_at = datetime.now()
+        revision = await project_store.apply_changes(
+            project_id, updated_at, files=files, deleted_files=deleted_files,
+            expected_revision=expected_revision, source="restore"
+        )
+        if revision is None:
+            raise HTTPException(status_code=404, detail="Project not found")
+        project_service.context_builder.note_changed(project_id, list(files) + deleted_files)
+        _mirror_to_convex(project_id, project_data["user_clerk_id"], files=files, deleted_files=deleted_files)
+        
+        file_hashes = {path: target_files[path].hash for path in files}
+        file_hashes.update({path: None for path in deleted_files})
+        return JSONResponse(
+            {"revision": revision, "updated_at": updated_at.isoformat(), "file_hashes": file_hashes},
+            headers={"ETag": _project_etag(revision)}
         )
         
+    except HTTPException:
+        raise
+    except RevisionConflictError as e:
+        raise _conflict_exception(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put("/{project_id}/files", response_model=ProjectResponse)
-async def update_project_files(project_id: str, request: ProjectUpdate):
+async def update_project_files(
+    project_id: str,
+    request: ProjectUpdate,
+    fields: Optional[str] = None,
+    include: Optional[str] = None,
+    if_match: Optional[str] = Header(None)
+):
     """Update project files"""
+    selected = _select_fields(fields, include)
     try:
-        if project_id not in projects_db:
+        # Update files
+        files = {name: file.dict() for name, file in request.files.items()}
+        revision = await project_store.apply_changes(
+            project_id, datetime.now(), files=files, expected_revision=_if_match_revision(if_match)
+        )
+        if revision is None:
             raise HTTPException(status_code=404, detail="Project not found")
+        project_service.context_builder.note_changed(project_id, list(files))
         
-        project_data = projects_db[project_id]
+        project_data = await project_store.get_project(
+            project_id, include_files="files" in selected, include_chat="chat_history" in selected
+        )
+        if project_data is None:
+            # Deleted between the write and the read
+            raise HTTPException(status_code=404, detail="Project not found")
+        _mirror_to_convex(project_id, project_data["user_clerk_id"], files=files)
+        return JSONResponse(
+            _serialize_project(project_data, selected),
+            headers={"ETag": _project_etag(project_data["revision"])}
+        )
         
-        # Update files
-        for name, file in request.files.items():
-            project_data["files"][name] = file.dict()
+    except HTTPException:
+        raise
+    except RevisionConflictError as e:
+        raise _conflict_exception(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.patch("/{project_id}/files", response_model=ProjectFilesPatchResponse)
+async def patch_project_files(
+    project_id: str,
+    request: ProjectFilesPatch,
+    if_match: Optional[str] = Header(None)
+):
+    """Apply edits to individual files and return only the touched files' new hashes"""
+    try:
+        project_meta = await project_store.get_project(project_id, include_files=False, include_chat=False)
+        if project_meta is None:
+            raise HTTPException(status_code=404, detail="Project not found")
+        
+        expected_revision = _if_match_revision(if_match)
+        if expected_revision is None:
+            expected_revision = project_meta["revision"]
+        elif expected_revision != project_meta["revision"]:
+            raise RevisionConflictError(project_meta["revision"])
+        
+        # Only the files being edited are loaded
+        paths = list(dict.fromkeys(operation.path for operation in request.operations))
+        current_files = await project_store.get_files(project_id, paths)
+        contents = {path: file_data["content"] for path, file_data in current_files.items()}
+        languages = {}
         
-        project_data["updated_at"] = datetime.now()
+        for operation in request.operations:
+            path = operation.path
+            existing = contents.get(path)
+            
+            if operation.base_hash is not None and (existing is None or content_hash(existing) != operation.base_hash):
+                raise HTTPException(status_code=409, detail=f"File {path} has changed")
+            
+            if operation.op == "set":
+                contents[path] = operation.text
+            elif operation.op == "delete":
+                if existing is None:
+                    raise HTTPException(status_code=404, detail=f"File not found: {path}")
+                contents[path] = None
+            elif operation.op == "replace_range":
+                if existing is None:
+                    raise HTTPException(status_code=404, detail=f"File not found: {path}")
+                end = operation.end if operation.end is not None else operation.start
+                contents[path] = apply_replace_range(existing, operation.start, end, operation.text)
+            elif operation.op == "unified_diff":
+                contents[path] = apply_unified_diff(existing or "", operation.diff)
+            
+            if operation.language:
+                languages[path] = operation.language
         
-        # Convert back to response format
         files = {}
-        for name, file_data in project_data["files"].items():
-            files[name] = ProjectFile(**file_data)
-        
-        chat_history = []
-        for msg_data in project_data["chat_history"]:
-            chat_history.append(ChatMessage(**msg_data))
-        
-        return ProjectResponse(
-            id=project_data["id"],
-            title=project_data["title"],
-            description=project_data["description"],
-            template=project_data["template"],
-            files=files,
-            chat_history=chat_history,
-            user_clerk_id=project_data["user_clerk_id"],
-            created_at=project_data["created_at"],
-            updated_at=project_data["updated_at"]
+        deleted_files = []
+        for path in paths:
+            content = contents.get(path)
+            if content is None:
+                if path in current_files:
+                    deleted_files.append(path)
+                continue
+            language = languages.get(path) or (
+                current_files[path]["language"] if path in current_files
+                else project_service._get_language_from_filename(path)
+            )
+            files[path] = {"name": path, "content": content, "language": language}
+        
+        updated_at = datetime.now()
+        revision = await project_store.apply_changes(
+            project_id, updated_at, files=files, deleted_files=deleted_files, expected_revision=expected_revision,
+            source="patch"
+        )
+        if revision is None:
+            raise HTTPException(status_code=404, detail="Project not found")
+        project_service.context_builder.note_changed(project_id, list(files))
+        _mirror_to_convex(project_id, project_meta["user_clerk_id"], files=files, deleted_files=deleted_files)
+        
+        file_hashes = {path: content_hash(file_data["content"]) for path, file_data in files.items()}
+        file_hashes.update({path: None for path in deleted_files})
+        
+        return JSONResponse(
+            {"revision": revision, "updated_at": updated_at.isoformat(), "file_hashes": file_hashes},
+            headers={"ETag": _project_etag(revision)}
         )
         
+    except HTTPException:
+        raise
+    except RevisionConflictError as e:
+        raise _conflict_exception(e)
+    except PatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -216,46 +667,57 @@ async def update_project_files(project_id: str, request: ProjectUpdate):
 async def chat_with_project(project_id: str, request: ChatRequest):
     """Chat about a project and potentially update files"""
     try:
-        if project_id not in projects_db:
-            raise HTTPException(status_code=404, detail="Project not found")
-        
-        project_data = projects_db[project_id]
-        
-        # Convert current files to ProjectFile objects
-        current_files = {}
-        for name, file_data in project_data["files"].items():
-            current_files[name] = ProjectFile(**file_data)
+        if request.project_id != project_id:
+            raise HTTPException(status_code=400, detail="project_id in the body does not match the URL")
         
-        # Chat with AI
-        chat_response = await project_service.chat_with_ai(request, current_files)
+        project_data = await project_store.get_project(project_id)
+        if project_data is None:
+            raise HTTPException(status_code=404, detail="Project not found")
         
-        # Add user message to chat history
+        # Timestamp the user message on arrival so history stays chronological
         user_message = ChatMessage(
             id=str(uuid.uuid4()),
             content=request.message,
             sender="user",
             timestamp=datetime.now()
         )
-        project_data["chat_history"].append(user_message.dict())
         
-        # Add AI response to chat history
+        # Chat with AI
+        # Stored file records read like ProjectFile, so they are passed as they are
+        chat_response = await project_service.chat_with_ai(
+            project_id, request, project_data["files"], project_data["chat_history"], project_data["user_clerk_id"]
+        )
+        
+        # User message and AI response are appended to chat history together
         ai_message = ChatMessage(
             id=str(uuid.uuid4()),
             content=chat_response.message,
             sender="ai",
             timestamp=chat_response.timestamp
         )
-        project_data["chat_history"].append(ai_message.dict())
         
         # Update files if AI provided updates
+        updated_files = None
         if chat_response.updated_files:
-            for name, file in chat_response.updated_files.items():
-                project_data["files"][name] = file.dict()
+            updated_files = {name: file.dict() for name, file in chat_response.updated_files.items()}
         
-        project_data["updated_at"] = datetime.now()
+        messages = [user_message.dict(), ai_message.dict()]
+        revision = await project_store.apply_changes(
+            project_id, datetime.now(), files=updated_files, messages=messages, source="chat"
+        )
+        if revision is None:
+            # Deleted while the AI was answering; drop the session and context state the call re-created
+            project_service.chat_sessions.discard(project_id)
+            project_service.context_builder.forget(project_id)
+            raise HTTPException(status_code=404, detail="Project not found")
+        _mirror_to_convex(project_id, project_data["user_clerk_id"], files=updated_files, messages=messages)
         
         return chat_response
         
+    except HTTPException:
+        raise
+    except SchedulerBusyError as e:
+        raise _busy_exception(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -263,11 +725,15 @@ async def chat_with_project(project_id: str, request: ChatRequest):
 async def delete_project(project_id: str):
     """Delete a project"""
     try:
-        if project_id not in projects_db:
+        if not await project_store.delete_project(project_id):
             raise HTTPException(status_code=404, detail="Project not found")
         
-        del projects_db[project_id]
+        project_service.sessions.discard(project_id)
+        project_service.chat_sessions.discard(project_id)
+        project_service.context_builder.forget(project_id)
         return {"message": "Project deleted successfully"}
         
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
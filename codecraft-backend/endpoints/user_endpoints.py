@@ -1,14 +1,32 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from fastapi.responses import JSONResponse
-from typing import List
-from models.user import UserCreate, UserUpdate, UserResponse, UserCreateResponse, UserErrorResponse
+import json
+from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import Any, Dict, List, Optional
+from models.user import (
+    UserCreate, UserUpdate, UserResponse, UserCreateResponse, UserErrorResponse,
+    UserPage, UserBatchRequest, UserBatchResponse
+)
 from services.user_service import ConvexUserService
 
 router = APIRouter(prefix="/api/users", tags=["users"])
 
+# Shared service so every request reuses the same pooled Convex connections
+user_service = ConvexUserService()
+
+# Upper bound on Clerk IDs per batch lookup request
+MAX_BATCH_LOOKUP = 1000
+
 # Dependency to get user service
 def get_user_service() -> ConvexUserService:
-    return ConvexUserService()
+    return user_service
+
+def _user_json(user: Dict[str, Any]) -> str:
+    """Serialize a user as one NDJSON line"""
+    return json.dumps({
+        **user,
+        "created_at": user["created_at"].isoformat(),
+        "updated_at": user["updated_at"].isoformat(),
+    }) + "\n"
 
 @router.post(
     "/register",
@@ -26,6 +44,12 @@ async def register_user(
         result = await user_service.create_or_update_user(user_data)
         
         if result["success"]:
+            if "user" in result:
+                return UserCreateResponse(
+                    message=result["message"],
+                    user=UserResponse(**result["user"])
+                )
+            
             # Fetch the created/updated user data
             user_result = await user_service.get_user_by_clerk_id(user_data.clerk_id)
             
@@ -53,6 +77,125 @@ async def register_user(
             detail=f"Internal server error: {str(e)}"
         )
 
+@router.get(
+    "/cache/stats",
+    summary="User cache statistics",
+    description="Hit/miss counters for the user lookup cache"
+)
+async def get_user_cache_stats(
+    user_service: ConvexUserService = Depends(get_user_service)
+):
+    """User cache hit/miss counters"""
+    return {**user_service.cache.stats(), "single_flight": user_service.flights.stats()}
+
+@router.get(
+    "/page",
+    response_model=UserPage,
+    summary="Get a page of users",
+    description="Retrieve users one page at a time using an opaque cursor (Admin function)"
+)
+async def get_users_page(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    user_service: ConvexUserService = Depends(get_user_service)
+):
+    """Get one page of users (Admin function)"""
+    try:
+        result = await user_service.list_users(limit, cursor)
+        
+        if result["success"]:
+            return UserPage(
+                items=[UserResponse(**user) for user in result["users"]],
+                next_cursor=result["next_cursor"]
+            )
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=result["message"]
+            )
+            
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Internal server error: {str(e)}"
+        )
+
+@router.get(
+    "/export",
+    summary="Export all users",
+    description="Stream every user as NDJSON, one page at a time (Admin function)"
+)
+async def export_users(
+    page_size: int = Query(200, ge=1, le=1000),
+    user_service: ConvexUserService = Depends(get_user_service)
+):
+    """Stream all users as NDJSON (Admin function)"""
+    users = user_service.iter_users(page_size)
+    
+    # Fetch the first page before responding so upstream failures still get a proper status code
+    try:
+        first_user = await users.__anext__()
+    except StopAsyncIteration:
+        first_user = None
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Internal server error: {str(e)}"
+        )
+    
+    async def ndjson_lines():
+        if first_user is None:
+            return
+        yield _user_json(first_user)
+        try:
+            async for user in users:
+                yield _user_json(user)
+        except Exception as e:
+            yield json.dumps({"error": str(e)}) + "\n"
+    
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+@router.post(
+    "/batch",
+    response_model=UserBatchResponse,
+    summary="Get many users by Clerk ID",
+    description="Look up several users in one call; unknown Clerk IDs are listed in `missing`"
+)
+async def get_users_batch(
+    request: UserBatchRequest,
+    user_service: ConvexUserService = Depends(get_user_service)
+):
+    """Get many users by Clerk ID"""
+    if len(request.clerk_ids) > MAX_BATCH_LOOKUP:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_BATCH_LOOKUP} Clerk IDs per request"
+        )
+    
+    try:
+        result = await user_service.get_users_by_clerk_ids(request.clerk_ids)
+        
+        if result["success"]:
+            return UserBatchResponse(
+                users=[UserResponse(**user) for user in result["users"]],
+                missing=result["missing"]
+            )
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=result["message"]
+            )
+            
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Internal server error: {str(e)}"
+        )
+
 @router.get(
     "/{clerk_id}",
     response_model=UserResponse,
@@ -1,14 +1,45 @@
-from fastapi import FastAPI, HTTPException, Request
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+
+# Load .env before any module reads its settings
+load_dotenv()
+
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 import uvicorn
-from endpoints.user_endpoints import router as user_router
-from endpoints.projects import router as project_router
+from endpoints.user_endpoints import router as user_router, user_service
+from endpoints.projects import router as project_router, project_store, convex_writer
+from endpoints.admin import router as admin_router, profiler
+from endpoints.jobs import router as job_router, job_queue
+from services.instrumentation import InstrumentationMiddleware, RequestLogger
+from services.metrics import metrics
+from services.profiler import ProfilingMiddleware
+
+request_logger = RequestLogger()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open shared clients on startup and release them on shutdown
+    await user_service.start()
+    await request_logger.start()
+    await job_queue.start()
+    yield
+    # Stop background jobs before the clients they use are closed
+    await job_queue.close()
+    await user_service.close()
+    # Drain buffered Convex writes before the store goes away
+    if convex_writer is not None:
+        await convex_writer.close()
+    project_store.close()
+    await request_logger.close()
 
 app = FastAPI(
     title="CodeCraft API",
     description="AI-powered code generation platform API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -18,15 +49,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],  # the frontend reads project revisions from it for If-Match
 )
 
-# Custom middleware example
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    print(f"Request: {request.method} {request.url}")
-    response = await call_next(request)
-    print(f"Response status: {response.status_code}")
-    return response
+# Opt-in per-request profiles (X-Profile header or PROFILE_SAMPLE_RATE)
+app.add_middleware(ProfilingMiddleware, profiler=profiler)
+
+# Per-route metrics and sampled structured request logs
+app.add_middleware(InstrumentationMiddleware, request_logger=request_logger)
 
 # Pydantic model for POST
 class Item(BaseModel):
@@ -58,12 +88,19 @@ async def delete_item(item_id: int):
 # Include routers
 app.include_router(user_router)
 app.include_router(project_router)
+app.include_router(job_router)
+app.include_router(admin_router)
 
 # Health check endpoint (optional, but good for Vercel)
 @app.get("/health")
 async def health_check():
     return {"message": "Health check successful"}
 
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # This is important for Vercel
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,134 @@
+import asyncio
+import glob
+import hashlib
+import json
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional
+from models.ai_model import CODE_GEN_HISTORY, CONTINUATION_PROMPT
+
+
+class FakeResponse:
+    """Replayed model response with the attributes ProjectService reads"""
+
+    def __init__(self, text: str, finish_reason: str = "STOP"):
+        self.text = text
+        self.finish_reason = finish_reason
+
+
+class FakeChatSession:
+    """Chat session of the fake backend; holds the unsent parts of a truncated fixture"""
+
+    def __init__(self, history: List[Dict[str, Any]]):
+        self.history = history
+        self.pending: List[str] = []
+
+
+def load_fixtures(directory: Optional[str]) -> List[Dict[str, Any]]:
+    """Read recorded responses from *.json files in a directory
+
+    Each file holds one fixture or a list of them: {"match": "substring of the prompt" (optional),
+    "responses": ["text", ...]} or {"response": "text"}. Responses after the first are replayed for
+    continuation prompts, so a multi-part fixture exercises the truncation path.
+    """
+    if not directory:
+        return []
+
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        with open(path, encoding="utf-8") as handle:
+            data = json.load(handle)
+        for fixture in data if isinstance(data, list) else [data]:
+            responses = fixture.get("responses") or [fixture.get("response")]
+            if not all(isinstance(text, str) for text in responses):
+                raise ValueError(f"Invalid AI fixture in {path}: responses must be strings")
+            fixtures.append({"match": fixture.get("match"), "responses": responses})
+    return fixtures
+
+
+class FakeCodeBackend:
+    """Offline model backend that replays fixture responses with configurable latency and streaming cadence
+
+    Prompts are answered by the first fixture whose "match" occurs in the prompt, otherwise by one of
+    the fixtures without a match picked from a hash of the prompt, so runs are deterministic. Without
+    fixtures every prompt gets the example project from CODE_GEN_HISTORY.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "fake",
+        fixtures: Optional[List[Dict[str, Any]]] = None,
+        latency: Optional[float] = None,
+        chunk_chars: Optional[int] = None,
+        chunk_interval: Optional[float] = None,
+    ):
+        # Prefixed so cached generations never mix with those of the real model
+        self.model_name = f"fake:{model_name}"
+        self.generation_config = {"max_output_tokens": 8192, "response_mime_type": "application/json"}
+        self.continuation_config = {**self.generation_config, "response_mime_type": "text/plain"}
+        self.fixtures = fixtures if fixtures is not None else load_fixtures(os.getenv("AI_FAKE_FIXTURES_DIR"))
+        self.default_response = CODE_GEN_HISTORY[1]["parts"][0]["text"]
+        # Seconds before the first chunk, characters per chunk and seconds between chunks
+        self.latency = latency if latency is not None else float(os.getenv("AI_FAKE_LATENCY", "0.05"))
+        self.chunk_chars = chunk_chars or int(os.getenv("AI_FAKE_CHUNK_CHARS", "200"))
+        self.chunk_interval = (
+            chunk_interval if chunk_interval is not None else float(os.getenv("AI_FAKE_CHUNK_INTERVAL", "0.01"))
+        )
+        self._chat_session: Optional[FakeChatSession] = None
+
+    @property
+    def chat_session(self) -> FakeChatSession:
+        if self._chat_session is None:
+            self._chat_session = self.start_session()
+        return self._chat_session
+
+    def start_session(self, history: Optional[List[Dict[str, Any]]] = None, seeded: bool = True) -> FakeChatSession:
+        """Start a replay session (the history is kept only for inspection)"""
+        return FakeChatSession((CODE_GEN_HISTORY if seeded else []) + (history or []))
+
+    async def send_message_async(
+        self, prompt: str, chat_session=None, generation_config: Optional[Dict[str, Any]] = None
+    ) -> FakeResponse:
+        """Replay a response after the time streaming it would have taken"""
+        response = self._reply(chat_session or self.chat_session, prompt)
+        chunks = max(1, -(-len(response.text) // self.chunk_chars))
+        await asyncio.sleep(self.latency + self.chunk_interval * (chunks - 1))
+        return response
+
+    async def stream_message_async(
+        self,
+        prompt: str,
+        chat_session=None,
+        outcome: Optional[Dict[str, Any]] = None,
+        generation_config: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        """Replay a response in chunks at the configured cadence"""
+        response = self._reply(chat_session or self.chat_session, prompt)
+        await asyncio.sleep(self.latency)
+        for start in range(0, len(response.text), self.chunk_chars):
+            if start:
+                await asyncio.sleep(self.chunk_interval)
+            yield response.text[start:start + self.chunk_chars]
+        if outcome is not None:
+            outcome["truncated"] = self.is_truncated(response)
+
+    def is_truncated(self, response) -> bool:
+        return getattr(response, "finish_reason", None) == "MAX_TOKENS"
+
+    def _reply(self, session: FakeChatSession, prompt: str) -> FakeResponse:
+        """Next response for a prompt; continuation prompts get the rest of a truncated fixture"""
+        if prompt == CONTINUATION_PROMPT and session.pending:
+            parts = session.pending
+        else:
+            parts = self._select(prompt)
+        session.pending = parts[1:]
+        return FakeResponse(parts[0], "MAX_TOKENS" if session.pending else "STOP")
+
+    def _select(self, prompt: str) -> List[str]:
+        for fixture in self.fixtures:
+            if fixture["match"] and fixture["match"] in prompt:
+                return fixture["responses"]
+        unmatched = [fixture for fixture in self.fixtures if not fixture["match"]]
+        if not unmatched:
+            return [self.default_response]
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        return unmatched[int.from_bytes(digest[:4], "big") % len(unmatched)]["responses"]
@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+from typing import Dict, Optional, Any
+from datetime import datetime
+
+class JobResponse(BaseModel):
+    """Model for background job status"""
+    id: str
+    kind: str  # e.g. "project.create"
+    status: str  # "queued", "running", "succeeded", "failed" or "cancelled"
+    result: Optional[Dict[str, Any]] = None  # set when the job succeeded
+    error: Optional[str] = None  # set when the job failed
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
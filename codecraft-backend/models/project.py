@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 
@@ -28,11 +28,48 @@ class ProjectCreate(BaseModel):
     template: str = "react"
     user_clerk_id: str
     initial_prompt: Optional[str] = None
+    bypass_cache: bool = False
+    generation_mode: str = Field("single", pattern="^(single|planned)$")
 
 class ProjectUpdate(BaseModel):
     """Model for updating project files"""
     files: Dict[str, ProjectFile]
     
+class FilePatchOperation(BaseModel):
+    """Single edit to one project file"""
+    path: str
+    op: str = "replace_range"  # "replace_range", "unified_diff", "set" or "delete"
+    start: Optional[int] = None  # character offsets replaced by `text` (replace_range)
+    end: Optional[int] = None
+    text: Optional[str] = None  # inserted text (replace_range) or full content (set)
+    diff: Optional[str] = None  # unified diff against the current content (unified_diff)
+    base_hash: Optional[str] = None  # expected content hash before the edit
+    language: Optional[str] = None
+    
+    # A misspelled field (e.g. `content` for `text`) must not silently become an empty edit
+    model_config = ConfigDict(extra="forbid")
+    
+    @model_validator(mode="after")
+    def check_required_fields(self) -> "FilePatchOperation":
+        """Require the fields each operation reads"""
+        required = {"set": ("text",), "replace_range": ("start", "text"), "unified_diff": ("diff",), "delete": ()}
+        if self.op not in required:
+            raise ValueError(f"Unknown patch operation: {self.op}")
+        missing = [field for field in required[self.op] if getattr(self, field) is None]
+        if missing:
+            raise ValueError(f"{self.op} requires {', '.join(missing)}")
+        return self
+
+class ProjectFilesPatch(BaseModel):
+    """Model for patch-style file updates"""
+    operations: List[FilePatchOperation]
+
+class ProjectFilesPatchResponse(BaseModel):
+    """Model for patch response: only the touched files' new hashes"""
+    revision: int
+    updated_at: datetime
+    file_hashes: Dict[str, Optional[str]]  # None for deleted files
+    
 class ProjectResponse(BaseModel):
     """Model for project response"""
     id: str
@@ -45,11 +82,54 @@ class ProjectResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
     
+class ChatHistoryPage(BaseModel):
+    """One page of a project's chat history, in chronological order"""
+    messages: List[ChatMessage]
+    total: int
+    next_before: Optional[int] = None  # pass as `before` to fetch the preceding page
+
+class ProjectVersion(BaseModel):
+    """One retained version of a project's files"""
+    version: int  # the project revision that produced it
+    created_at: datetime
+    source: str  # "create", "update", "patch", "chat", "restore" or "snapshot"
+    changed_files: List[str]
+    deleted_files: List[str]
+
+class FileDiff(BaseModel):
+    """Changes to one file between two versions"""
+    path: str
+    status: str  # "added", "deleted" or "modified"
+    diff: str  # unified diff
+
+class ProjectDiffResponse(BaseModel):
+    """Files that differ between two versions"""
+    from_version: int
+    to_version: Optional[int] = None  # None for the current files
+    files: List[FileDiff]
+
+class ProjectSummary(BaseModel):
+    """Lightweight project listing entry"""
+    id: str
+    title: str
+    template: str
+    file_count: int
+    updated_at: datetime
+
+class ProjectSummaryPage(BaseModel):
+    """One page of project summaries"""
+    items: List[ProjectSummary]
+    next_cursor: Optional[str] = None
+    
 class GenerateCodeRequest(BaseModel):
     """Model for code generation request"""
     prompt: str
     project_id: Optional[str] = None
     template: str = "react"
+    user_clerk_id: Optional[str] = None
+    bypass_cache: bool = False  # skip the prompt cache lookup and refresh the entry
+    # "planned" plans the file list first, then generates files concurrently (from the prompt alone)
+    mode: str = Field("single", pattern="^(single|planned)$")
     
 class GenerateCodeResponse(BaseModel):
     """Model for code generation response"""
@@ -68,4 +148,6 @@ class ChatResponse(BaseModel):
     message: str
     sender: str
     timestamp: datetime
-    updated_files: Optional[Dict[str, ProjectFile]] = None
\ No newline at end of file
+    updated_files: Optional[Dict[str, ProjectFile]] = None
+    context_tokens: Optional[int] = None  # estimated tokens of file context sent with the message
+    omitted_files: Optional[List[str]] = None  # files outlined or left out to fit the budget
\ No newline at end of file
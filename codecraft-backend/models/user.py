@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class UserBase(BaseModel):
@@ -34,4 +34,15 @@ class UserCreateResponse(BaseModel):
 class UserErrorResponse(BaseModel):
     message: str
     error: str
-    success: bool = False
\ No newline at end of file
+    success: bool = False
+
+class UserPage(BaseModel):
+    items: List[UserResponse]
+    next_cursor: Optional[str] = None  # pass back as `cursor` for the next page; None on the last page
+
+class UserBatchRequest(BaseModel):
+    clerk_ids: List[str]
+
+class UserBatchResponse(BaseModel):
+    users: List[UserResponse]
+    missing: List[str]
@@ -0,0 +1,121 @@
+import json
+from typing import Any, Dict, List, Optional
+from services.stream_parser import IncrementalProjectParser
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# The prompt asks for projectTitle, but older outputs (and the cache) use project_title
+TITLE_KEYS = ("projectTitle", "project_title")
+DEFAULT_TITLE = "Untitled Project"
+
+# Shortest repeated tail treated as overlap when stitching continuations (shorter matches are likely chance)
+MIN_OVERLAP = 16
+MAX_OVERLAP = 2000
+
+
+class AIOutput:
+    """Project fields extracted from model output, already type-checked"""
+
+    def __init__(self, project_title: str, explanation: str, files: Dict[str, str], complete: bool = True):
+        self.project_title = project_title
+        self.explanation = explanation
+        self.files = files  # {filename: code}
+        self.complete = complete  # False when recovered from truncated or malformed output
+
+    def to_generate_dict(self) -> Dict[str, Any]:
+        """Plain dict in the GenerateCodeResponse shape"""
+        return {
+            "project_title": self.project_title,
+            "explanation": self.explanation,
+            "files": {filename: {"code": code} for filename, code in self.files.items()},
+            "generated_files": list(self.files),
+        }
+
+
+def loads(text: str) -> Any:
+    """Decode JSON with orjson when it is installed; raises ValueError on invalid input"""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def parse_ai_output(text: str) -> Optional[AIOutput]:
+    """Extract the project from model output, recovering complete entries from truncated JSON
+
+    Returns None when nothing usable could be recovered.
+    """
+    data = parse_json_object(text)
+    if data is not None:
+        return output_from_data(data)
+
+    # Tolerant path: keep every field and file entry that was fully written
+    parser = IncrementalProjectParser()
+    parser.feed(text)
+    output = output_from_data(parser.result, complete=parser.complete)
+    if not output.files and not output.explanation:
+        return None
+    return output
+
+
+def parse_json_object(text: str) -> Optional[Dict[str, Any]]:
+    """Decode model output that should be a single JSON object, ignoring a surrounding code fence"""
+    try:
+        data = loads(_strip_fences(text))
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def output_from_data(data: Dict[str, Any], complete: bool = True) -> AIOutput:
+    """Validate decoded model output into an AIOutput, dropping malformed file entries"""
+    title = DEFAULT_TITLE
+    for key in TITLE_KEYS:
+        if isinstance(data.get(key), str) and data[key]:
+            title = data[key]
+            break
+
+    explanation = data.get("explanation", "")
+    if not isinstance(explanation, str):
+        explanation = str(explanation)
+
+    files = {}
+    files_data = data.get("files")
+    if isinstance(files_data, dict):
+        for filename, file_info in files_data.items():
+            if isinstance(file_info, dict) and isinstance(file_info.get("code"), str):
+                files[filename] = file_info["code"]
+            elif isinstance(file_info, str):
+                files[filename] = file_info
+
+    return AIOutput(title, explanation, files, complete)
+
+
+def strip_overlap(previous: str, continuation: str) -> str:
+    """Prepare a continuation for appending to previous output
+
+    Drops a leading code fence and any text the model repeated from the end of its previous output.
+    """
+    if continuation.lstrip().startswith("```"):
+        continuation = continuation.lstrip()
+        newline = continuation.find("\n")
+        continuation = continuation[newline + 1:] if newline != -1 else ""
+
+    limit = min(len(previous), len(continuation), MAX_OVERLAP)
+    for size in range(limit, MIN_OVERLAP - 1, -1):
+        if previous.endswith(continuation[:size]):
+            return continuation[size:]
+    return continuation
+
+
+def _strip_fences(text: str) -> str:
+    """Remove a surrounding markdown code fence (```json ... ```) if present"""
+    stripped = text.strip()
+    if not stripped.startswith("```"):
+        return stripped
+    lines: List[str] = stripped.split("\n")[1:]
+    if lines and lines[-1].strip().startswith("```"):
+        lines = lines[:-1]
+    return "\n".join(lines)
@@ -0,0 +1,159 @@
+import asyncio
+import os
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Optional, Set
+from services.metrics import AI_QUEUE_WAIT, AI_REJECTED, span
+
+
+class SchedulerBusyError(Exception):
+    """Raised when the AI scheduler cannot accept more work"""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class AIScheduler:
+    """Bounded concurrency scheduler for AI calls with per-user fair queuing"""
+
+    def __init__(
+        self,
+        max_in_flight: Optional[int] = None,
+        max_queue_depth: Optional[int] = None,
+        max_queue_per_user: Optional[int] = None,
+    ):
+        self.max_in_flight = max_in_flight or int(os.getenv("AI_MAX_IN_FLIGHT", "8"))
+        self.max_queue_depth = max_queue_depth or int(os.getenv("AI_MAX_QUEUE_DEPTH", "64"))
+        self.max_queue_per_user = max_queue_per_user or int(os.getenv("AI_MAX_QUEUE_PER_USER", "4"))
+        self.in_flight = 0
+        self.queued = 0
+        # One FIFO per user, served round-robin so a single user cannot starve the rest
+        self.queues: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        # Queue places held for the follow-up calls of admitted requests (see reserve), minus those waiting
+        self.reserved = 0
+        self.reserved_by_user: Dict[str, int] = {}
+        self.reserved_waiters: Set[asyncio.Future] = set()
+
+    @asynccontextmanager
+    async def slot(self, user_key: Optional[str] = None, admitted: bool = False):
+        """Hold one in-flight AI slot for the duration of the block"""
+        with span("ai.queue_wait", AI_QUEUE_WAIT, queued=self.queued):
+            await self.acquire(user_key, admitted)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def reserve(self, user_key: Optional[str], places: int):
+        """Hold queue places for the follow-up calls of a request for the duration of the block
+
+        The request is admitted or rejected (503/429) here, once, counting all of its places against
+        the queue limits. Its calls then pass admitted=True and wait in the reserved places instead of
+        being checked again, so a request that has started streaming is not cut off half way.
+        """
+        user_key = user_key or "anonymous"
+        self._check_capacity(user_key, places)
+        self._add_reserved(user_key, places)
+        try:
+            yield
+        finally:
+            self._add_reserved(user_key, -places)
+
+    async def acquire(self, user_key: Optional[str] = None, admitted: bool = False) -> None:
+        """Wait for an in-flight slot, failing fast when the queue is full
+
+        admitted=True is for calls made inside a reserve() block of the same user; they queue in one
+        of its places and are never rejected.
+        """
+        user_key = user_key or "anonymous"
+
+        if self.in_flight < self.max_in_flight and self.queued == 0:
+            self.in_flight += 1
+            return
+
+        if not admitted:
+            self._check_capacity(user_key, 1)
+
+        queue = self.queues.get(user_key)
+        if queue is None:
+            queue = self.queues[user_key] = deque()
+
+        waiter = asyncio.get_running_loop().create_future()
+        queue.append(waiter)
+        self.queued += 1
+        if admitted:
+            # The reserved place is now taken by a waiter, which the queue counts
+            self.reserved_waiters.add(waiter)
+            self._add_reserved(user_key, -1)
+
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we were cancelled, pass it on
+                self.release()
+            elif waiter in queue:
+                queue.remove(waiter)
+                self.queued -= 1
+                self._leave_reserved(user_key, waiter)
+                if not queue and self.queues.get(user_key) is queue:
+                    del self.queues[user_key]
+            raise
+
+    def release(self) -> None:
+        """Hand the freed slot to the next user in round-robin order"""
+        while self.queues:
+            user_key, queue = next(iter(self.queues.items()))
+            waiter = queue.popleft()
+            self.queued -= 1
+            self._leave_reserved(user_key, waiter)
+
+            if queue:
+                self.queues.move_to_end(user_key)
+            else:
+                del self.queues[user_key]
+
+            if not waiter.done():
+                # The slot moves straight to the waiter, so in_flight is unchanged
+                waiter.set_result(None)
+                return
+
+        self.in_flight -= 1
+
+    def _check_capacity(self, user_key: str, places: int) -> None:
+        """Reject with 503 (queue full) or 429 (user's share full) unless `places` more calls may wait"""
+        if self.queued + self.reserved + places > self.max_queue_depth:
+            AI_REJECTED.inc(1, ("503",))
+            raise SchedulerBusyError("AI service is at capacity, please retry shortly", 503)
+
+        user_places = len(self.queues.get(user_key, ())) + self.reserved_by_user.get(user_key, 0)
+        if user_places + places > self.max_queue_per_user:
+            AI_REJECTED.inc(1, ("429",))
+            raise SchedulerBusyError("Too many pending AI requests for this user", 429)
+
+    def _add_reserved(self, user_key: str, places: int) -> None:
+        self.reserved += places
+        remaining = self.reserved_by_user.get(user_key, 0) + places
+        if remaining:
+            self.reserved_by_user[user_key] = remaining
+        else:
+            self.reserved_by_user.pop(user_key, None)
+
+    def _leave_reserved(self, user_key: str, waiter: asyncio.Future) -> None:
+        """Give a reserved place back once its waiter leaves the queue"""
+        if waiter in self.reserved_waiters:
+            self.reserved_waiters.discard(waiter)
+            self._add_reserved(user_key, 1)
+
+    def stats(self) -> Dict[str, Any]:
+        """Current scheduler load"""
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queued": self.queued,
+            "max_queue_depth": self.max_queue_depth,
+            "reserved": self.reserved,
+            "waiting_users": len(self.queues),
+        }
@@ -0,0 +1,110 @@
+import sys
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+from services.file_patch import content_hash
+
+
+class BlobStore:
+    """Content-addressed, reference-counted store of file contents
+
+    Identical contents (template boilerplate, shared stylesheets, files a chat edit left unchanged)
+    are kept once; every FileRecord holding them points at the same string.
+    """
+
+    def __init__(self):
+        # content hash -> [content, reference count]
+        self.blobs: Dict[str, list] = {}
+        self.size = 0  # characters held
+
+    def put(self, content: str) -> Tuple[str, str]:
+        """Add a reference to a content blob; returns (hash, the interned content)"""
+        digest = content_hash(content)
+        entry = self.blobs.get(digest)
+        if entry is None:
+            entry = self.blobs[digest] = [content, 0]
+            self.size += len(content)
+        entry[1] += 1
+        return digest, entry[0]
+
+    def retain(self, digest: str) -> None:
+        """Add a reference to a blob that is already stored"""
+        self.blobs[digest][1] += 1
+
+    def release(self, digest: str) -> None:
+        """Drop a reference; the blob is freed with its last reference"""
+        entry = self.blobs.get(digest)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del self.blobs[digest]
+            self.size -= len(entry[0])
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "blobs": len(self.blobs),
+            "references": sum(entry[1] for entry in self.blobs.values()),
+            "characters": self.size,
+        }
+
+
+class _Record:
+    """Slotted record readable both as attributes and as a read-only mapping of its fields"""
+
+    __slots__ = ()
+    fields: Tuple[str, ...] = ()
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.fields:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self.fields else default
+
+    def keys(self) -> Tuple[str, ...]:
+        return self.fields
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: getattr(self, key) for key in self.fields}
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({', '.join(f'{key}={getattr(self, key)!r}' for key in self.fields)})"
+
+
+class FileRecord(_Record):
+    """Stored project file; duck-types as a ProjectFile and reads like a file dict"""
+
+    __slots__ = ("name", "content", "language", "_hash")
+    fields = ("name", "content", "language")
+
+    def __init__(self, name: str, content: str, language: str, hash: Optional[str] = None):
+        self.name = name
+        self.content = content
+        # Few distinct languages, so share the strings
+        self.language = sys.intern(language)
+        self._hash = hash
+
+    @property
+    def hash(self) -> str:
+        """Content hash (blob address); computed on first use for records read from disk"""
+        if self._hash is None:
+            self._hash = content_hash(self.content)
+        return self._hash
+
+
+class MessageRecord(_Record):
+    """Stored chat message; duck-types as a ChatMessage and reads like a message dict"""
+
+    __slots__ = ("id", "content", "sender", "timestamp")
+    fields = ("id", "content", "sender", "timestamp")
+
+    def __init__(self, id: str, content: str, sender: str, timestamp: datetime):
+        self.id = id
+        self.content = content
+        self.sender = sys.intern(sender)
+        self.timestamp = timestamp
+
+    @classmethod
+    def from_dict(cls, message: Dict[str, Any]) -> "MessageRecord":
+        return cls(message["id"], message["content"], message["sender"], message["timestamp"])
@@ -0,0 +1,130 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from models.ai_model import CODE_GEN_HISTORY, estimate_tokens
+
+
+class PooledSession:
+    """A live AI chat session plus the bookkeeping used for eviction"""
+
+    def __init__(self, chat_session, tokens: int):
+        self.chat_session = chat_session
+        self.tokens = tokens
+        self.last_used = time.monotonic()
+        # Serializes turns so concurrent requests cannot interleave the session history
+        self.lock = asyncio.Lock()
+
+
+class ChatSessionManager:
+    """LRU pool of per-project AI chat sessions with idle TTL and token budget eviction"""
+
+    def __init__(
+        self,
+        ai_model,
+        max_sessions: Optional[int] = None,
+        idle_ttl: Optional[float] = None,
+        max_session_tokens: Optional[int] = None,
+        max_total_tokens: Optional[int] = None,
+    ):
+        self.ai_model = ai_model
+        self.max_sessions = max_sessions or int(os.getenv("CHAT_SESSION_MAX_SESSIONS", "256"))
+        self.idle_ttl = idle_ttl or float(os.getenv("CHAT_SESSION_IDLE_TTL", "1800"))
+        self.max_session_tokens = max_session_tokens or int(os.getenv("CHAT_SESSION_MAX_TOKENS", "32000"))
+        self.max_total_tokens = max_total_tokens or int(os.getenv("CHAT_SESSION_TOTAL_TOKENS", "2000000"))
+        self.sessions: "OrderedDict[str, PooledSession]" = OrderedDict()
+        self.total_tokens = 0
+        self.seed_tokens = sum(
+            estimate_tokens(part["text"]) for turn in CODE_GEN_HISTORY for part in turn["parts"]
+        )
+
+    def get_session(self, project_id: str, chat_history: Optional[List[Dict[str, Any]]] = None) -> PooledSession:
+        """Return the pooled session for a project, rebuilding it from stored chat history if needed"""
+        self._evict_idle()
+
+        pooled = self.sessions.get(project_id)
+        if pooled is not None:
+            self.sessions.move_to_end(project_id)
+            pooled.last_used = time.monotonic()
+            return pooled
+
+        history, tokens = self._history_from_chat(chat_history or [])
+        pooled = PooledSession(self.ai_model.start_session(history), self.seed_tokens + tokens)
+        self.sessions[project_id] = pooled
+        self.total_tokens += pooled.tokens
+        self._evict_over_budget()
+        return pooled
+
+    def record_turn(self, project_id: str, prompt: str, response_text: str) -> None:
+        """Account for a completed turn and drop the session once it outgrows its budget"""
+        pooled = self.sessions.get(project_id)
+        if pooled is None:
+            return
+
+        added = estimate_tokens(prompt) + estimate_tokens(response_text)
+        pooled.tokens += added
+        self.total_tokens += added
+
+        # Oversized sessions are rebuilt from the compact stored chat history on next use
+        if pooled.tokens > self.max_session_tokens:
+            self.discard(project_id)
+        else:
+            self._evict_over_budget()
+
+    def discard(self, project_id: str) -> None:
+        """Remove a project's session from the pool"""
+        pooled = self.sessions.pop(project_id, None)
+        if pooled is not None:
+            self.total_tokens -= pooled.tokens
+
+    def stats(self) -> Dict[str, Any]:
+        """Current pool size and token usage"""
+        return {
+            "sessions": len(self.sessions),
+            "max_sessions": self.max_sessions,
+            "total_tokens": self.total_tokens,
+            "max_total_tokens": self.max_total_tokens,
+        }
+
+    def _history_from_chat(self, chat_history: List[Dict[str, Any]]):
+        """Convert stored chat messages into model history, keeping the newest turns within budget"""
+        budget = max(self.max_session_tokens - self.seed_tokens, 0) // 2
+        history = []
+        tokens = 0
+
+        for message in reversed(chat_history):
+            message_tokens = estimate_tokens(message["content"])
+            if tokens + message_tokens > budget:
+                break
+            history.append({
+                "role": "model" if message["sender"] == "ai" else "user",
+                "parts": [{"text": message["content"]}]
+            })
+            tokens += message_tokens
+
+        history.reverse()
+
+        # Gemini expects the conversation to resume on a user turn
+        if history and history[0]["role"] == "model":
+            tokens -= estimate_tokens(history[0]["parts"][0]["text"])
+            history.pop(0)
+
+        return history, tokens
+
+    def _evict_idle(self) -> None:
+        """Drop sessions that have not been used within the idle TTL"""
+        cutoff = time.monotonic() - self.idle_ttl
+        while self.sessions:
+            project_id, pooled = next(iter(self.sessions.items()))
+            if pooled.last_used >= cutoff:
+                break
+            self.discard(project_id)
+
+    def _evict_over_budget(self) -> None:
+        """Drop least recently used sessions until the pool fits its limits"""
+        while len(self.sessions) > 1 and (
+            len(self.sessions) > self.max_sessions or self.total_tokens > self.max_total_tokens
+        ):
+            project_id = next(iter(self.sessions))
+            self.discard(project_id)
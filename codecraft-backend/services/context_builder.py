@@ -0,0 +1,191 @@
+import os
+import posixpath
+import re
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set
+from models.ai_model import estimate_tokens
+from models.project import ProjectFile
+
+# import x from "./x", import "./x.css", export ... from "./x", require("./x")
+_IMPORT_PATTERN = re.compile(
+    r"""(?:import\s+(?:[^'"]*?\s+from\s+)?|export\s+[^'"]*?\s+from\s+|require\(\s*)['"]([^'"]+)['"]"""
+)
+# Lines worth keeping when a file is summarized instead of sent in full
+_OUTLINE_PATTERN = re.compile(
+    r"^\s*(?:import\s|export\s|function\s|async\s+function\s|class\s|def\s|const\s+\w+\s*=\s*(?:\(|async|function))"
+)
+_RESOLVE_EXTENSIONS = ["", ".js", ".jsx", ".ts", ".tsx", ".css", "/index.js", "/index.jsx", "/index.ts", "/index.tsx"]
+
+MENTION_SCORE = 100.0
+MENTION_NEIGHBOR_SCORE = 50.0
+ENTRY_SCORE = 30.0
+RECENT_SCORE = 40.0
+
+
+def import_specifiers(content: str) -> List[str]:
+    """Module specifiers imported or re-exported by a JS/TS file"""
+    return _IMPORT_PATTERN.findall(content)
+
+
+def resolve_import(importer: str, specifier: str, paths: Iterable[str]) -> Optional[str]:
+    """Project file a relative import refers to, or None for packages and missing files"""
+    if not specifier.startswith("."):
+        return None
+    base = posixpath.normpath(posixpath.join(posixpath.dirname(importer), specifier))
+    for extension in _RESOLVE_EXTENSIONS:
+        if base + extension in paths:
+            return base + extension
+    return None
+
+
+class ProjectContext:
+    """File context packed for one chat turn"""
+
+    def __init__(self, text: str, tokens: int, included: List[str], summarized: List[str], omitted: List[str]):
+        self.text = text
+        self.tokens = tokens
+        self.included = included
+        self.summarized = summarized
+        self.omitted = omitted
+
+
+class ContextBuilder:
+    """Ranks project files by relevance to a chat message and packs them into a token budget"""
+
+    def __init__(
+        self,
+        token_budget: Optional[int] = None,
+        entry_file: str = "App.js",
+        max_tracked_projects: int = 1024,
+        recent_per_project: int = 10,
+    ):
+        self.token_budget = token_budget or int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "24000"))
+        self.entry_file = entry_file
+        self.max_tracked_projects = max_tracked_projects
+        self.recent_per_project = recent_per_project
+        self.recent_changes: "OrderedDict[str, List[str]]" = OrderedDict()
+
+    def note_changed(self, project_id: str, paths: List[str]) -> None:
+        """Remember files that were just edited so the next turns favour them"""
+        if not paths:
+            return
+        recent = [path for path in self.recent_changes.pop(project_id, []) if path not in paths]
+        self.recent_changes[project_id] = (list(paths) + recent)[:self.recent_per_project]
+        while len(self.recent_changes) > self.max_tracked_projects:
+            self.recent_changes.popitem(last=False)
+
+    def forget(self, project_id: str) -> None:
+        """Drop the change history of a deleted project"""
+        self.recent_changes.pop(project_id, None)
+
+    def build(self, message: str, files: Dict[str, ProjectFile], project_id: Optional[str] = None) -> ProjectContext:
+        """Build the "Current project files" section for a chat prompt within the token budget"""
+        ranked = self.rank_files(message, files, project_id)
+
+        parts = ["\n\nCurrent project files:\n"]
+        tokens = estimate_tokens(parts[0])
+        included: List[str] = []
+        summarized: List[str] = []
+        omitted: List[str] = []
+
+        for filename in ranked:
+            file_obj = files[filename]
+            block = f"\n{filename}:\n```{file_obj.language}\n{file_obj.content}\n```\n"
+            block_tokens = estimate_tokens(block)
+            if tokens + block_tokens <= self.token_budget:
+                parts.append(block)
+                tokens += block_tokens
+                included.append(filename)
+                continue
+
+            # Fall back to an outline of imports, exports and declarations
+            outline = self._outline(file_obj.content)
+            if outline:
+                block = (
+                    f"\n{filename} (outline only, full file omitted for length):\n"
+                    f"```{file_obj.language}\n{outline}\n```\n"
+                )
+                block_tokens = estimate_tokens(block)
+                if tokens + block_tokens <= self.token_budget:
+                    parts.append(block)
+                    tokens += block_tokens
+                    summarized.append(filename)
+                    continue
+
+            omitted.append(filename)
+
+        if omitted:
+            note = f"\nOther project files (not shown): {', '.join(omitted)}\n"
+            parts.append(note)
+            tokens += estimate_tokens(note)
+
+        return ProjectContext("".join(parts), tokens, included, summarized, omitted)
+
+    def rank_files(self, message: str, files: Dict[str, ProjectFile], project_id: Optional[str] = None) -> List[str]:
+        """Order files by relevance: mentioned in the message, import distance, recent edits"""
+        scores = {filename: 0.0 for filename in files}
+        graph = self._import_graph(files)
+
+        mentioned = self._mentioned_files(message, files)
+        for filename in mentioned:
+            scores[filename] += MENTION_SCORE
+            # Files a mentioned file imports, or that import it, are likely to change with it
+            for neighbor in graph[filename]:
+                scores[neighbor] += MENTION_NEIGHBOR_SCORE
+            for other, imports in graph.items():
+                if filename in imports:
+                    scores[other] += MENTION_NEIGHBOR_SCORE
+
+        # Breadth-first distance from the entry file through the import graph
+        if self.entry_file in files:
+            distances = {self.entry_file: 0}
+            frontier = [self.entry_file]
+            while frontier:
+                next_frontier = []
+                for filename in frontier:
+                    for neighbor in graph[filename]:
+                        if neighbor not in distances:
+                            distances[neighbor] = distances[filename] + 1
+                            next_frontier.append(neighbor)
+                frontier = next_frontier
+            for filename, distance in distances.items():
+                scores[filename] += ENTRY_SCORE / (distance + 1)
+
+        if project_id:
+            for rank, filename in enumerate(self.recent_changes.get(project_id, [])):
+                if filename in scores:
+                    scores[filename] += RECENT_SCORE / (rank + 1)
+
+        return sorted(files, key=lambda name: (-scores[name], len(files[name].content), name))
+
+    def _mentioned_files(self, message: str, files: Dict[str, ProjectFile]) -> Set[str]:
+        """Files referred to in the message by path, file name or (distinctive) stem"""
+        lowered = message.lower()
+        mentioned = set()
+        for filename in files:
+            basename = posixpath.basename(filename)
+            stem = basename.rsplit(".", 1)[0]
+            candidates = [filename, basename] + ([stem] if len(stem) >= 3 else [])
+            for candidate in candidates:
+                if re.search(rf"(?<![\w/.-]){re.escape(candidate.lower())}(?![\w-])", lowered):
+                    mentioned.add(filename)
+                    break
+        return mentioned
+
+    def _import_graph(self, files: Dict[str, ProjectFile]) -> Dict[str, Set[str]]:
+        """Map each file to the project files it imports"""
+        graph = {}
+        for filename, file_obj in files.items():
+            imports = set()
+            for specifier in import_specifiers(file_obj.content):
+                resolved = resolve_import(filename, specifier, files)
+                if resolved:
+                    imports.add(resolved)
+            imports.discard(filename)
+            graph[filename] = imports
+        return graph
+
+    def _outline(self, content: str, max_lines: int = 40) -> str:
+        """Import, export and declaration lines of a file"""
+        lines = [line.rstrip() for line in content.splitlines() if _OUTLINE_PATTERN.match(line)]
+        return "\n".join(lines[:max_lines])
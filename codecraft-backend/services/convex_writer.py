@@ -0,0 +1,250 @@
+import asyncio
+import os
+import random
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import httpx
+from services.metrics import CONVEX_DURATION, CONVEX_ERRORS, span
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+except ImportError:
+    h2 = None
+
+
+class PendingProjectWrites:
+    """Writes buffered for one project until the next flush"""
+
+    def __init__(self, user_clerk_id: str):
+        self.user_clerk_id = user_clerk_id
+        self.title: Optional[str] = None
+        self.messages: List[Dict[str, Any]] = []
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.deleted_files: set = set()
+        self.acks: List[asyncio.Future] = []
+
+    def record_count(self) -> int:
+        return len(self.messages) + len(self.files) + len(self.deleted_files)
+
+    def to_args(self, project_id: str) -> Dict[str, Any]:
+        """Arguments for one project in the projects:applyBatch mutation"""
+        args = {
+            "projectId": project_id,
+            "userClerkId": self.user_clerk_id,
+            "files": [
+                {"path": path, "content": file["content"], "language": file["language"]}
+                for path, file in self.files.items()
+            ],
+            "deletedFiles": sorted(self.deleted_files),
+            "messages": [
+                {
+                    "messageId": message["id"],
+                    "role": "assistant" if message["sender"] == "ai" else "user",
+                    "content": message["content"],
+                    "timestamp": _to_millis(message["timestamp"]),
+                }
+                for message in self.messages
+            ],
+        }
+        if self.title is not None:
+            args["title"] = self.title
+        return args
+
+
+class ConvexBatchWriter:
+    """Write-behind buffer that mirrors chat messages and file changes to Convex in batched mutations"""
+
+    def __init__(
+        self,
+        convex_url: Optional[str] = None,
+        client: Optional[httpx.AsyncClient] = None,
+        max_batch_records: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_retries: Optional[int] = None,
+    ):
+        self.convex_url = (convex_url or os.getenv("CONVEX_URL", "https://rare-greyhound-374.convex.cloud")).rstrip("/")
+        self.max_batch_records = max_batch_records or int(os.getenv("CONVEX_WRITE_BATCH_SIZE", "100"))
+        self.flush_interval = flush_interval or float(os.getenv("CONVEX_WRITE_FLUSH_INTERVAL", "0.2"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("CONVEX_WRITE_RETRIES", "3"))
+        self.retry_backoff = float(os.getenv("CONVEX_RETRY_BACKOFF", "0.2"))
+        self.client = client
+        self.pending: Dict[str, PendingProjectWrites] = {}
+        self.pending_records = 0
+        self.flush_lock = asyncio.Lock()
+        self.timer: Optional[asyncio.Task] = None
+        self.tasks: set = set()
+        self.closed = False
+        self.counters = {"enqueued": 0, "mutations": 0, "records_flushed": 0, "failed_records": 0}
+
+    def enqueue(
+        self,
+        project_id: str,
+        user_clerk_id: str,
+        messages: Optional[List[Dict[str, Any]]] = None,
+        files: Optional[Dict[str, Dict[str, Any]]] = None,
+        deleted_files: Optional[List[str]] = None,
+        title: Optional[str] = None,
+    ) -> asyncio.Future:
+        """Buffer writes for a project; the returned future resolves once they are durable in Convex"""
+        if self.closed:
+            raise RuntimeError("Convex writer is closed")
+
+        entry = self.pending.get(project_id)
+        if entry is None:
+            entry = self.pending[project_id] = PendingProjectWrites(user_clerk_id)
+        before = entry.record_count()
+
+        if title is not None:
+            entry.title = title
+        entry.messages.extend(messages or [])
+        # Later writes to the same path replace earlier ones within a batch
+        for path, file in (files or {}).items():
+            entry.files[path] = file
+            entry.deleted_files.discard(path)
+        for path in deleted_files or []:
+            entry.files.pop(path, None)
+            entry.deleted_files.add(path)
+
+        added = entry.record_count() - before
+        self.pending_records += added
+        self.counters["enqueued"] += added
+
+        ack = asyncio.get_running_loop().create_future()
+        # Nobody is required to await the ack, so never leave its exception unretrieved
+        ack.add_done_callback(lambda future: future.cancelled() or future.exception())
+        entry.acks.append(ack)
+
+        if self.pending_records >= self.max_batch_records:
+            self._spawn(self.flush())
+        elif self.timer is None:
+            self.timer = self._spawn(self._flush_later())
+        return ack
+
+    async def flush(self) -> None:
+        """Send everything buffered so far, one mutation per max_batch_records"""
+        async with self.flush_lock:
+            pending, self.pending = self.pending, {}
+            self.pending_records = 0
+            if self.timer is not None and self.timer is not asyncio.current_task():
+                self.timer.cancel()
+            self.timer = None
+
+            batch: List[str] = []
+            batch_records = 0
+            for project_id, entry in pending.items():
+                if batch and batch_records + entry.record_count() > self.max_batch_records:
+                    await self._send(batch, pending)
+                    batch, batch_records = [], 0
+                batch.append(project_id)
+                batch_records += entry.record_count()
+            if batch:
+                await self._send(batch, pending)
+
+    async def close(self) -> None:
+        """Stop accepting writes and drain the buffer (called from the app lifespan)"""
+        self.closed = True
+        await self.flush()
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Buffered and flushed record counters"""
+        return {**self.counters, "pending_records": self.pending_records, "pending_projects": len(self.pending)}
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    def _spawn(self, coroutine) -> asyncio.Task:
+        task = asyncio.ensure_future(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self.client is None or self.client.is_closed:
+            self.client = httpx.AsyncClient(
+                base_url=self.convex_url,
+                http2=h2 is not None,
+                timeout=httpx.Timeout(float(os.getenv("CONVEX_TIMEOUT", "10"))),
+                headers={"Content-Type": "application/json"},
+            )
+        return self.client
+
+    async def _send(self, project_ids: List[str], pending: Dict[str, PendingProjectWrites]) -> None:
+        """Apply one batched mutation, retrying transient failures, and settle the callers' acks
+
+        Never raises: any failure is delivered to this batch's acks so flush() goes on with the next batch.
+        """
+        records = sum(pending[project_id].record_count() for project_id in project_ids)
+        error: Optional[Exception] = None
+        try:
+            payload = {
+                "path": "projects:applyBatch",
+                "args": {"batches": [pending[project_id].to_args(project_id) for project_id in project_ids]},
+            }
+        except Exception as e:
+            self._fail(project_ids, pending, records, e)
+            return
+
+        # Messages carry their ids and files are upserts, so retrying a batch is idempotent
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.counters["mutations"] += 1
+                with span(
+                    "convex.mutation", CONVEX_DURATION, ("mutation", "projects:applyBatch"),
+                    function="projects:applyBatch", records=records
+                ) as attributes:
+                    response = await self._get_client().post("/api/mutation", json=payload)
+                    attributes["status"] = response.status_code
+                if response.status_code == 200:
+                    results = {item["projectId"]: item["applied"] for item in response.json().get("value", [])}
+                    for project_id in project_ids:
+                        for ack in pending[project_id].acks:
+                            if not ack.done():
+                                ack.set_result(results.get(project_id, False))
+                    self.counters["records_flushed"] += records
+                    return
+                CONVEX_ERRORS.inc(1, ("mutation", "projects:applyBatch"))
+                error = Exception(f"Convex API error: {response.status_code}")
+                if response.status_code < 500 and response.status_code != 429:
+                    break
+            except httpx.TransportError as e:
+                CONVEX_ERRORS.inc(1, ("mutation", "projects:applyBatch"))
+                error = e
+            except Exception as e:
+                # Malformed response body or other non-transient failure; retrying would not help
+                CONVEX_ERRORS.inc(1, ("mutation", "projects:applyBatch"))
+                error = e
+                break
+            if attempt < self.max_retries:
+                await asyncio.sleep(random.uniform(0, self.retry_backoff * 2 ** attempt))
+
+        self._fail(project_ids, pending, records, error)
+
+    def _fail(
+        self, project_ids: List[str], pending: Dict[str, PendingProjectWrites], records: int, error: Optional[Exception]
+    ) -> None:
+        """Fail the acks of a batch that could not be written"""
+        self.counters["failed_records"] += records
+        for project_id in project_ids:
+            for ack in pending[project_id].acks:
+                if not ack.done():
+                    ack.set_exception(Exception(f"Error writing to Convex: {str(error)}"))
+
+
+def _to_millis(value: Any) -> float:
+    """Convex timestamps are milliseconds since the epoch"""
+    if isinstance(value, datetime):
+        return value.timestamp() * 1000
+    return datetime.fromisoformat(str(value)).timestamp() * 1000
+
+
+def create_convex_writer() -> Optional[ConvexBatchWriter]:
+    """Build the Convex mirror writer when CONVEX_PROJECT_SYNC is enabled"""
+    if os.getenv("CONVEX_PROJECT_SYNC", "false").lower() != "true":
+        return None
+    return ConvexBatchWriter()
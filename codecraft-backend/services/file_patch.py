@@ -0,0 +1,88 @@
+import difflib
+import hashlib
+import re
+from typing import List
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class PatchError(ValueError):
+    """Raised when an edit cannot be applied to the current file content"""
+
+
+def content_hash(content: str) -> str:
+    """Stable hash of a file's content, used for per-file ETags and edit preconditions"""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def apply_replace_range(content: str, start: int, end: int, text: str) -> str:
+    """Replace content[start:end] (character offsets) with text"""
+    if not 0 <= start <= end <= len(content):
+        raise PatchError(f"Range {start}-{end} is outside the file (length {len(content)})")
+    return content[:start] + text + content[end:]
+
+
+def apply_unified_diff(content: str, diff: str) -> str:
+    """Apply a unified diff to content, verifying every context and removed line"""
+    source = content.splitlines(keepends=True)
+    diff_lines = diff.splitlines(keepends=True)
+    result: List[str] = []
+    position = 0
+    i = 0
+
+    # Skip the optional ---/+++ file headers
+    while i < len(diff_lines) and not diff_lines[i].startswith("@@"):
+        i += 1
+
+    while i < len(diff_lines):
+        match = _HUNK_HEADER.match(diff_lines[i])
+        if match is None:
+            raise PatchError(f"Malformed hunk header: {diff_lines[i].strip()}")
+
+        old_start = int(match.group(1))
+        old_count = int(match.group(2)) if match.group(2) is not None else 1
+        # A zero-length hunk inserts after line old_start instead of replacing it
+        start = old_start - 1 if old_count > 0 else old_start
+        if start < position or start > len(source):
+            raise PatchError(f"Hunk at line {old_start} does not fit the file")
+
+        result.extend(source[position:start])
+        position = start
+        previous_tag = None
+        i += 1
+
+        while i < len(diff_lines) and not diff_lines[i].startswith("@@"):
+            line = diff_lines[i]
+            tag, body = line[:1], line[1:]
+
+            if tag == "\\":
+                # "\ No newline at end of file" applies to the line before it
+                if previous_tag in (" ", "+") and result:
+                    result[-1] = result[-1].rstrip("\r\n")
+            elif tag in (" ", "-", "\n"):
+                if tag == "\n":
+                    body = "\n"
+                if position >= len(source) or source[position].rstrip("\r\n") != body.rstrip("\r\n"):
+                    raise PatchError(f"Diff does not match the file at line {position + 1}")
+                if tag != "-":
+                    result.append(source[position])
+                position += 1
+            elif tag == "+":
+                result.append(body)
+            else:
+                raise PatchError(f"Unexpected diff line: {line.rstrip()}")
+
+            previous_tag = tag if tag != "\n" else " "
+            i += 1
+
+    result.extend(source[position:])
+    return "".join(result)
+
+
+def make_unified_diff(old: str, new: str, path: str, context: int = 3) -> str:
+    """Unified diff from old to new content, in the format apply_unified_diff accepts"""
+    lines = difflib.unified_diff(
+        old.splitlines(keepends=True), new.splitlines(keepends=True),
+        fromfile=f"a/{path}", tofile=f"b/{path}", n=context
+    )
+    return "".join(line if line.endswith("\n") else line + "\n\\ No newline at end of file\n" for line in lines)
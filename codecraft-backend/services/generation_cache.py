@@ -0,0 +1,155 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Words that do not change what is being asked for ("Create a todo app" == "todo app")
+_FILLER_WORDS = {"a", "an", "the", "please", "me", "my", "some"}
+_LEADING_VERBS = {"create", "build", "make", "generate", "write", "develop", "design"}
+_NON_WORD = re.compile(r"[^\w\s]+")
+
+
+class GenerationCache:
+    """Two-tier cache of AI generation results: an in-process LRU plus an optional SQLite file"""
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        ttl: Optional[float] = None,
+        db_path: Optional[str] = None,
+        max_db_entries: Optional[int] = None,
+    ):
+        self.max_entries = max_entries or int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "512"))
+        self.ttl = ttl or float(os.getenv("GENERATION_CACHE_TTL", "86400"))
+        self.db_path = db_path or os.getenv("GENERATION_CACHE_DB")
+        self.max_db_entries = max_db_entries or int(os.getenv("GENERATION_CACHE_DB_MAX_ENTRIES", "10000"))
+        self.entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self.db_lock = threading.Lock()
+        self.db = None
+
+        if self.db_path:
+            self.db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS generation_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self.db.execute(
+                "CREATE INDEX IF NOT EXISTS generation_cache_last_access ON generation_cache (last_access)"
+            )
+            self.db.commit()
+
+    @staticmethod
+    def normalize_prompt(prompt: str) -> str:
+        """Reduce a prompt to a canonical form so trivially different phrasings share a key"""
+        text = unicodedata.normalize("NFKC", prompt).lower()
+        words = _NON_WORD.sub(" ", text).split()
+
+        # Drop a leading imperative ("create", "build me a", ...) and filler words
+        while words and (words[0] in _LEADING_VERBS or words[0] in _FILLER_WORDS):
+            words.pop(0)
+        return " ".join(word for word in words if word not in _FILLER_WORDS)
+
+    def make_key(self, prompt: str, template: str, model_config: Dict[str, Any]) -> str:
+        """Build the cache key from the normalized prompt, template and model configuration"""
+        material = json.dumps(
+            [self.normalize_prompt(prompt), template, model_config], sort_keys=True, default=str
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a cached result, checking memory first and then disk"""
+        now = time.time()
+        entry = self.entries.get(key)
+        if entry is not None:
+            if now - entry[0] <= self.ttl:
+                self.entries.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return entry[1]
+            del self.entries[key]
+
+        if self.db is not None:
+            row = await asyncio.to_thread(self._db_get, key, now)
+            if row is not None:
+                created_at, value = row
+                self._remember(key, created_at, value)
+                self.counters["disk_hits"] += 1
+                return value
+
+        self.counters["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        """Store a result in both tiers"""
+        now = time.time()
+        self._remember(key, now, value)
+        self.counters["stores"] += 1
+
+        if self.db is not None:
+            await asyncio.to_thread(self._db_set, key, value, now)
+
+    def clear(self) -> None:
+        """Drop every cached entry"""
+        self.entries.clear()
+        if self.db is not None:
+            with self.db_lock:
+                self.db.execute("DELETE FROM generation_cache")
+                self.db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        lookups = self.counters["memory_hits"] + self.counters["disk_hits"] + self.counters["misses"]
+        hits = self.counters["memory_hits"] + self.counters["disk_hits"]
+        return {
+            **self.counters,
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "disk_enabled": self.db is not None,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+    def _remember(self, key: str, created_at: float, value: Dict[str, Any]) -> None:
+        """Insert into the in-process LRU, evicting the least recently used entries"""
+        self.entries[key] = (created_at, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def _db_get(self, key: str, now: float) -> Optional[Tuple[float, Dict[str, Any]]]:
+        with self.db_lock:
+            row = self.db.execute(
+                "SELECT created_at, value FROM generation_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[0] > self.ttl:
+                self.db.execute("DELETE FROM generation_cache WHERE key = ?", (key,))
+                self.db.commit()
+                return None
+            self.db.execute("UPDATE generation_cache SET last_access = ? WHERE key = ?", (now, key))
+            self.db.commit()
+        return row[0], json.loads(row[1])
+
+    def _db_set(self, key: str, value: Dict[str, Any], now: float) -> None:
+        with self.db_lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO generation_cache (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now)
+            )
+            # Trim expired rows and the least recently used overflow in the same transaction
+            self.db.execute("DELETE FROM generation_cache WHERE created_at < ?", (now - self.ttl,))
+            self.db.execute(
+                "DELETE FROM generation_cache WHERE key IN ("
+                "SELECT key FROM generation_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_db_entries,)
+            )
+            self.db.commit()
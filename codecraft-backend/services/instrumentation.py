@@ -0,0 +1,155 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional
+from services.metrics import HTTP_DURATION, HTTP_EXCEPTIONS, HTTP_IN_FLIGHT, HTTP_REQUESTS, current_spans
+
+logger = logging.getLogger(__name__)
+
+
+class RequestLogger:
+    """Structured request log that samples routine requests and writes from a background task
+
+    Errors and slow requests are always kept; the rest are kept with probability sample_rate.
+    Records beyond max_buffer between flushes are dropped (and counted) rather than slowing requests.
+    """
+
+    def __init__(
+        self,
+        sample_rate: Optional[float] = None,
+        slow_ms: Optional[float] = None,
+        max_buffer: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        logger: Optional[logging.Logger] = None,
+    ):
+        self.sample_rate = sample_rate if sample_rate is not None else float(os.getenv("REQUEST_LOG_SAMPLE_RATE", "0.01"))
+        self.slow_ms = slow_ms or float(os.getenv("REQUEST_LOG_SLOW_MS", "1000"))
+        self.max_buffer = max_buffer or int(os.getenv("REQUEST_LOG_BUFFER", "10000"))
+        self.flush_interval = flush_interval or float(os.getenv("REQUEST_LOG_FLUSH_INTERVAL", "1.0"))
+        self.logger = logger or _default_logger()
+        self.buffer: List[Dict[str, Any]] = []
+        self.dropped = 0
+        self.task: Optional[asyncio.Task] = None
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        """Queue a request record if it is sampled; never blocks"""
+        if entry["status"] < 500 and entry["ms"] < self.slow_ms and random.random() >= self.sample_rate:
+            return
+        if len(self.buffer) >= self.max_buffer:
+            self.dropped += 1
+            return
+        self.buffer.append(entry)
+
+    async def start(self) -> None:
+        """Start the background writer (called from the app lifespan)"""
+        if self.task is None:
+            self.task = asyncio.ensure_future(self._run())
+
+    async def close(self) -> None:
+        """Stop the background writer and write what is left"""
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Write buffered records off the event loop"""
+        if not self.buffer and not self.dropped:
+            return
+        entries, self.buffer = self.buffer, []
+        if self.dropped:
+            entries.append({"event": "request_log_dropped", "count": self.dropped})
+            self.dropped = 0
+        lines = [json.dumps(entry, default=str) for entry in entries]
+        await asyncio.get_running_loop().run_in_executor(None, self._write, lines)
+
+    def _write(self, lines: List[str]) -> None:
+        for line in lines:
+            self.logger.info(line)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Error writing request log")
+
+
+def _default_logger() -> logging.Logger:
+    """JSON lines on stdout unless the deployment configured the logger itself"""
+    logger = logging.getLogger("codecraft.requests")
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+class InstrumentationMiddleware:
+    """ASGI middleware recording per-route latency, status counts and in-flight requests, plus sampled logs
+
+    Routes are labelled by their template (e.g. /api/projects/{project_id}) so metrics stay low-cardinality.
+    Plain ASGI rather than @app.middleware("http"), which adds a task and stream wrapping per request.
+    """
+
+    def __init__(self, app, request_logger: Optional[RequestLogger] = None):
+        self.app = app
+        self.request_logger = request_logger
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+        spans: List[Dict[str, Any]] = []
+        token = current_spans.set(spans)
+        HTTP_IN_FLIGHT.inc()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        failed = False
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            HTTP_IN_FLIGHT.dec()
+            current_spans.reset(token)
+
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            HTTP_DURATION.observe(duration, (method, template))
+            HTTP_REQUESTS.inc(1, (method, template, str(status)))
+            if failed:
+                HTTP_EXCEPTIONS.inc(1, (method, template))
+
+            if self.request_logger is not None:
+                self.request_logger.record({
+                    "ts": time.time(),
+                    "method": method,
+                    "route": template,
+                    "path": scope["path"],
+                    "status": status,
+                    "ms": round(duration * 1000, 3),
+                    "spans": spans,
+                })
@@ -0,0 +1,202 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from services.metrics import metrics
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed", "cancelled")
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+
+JOBS_QUEUED = metrics.gauge("jobs_queued", "Background jobs waiting for a worker")
+JOBS_FINISHED = metrics.counter("jobs_finished_total", "Background jobs by kind and final status", ("kind", "status"))
+
+
+class JobQueueFullError(Exception):
+    """Raised when the job queue is at its depth limit"""
+
+    status_code = 503
+
+
+class Job:
+    """One background job; waiters are woken on every status change"""
+
+    def __init__(self, kind: str, run: Callable[[], Awaitable[Any]], owner: Optional[str] = None):
+        self.id = str(uuid.uuid4())
+        self.kind = kind
+        self.owner = owner
+        self.status = "queued"
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.run = run
+        self.task: Optional[asyncio.Task] = None
+        self.changed = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+    def set_status(self, status: str) -> None:
+        self.status = status
+        if status == "running":
+            self.started_at = datetime.now()
+        elif status in FINISHED_STATUSES:
+            self.finished_at = datetime.now()
+            # Let go of the closure (request data) once it can no longer run
+            self.run = None
+        # Wake current waiters and arm a fresh event for the next change
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    async def wait_for_change(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the status changes; False on timeout"""
+        try:
+            await asyncio.wait_for(self.changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+class JobQueue:
+    """Bounded queue of background jobs run by a fixed pool of asyncio workers
+
+    At most max_depth jobs wait for a worker; further submissions fail fast with JobQueueFullError.
+    Finished jobs are kept for ttl seconds (and at most max_retained of them) so clients can fetch results.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        max_depth: Optional[int] = None,
+        ttl: Optional[float] = None,
+        max_retained: Optional[int] = None,
+    ):
+        self.workers = workers or int(os.getenv("JOB_WORKERS", "4"))
+        self.max_depth = max_depth or int(os.getenv("JOB_QUEUE_DEPTH", "100"))
+        self.ttl = ttl or float(os.getenv("JOB_RESULT_TTL", "3600"))
+        self.max_retained = max_retained or int(os.getenv("JOB_MAX_RETAINED", "1000"))
+        self.jobs: Dict[str, Job] = {}
+        # Finished job ids in finish order, which is also expiry order
+        self.finished: "OrderedDict[str, float]" = OrderedDict()
+        self.queue: Optional[asyncio.Queue] = None
+        self.queued = 0
+        self.tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        """Start the worker pool (called from the app lifespan, or by the first submit)"""
+        if not self.tasks:
+            self.queue = asyncio.Queue()
+            self.tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+
+    async def close(self) -> None:
+        """Stop the workers and cancel queued and running jobs"""
+        for job in list(self.jobs.values()):
+            self.cancel(job.id)
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        self.queue = None
+
+    async def submit(self, kind: str, run: Callable[[], Awaitable[Any]], owner: Optional[str] = None) -> Job:
+        """Queue a coroutine function to run in the background"""
+        await self.start()
+        self._expire()
+        if self.queued >= self.max_depth:
+            raise JobQueueFullError("Job queue is full, please retry shortly")
+        job = Job(kind, run, owner)
+        self.jobs[job.id] = job
+        self._set_queued(self.queued + 1)
+        self.queue.put_nowait(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._expire()
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancel a queued or running job; finished jobs are returned unchanged"""
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return job
+        if job.task is not None:
+            # The worker records the cancellation when the task unwinds
+            job.task.cancel()
+        else:
+            # Still queued: the worker skips it when dequeued
+            self._set_queued(self.queued - 1)
+            self._finish(job, "cancelled")
+        return job
+
+    def stats(self) -> Dict[str, Any]:
+        counts = {status: 0 for status in JOB_STATUSES}
+        for job in self.jobs.values():
+            counts[job.status] += 1
+        return {"workers": self.workers, "max_depth": self.max_depth, **counts}
+
+    def _set_queued(self, queued: int) -> None:
+        self.queued = queued
+        JOBS_QUEUED.set(queued)
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self.queue.get()
+            if job.finished:
+                # Cancelled while queued
+                continue
+            self._set_queued(self.queued - 1)
+            task = job.task = asyncio.ensure_future(job.run())
+            job.set_status("running")
+            try:
+                # wait() rather than await, so cancelling the job does not cancel the worker (and vice versa)
+                await asyncio.wait((task,))
+            except asyncio.CancelledError:
+                task.cancel()
+                self._finish(job, "cancelled")
+                raise
+            finally:
+                job.task = None
+
+            if task.cancelled():
+                self._finish(job, "cancelled")
+            elif task.exception() is not None:
+                job.error = str(task.exception())
+                self._finish(job, "failed")
+            else:
+                job.result = task.result()
+                self._finish(job, "succeeded")
+
+    def _finish(self, job: Job, status: str) -> None:
+        job.set_status(status)
+        JOBS_FINISHED.inc(1, (job.kind, status))
+        self.finished[job.id] = time.monotonic() + self.ttl
+        while len(self.finished) > self.max_retained:
+            job_id, _ = self.finished.popitem(last=False)
+            self.jobs.pop(job_id, None)
+
+    def _expire(self) -> None:
+        """Drop finished jobs whose retention has run out"""
+        now = time.monotonic()
+        while self.finished:
+            job_id, expires = next(iter(self.finished.items()))
+            if expires > now:
+                break
+            del self.finished[job_id]
+            self.jobs.pop(job_id, None)
@@ -0,0 +1,158 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+Labels = Tuple[str, ...]
+
+# Request latencies range from sub-millisecond reads to multi-second AI calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Spans recorded during the current request (set by the instrumentation middleware)
+current_spans: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("current_spans", default=None)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """Monotonic count per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, labels: Labels = ()) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in self.values.items():
+            yield f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    """Value per label set that can go up and down"""
+
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, labels: Labels = ()) -> None:
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+    def set(self, value: float, labels: Labels = ()) -> None:
+        self.values[labels] = value
+
+
+class Histogram:
+    """Bucketed distribution per label set"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # labels -> per-bucket counts (the last slot is +Inf) followed by the sum
+        self.series: Dict[Labels, List[float]] = {}
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self) -> Iterator[str]:
+        for labels, series in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                yield f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(series[-1])}"
+            yield f"{self.name}_count{_format_labels(self.label_names, labels)} {cumulative}"
+
+
+class MetricsRegistry:
+    """In-process metrics rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self.metrics: List[Any] = []
+
+    def counter(self, name: str, help: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, label_names))
+
+    def gauge(self, name: str, help: str, label_names: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help, label_names))
+
+    def histogram(
+        self, name: str, help: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, help, label_names, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+
+@contextmanager
+def span(name: str, histogram: Optional[Histogram] = None, labels: Labels = (), **attributes: Any):
+    """Time a block, observe it in `histogram` and attach it to the current request's trace
+
+    The yielded dict can be updated inside the block to add attributes (e.g. token counts).
+    """
+    start = time.perf_counter()
+    try:
+        yield attributes
+    finally:
+        duration = time.perf_counter() - start
+        if histogram is not None:
+            histogram.observe(duration, labels)
+        spans = current_spans.get()
+        if spans is not None:
+            spans.append({"name": name, "ms": round(duration * 1000, 3), **attributes})
+
+
+metrics = MetricsRegistry()
+
+HTTP_REQUESTS = metrics.counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+HTTP_DURATION = metrics.histogram("http_request_duration_seconds", "HTTP request latency by route", ("method", "route"))
+HTTP_IN_FLIGHT = metrics.gauge("http_requests_in_flight", "HTTP requests currently being served")
+HTTP_EXCEPTIONS = metrics.counter("http_request_exceptions_total", "Requests that raised an unhandled exception", ("method", "route"))
+
+AI_QUEUE_WAIT = metrics.histogram("ai_queue_wait_seconds", "Time AI calls waited for a scheduler slot")
+AI_REJECTED = metrics.counter("ai_rejected_total", "AI calls rejected by the scheduler", ("status",))
+AI_MODEL_DURATION = metrics.histogram("ai_model_duration_seconds", "Model call latency", ("model", "call"))
+AI_PARSE_DURATION = metrics.histogram(
+    "ai_parse_duration_seconds", "Time spent parsing model output",
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+AI_TOKENS = metrics.counter("ai_tokens_total", "Estimated prompt and response tokens", ("model", "direction"))
+
+CONVEX_DURATION = metrics.histogram("convex_call_duration_seconds", "Convex HTTP API call latency", ("kind", "function"))
+CONVEX_ERRORS = metrics.counter("convex_call_errors_total", "Failed Convex calls", ("kind", "function"))
@@ -0,0 +1,187 @@
+import asyncio
+import os
+import posixpath
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from services.ai_output_parser import output_from_data, parse_ai_output, parse_json_object
+from services.context_builder import import_specifiers, resolve_import
+
+PLAN_PROMPT = """Plan the project for the request below. Do not write any code yet.
+
+Request: {prompt}
+
+Return the response in JSON format with the following schema:
+{{
+  "projectTitle": "",
+  "explanation": "",
+  "files": {{
+    "/App.js": {{
+      "spec": ""
+    }},
+    ...
+  }},
+  "generatedFiles": []
+}}
+
+List every file the project needs, including CSS files and package.json. Each spec is a few sentences giving the file's purpose, the names and props it exports, and the project files it imports."""
+
+FILES_PROMPT = """You are writing part of the project "{title}", which is generated one group of files at a time.
+
+{explanation}
+
+Planned files:
+{plan}
+
+Write only these files: {paths}
+Import other project files using exactly the paths and exported names given in the plan.
+Return the response in JSON format with a "files" field mapping each of these paths to {{"code": ""}}."""
+
+SCRIPT_EXTENSIONS = (".js", ".jsx", ".ts", ".tsx")
+
+
+class ProjectPlan:
+    """File list and per-file specs produced by the planning call"""
+
+    def __init__(self, title: str, explanation: str, specs: Dict[str, str]):
+        self.title = title
+        self.explanation = explanation
+        self.specs = specs  # {filename: spec}
+
+    def groups(self) -> List[List[str]]:
+        """Files generated together: a component shares its call with the stylesheet of the same name"""
+        groups: Dict[str, List[str]] = {}
+        for path in self.specs:
+            groups.setdefault(posixpath.splitext(path)[0], []).append(path)
+        return list(groups.values())
+
+    def describe(self) -> str:
+        return "\n".join(f"- {path}: {spec}" if spec else f"- {path}" for path, spec in self.specs.items())
+
+
+def parse_plan(text: str) -> Optional[ProjectPlan]:
+    """Read the planning call's output; returns None if it lists no files"""
+    data = parse_json_object(text)
+    if data is None:
+        return None
+
+    specs: Dict[str, str] = {}
+    files = data.get("files")
+    if isinstance(files, dict):
+        for path, info in files.items():
+            spec = info.get("spec") if isinstance(info, dict) else info
+            specs[path] = spec if isinstance(spec, str) else ""
+    generated = data.get("generatedFiles")
+    if isinstance(generated, list):
+        for path in generated:
+            if isinstance(path, str):
+                specs.setdefault(path, "")
+    if not specs:
+        return None
+
+    # Title and explanation are validated the same way as a full generation
+    output = output_from_data(data)
+    return ProjectPlan(output.project_title, output.explanation, specs)
+
+
+class PlannedGenerator:
+    """Generates a project by planning its files once, then writing groups of files concurrently"""
+
+    def __init__(
+        self,
+        send: Callable[[str, Optional[str]], Awaitable[str]],
+        concurrency: Optional[int] = None,
+        retries: int = 1,
+        queue_per_user: Optional[int] = None,
+    ):
+        self.send = send  # (prompt, user_key) -> response text, through the AI scheduler
+        # Bounds one request's share of the scheduler; kept below the per-user queue limit so a large
+        # plan does not fill the user's queue and lock out their other requests
+        self.concurrency = concurrency or int(os.getenv("PLANNED_GENERATION_CONCURRENCY", "4"))
+        if queue_per_user:
+            self.concurrency = max(1, min(self.concurrency, queue_per_user - 1))
+        self.retries = retries
+
+    def plan_prompt(self, prompt: str) -> str:
+        """Prompt for the planning call; its response is read with parse_plan"""
+        return PLAN_PROMPT.format(prompt=prompt)
+
+    async def generate_files(self, plan: ProjectPlan, user_key: Optional[str] = None) -> AsyncIterator[Dict[str, str]]:
+        """Yield each group's files as soon as its call finishes"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(group: List[str]) -> Dict[str, str]:
+            async with semaphore:
+                return await self._generate_group(plan, group, user_key)
+
+        tasks = [asyncio.ensure_future(run(group)) for group in plan.groups()]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            # A failed group (or a caller that went away) cancels the calls still running
+            for task in tasks:
+                task.cancel()
+
+    async def _generate_group(self, plan: ProjectPlan, group: List[str], user_key: Optional[str]) -> Dict[str, str]:
+        """Generate one group of files, retrying once for files the model left out"""
+        prompt = FILES_PROMPT.format(
+            title=plan.title, explanation=plan.explanation, plan=plan.describe(), paths=", ".join(group)
+        )
+        # The model may drop or add the leading slash, so match paths without it
+        wanted = {path.lstrip("/"): path for path in group}
+        files: Dict[str, str] = {}
+        for _ in range(self.retries + 1):
+            output = parse_ai_output(await self.send(prompt, user_key))
+            if output is not None:
+                for filename, code in output.files.items():
+                    path = wanted.get(filename.lstrip("/"))
+                    if path:
+                        files[path] = code
+            if len(files) == len(group):
+                break
+        return files
+
+
+def reconcile_imports(files: Dict[str, str]) -> Tuple[Dict[str, str], List[str]]:
+    """Point relative imports at files that exist and add empty stylesheets for missing CSS imports
+
+    Returns the updated files and the imports that could not be resolved ("file: specifier").
+    """
+    fixed = dict(files)
+    by_stem: Dict[str, List[str]] = {}
+    for path in files:
+        by_stem.setdefault(posixpath.splitext(posixpath.basename(path))[0], []).append(path)
+
+    unresolved: List[str] = []
+    for path, code in files.items():
+        if not path.endswith(SCRIPT_EXTENSIONS):
+            continue
+        for specifier in sorted(set(import_specifiers(code))):
+            if not specifier.startswith(".") or resolve_import(path, specifier, fixed):
+                continue
+
+            stem, extension = posixpath.splitext(posixpath.basename(specifier))
+            candidates = [
+                candidate for candidate in by_stem.get(stem, [])
+                if candidate.endswith(extension or SCRIPT_EXTENSIONS)
+            ]
+            if len(candidates) == 1:
+                # Same file name in another folder: a path the separately generated files disagreed on
+                replacement = _relative_specifier(path, candidates[0], keep_extension=bool(extension))
+                fixed[path] = (
+                    fixed[path]
+                    .replace(f"'{specifier}'", f"'{replacement}'")
+                    .replace(f'"{specifier}"', f'"{replacement}"')
+                )
+            elif extension == ".css":
+                fixed[posixpath.normpath(posixpath.join(posixpath.dirname(path), specifier))] = ""
+            else:
+                unresolved.append(f"{path}: {specifier}")
+    return fixed, unresolved
+
+
+def _relative_specifier(importer: str, target: str, keep_extension: bool) -> str:
+    """Relative import specifier from one project file to another"""
+    specifier = posixpath.relpath(target, posixpath.dirname(importer) or ".")
+    if not keep_extension and specifier.endswith(SCRIPT_EXTENSIONS):
+        specifier = posixpath.splitext(specifier)[0]
+    return specifier if specifier.startswith(".") else f"./{specifier}"
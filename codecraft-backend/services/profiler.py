@@ -0,0 +1,319 @@
+import asyncio
+import hmac
+import marshal
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+# (filename, first line, function name), the key format pstats uses
+FrameKey = Tuple[str, int, str]
+Stack = Tuple[FrameKey, ...]
+
+AWAIT_FRAME: FrameKey = ("~", 0, "<awaiting I/O or another task>")
+
+# Profile of the request being handled in the current context (set by ProfilingMiddleware)
+active_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("active_profile", default=None)
+
+_ASYNCIO_DIR = os.path.dirname(asyncio.__file__)
+
+
+class RequestProfile:
+    """Wall-clock stack samples for one request"""
+
+    def __init__(self, method: str, path: str, root_task: Optional[asyncio.Task]):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.route: Optional[str] = None
+        self.status: Optional[int] = None
+        self.created_at = time.time()
+        self.started = time.perf_counter()
+        self.duration: Optional[float] = None
+        # The request task and every task created while handling it, mapped to the task that created it
+        self.parents: Dict[asyncio.Task, Optional[asyncio.Task]] = {root_task: None} if root_task is not None else {}
+        self.stacks: Dict[Stack, float] = {}  # stack (root first) -> sampled seconds
+        self.samples = 0
+
+    def add(self, stack: Stack, weight: float) -> None:
+        self.stacks[stack] = self.stacks.get(stack, 0.0) + weight
+        self.samples += 1
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "created_at": self.created_at,
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "samples": self.samples,
+        }
+
+    def to_speedscope(self) -> Dict[str, Any]:
+        """Sampled profile in the speedscope file format (https://www.speedscope.app)"""
+        frame_index: Dict[FrameKey, int] = {}
+        samples: List[List[int]] = []
+        weights: List[float] = []
+        for stack, weight in self.stacks.items():
+            samples.append([frame_index.setdefault(frame, len(frame_index)) for frame in stack])
+            weights.append(weight)
+        name = f"{self.method} {self.path}"
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "codecraft-backend",
+            "shared": {
+                "frames": [{"name": function, "file": filename, "line": line} for filename, line, function in frame_index]
+            },
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": self.duration or sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }],
+        }
+
+    def to_pstats(self) -> bytes:
+        """Samples aggregated into the marshalled format pstats.Stats loads
+
+        Call counts are sample counts; times are sampled wall-clock seconds.
+        """
+        stats: Dict[FrameKey, List[Any]] = {}
+        for stack, weight in self.stacks.items():
+            seen = set()
+            for depth, frame in enumerate(stack):
+                entry = stats.setdefault(frame, [0, 0, 0.0, 0.0, {}])
+                leaf = depth == len(stack) - 1
+                if frame not in seen:
+                    seen.add(frame)
+                    entry[0] += 1
+                    entry[1] += 1
+                    entry[3] += weight
+                if leaf:
+                    entry[2] += weight
+                if depth:
+                    caller = entry[4].setdefault(stack[depth - 1], [0, 0, 0.0, 0.0])
+                    caller[0] += 1
+                    caller[1] += 1
+                    caller[2] += weight if leaf else 0.0
+                    caller[3] += weight
+        return marshal.dumps({
+            frame: (cc, nc, tt, ct, {caller: tuple(values) for caller, values in callers.items()})
+            for frame, (cc, nc, tt, ct, callers) in stats.items()
+        })
+
+
+class RequestProfiler:
+    """Opt-in per-request wall-clock profiler with a bounded buffer of finished profiles
+
+    A request is profiled when it sends X-Profile equal to PROFILE_TOKEN or is picked by
+    PROFILE_SAMPLE_RATE; without a token only sampling is possible and no one can read profiles.
+    While any profile is active a background thread samples the event loop thread every
+    PROFILE_INTERVAL seconds. A sample counts for a request when the running task belongs to it;
+    when none of its tasks is running, the await chains of its waiting tasks are recorded instead,
+    so time spent waiting on the model or Convex shows up too.
+    """
+
+    def __init__(
+        self,
+        sample_rate: Optional[float] = None,
+        interval: Optional[float] = None,
+        buffer_size: Optional[int] = None,
+        token: Optional[str] = None,
+    ):
+        self.sample_rate = sample_rate if sample_rate is not None else float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+        self.interval = interval or float(os.getenv("PROFILE_INTERVAL", "0.005"))
+        self.token = token if token is not None else os.getenv("PROFILE_TOKEN", "")
+        self.profiles: Deque[RequestProfile] = deque(maxlen=buffer_size or int(os.getenv("PROFILE_BUFFER_SIZE", "50")))
+        self.active: List[RequestProfile] = []
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.loop_thread_id: Optional[int] = None
+        self.sampler: Optional[threading.Thread] = None
+        self.lock = threading.Lock()
+
+    def should_profile(self, header: Optional[str]) -> bool:
+        if header is not None and self.authorized(header):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def authorized(self, token: Optional[str]) -> bool:
+        """Whether a caller may trigger profiles or read them (no one, unless PROFILE_TOKEN is set)"""
+        if not self.token:
+            return False
+        return token is not None and hmac.compare_digest(token, self.token)
+
+    def begin(self, method: str, path: str) -> RequestProfile:
+        """Start profiling the current task (called from the event loop)"""
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self._install(loop)
+        profile = RequestProfile(method, path, asyncio.current_task())
+        with self.lock:
+            self.active.append(profile)
+            if self.sampler is None or not self.sampler.is_alive():
+                self.sampler = threading.Thread(target=self._sample_loop, name="request-profiler", daemon=True)
+                self.sampler.start()
+        return profile
+
+    def finish(self, profile: RequestProfile, status: Optional[int], route: Optional[str]) -> None:
+        profile.duration = time.perf_counter() - profile.started
+        profile.status = status
+        profile.route = route
+        with self.lock:
+            self.active.remove(profile)
+        profile.parents = {}
+        self.profiles.append(profile)
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        for profile in self.profiles:
+            if profile.id == profile_id:
+                return profile
+        return None
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Summaries of buffered profiles, newest first"""
+        return [profile.summary() for profile in reversed(self.profiles)]
+
+    def _install(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Hook task creation so tasks spawned by a profiled request are attributed to it"""
+        self.loop = loop
+        self.loop_thread_id = threading.get_ident()
+        previous = loop.get_task_factory()
+
+        def task_factory(loop, coro, **kwargs):
+            if previous is not None:
+                task = previous(loop, coro, **kwargs)
+            else:
+                task = asyncio.Task(coro, loop=loop, **kwargs)
+            # Runs in the creating task's context, so this is the profile of the request that spawned it
+            profile = active_profile.get()
+            if profile is not None:
+                profile.parents[task] = asyncio.current_task(loop)
+            return task
+
+        loop.set_task_factory(task_factory)
+
+    def _sample_loop(self) -> None:
+        """Sampler thread: runs while any profile is active"""
+        while True:
+            time.sleep(self.interval)
+            with self.lock:
+                active = list(self.active)
+                if not active:
+                    self.sampler = None
+                    return
+            try:
+                self._sample(active)
+            except Exception:
+                # The loop thread changes frames and tasks under us; skip a torn sample
+                continue
+
+    def _sample(self, active: List[RequestProfile]) -> None:
+        running = asyncio.current_task(self.loop)
+        frame = sys._current_frames().get(self.loop_thread_id)
+        for profile in active:
+            parents = dict(profile.parents)
+            if running is not None and running in parents and frame is not None:
+                profile.add(_parent_stack(parents, running) + _frame_stack(frame), self.interval)
+                continue
+
+            # None of the request's tasks is on the CPU: record where each waiting branch is blocked.
+            # A task with pending children is waiting on them, so only the innermost tasks count.
+            pending = [task for task in parents if not task.done()]
+            waiting_on_children = {parents[task] for task in pending}
+            leaves = [
+                _parent_stack(parents, task) + _await_stack(task) + (AWAIT_FRAME,)
+                for task in pending if task not in waiting_on_children
+            ]
+            for stack in leaves:
+                profile.add(stack, self.interval / len(leaves))
+
+
+def _frame_key(frame) -> FrameKey:
+    code = frame.f_code
+    return code.co_filename, code.co_firstlineno, getattr(code, "co_qualname", code.co_name)
+
+
+def _frame_stack(frame) -> Stack:
+    """Stack of a running frame, root first, without the event loop's own frames"""
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    frames.reverse()
+    start = 0
+    while start < len(frames) - 1 and frames[start].f_code.co_filename.startswith(_ASYNCIO_DIR):
+        start += 1
+    return tuple(_frame_key(frame) for frame in frames[start:])
+
+
+def _await_stack(task: asyncio.Task) -> Stack:
+    """Coroutine chain a suspended task is waiting in, outermost first"""
+    awaitable: Any = task.get_coro()
+    frames: List[FrameKey] = []
+    while awaitable is not None:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None)
+        if frame is None:
+            break
+        frames.append(_frame_key(frame))
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None)
+    return tuple(frames)
+
+
+def _parent_stack(parents: Dict[asyncio.Task, Optional[asyncio.Task]], task: asyncio.Task) -> Stack:
+    """Where the tasks that spawned `task` are waiting, so child work nests under the request's call path"""
+    stack: Stack = ()
+    parent = parents.get(task)
+    while parent is not None:
+        stack = _await_stack(parent) + stack
+        parent = parents.get(parent)
+    return stack
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles opted-in or sampled requests and returns the profile id in X-Profile-Id"""
+
+    def __init__(self, app, profiler: RequestProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        header = None
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                header = value.decode("latin-1")
+                break
+        if not self.profiler.should_profile(header):
+            await self.app(scope, receive, send)
+            return
+
+        profile = self.profiler.begin(scope["method"], scope["path"])
+        token = active_profile.set(profile)
+        status = None
+
+        async def send_with_profile_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile.id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            active_profile.reset(token)
+            self.profiler.finish(profile, status, getattr(scope.get("route"), "path", None))
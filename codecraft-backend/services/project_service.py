@@ -1,116 +1,426 @@
+import hashlib
 import json
+import os
 import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Dict, List, Optional
-from models.ai_model import GenAICodeClass
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from models.ai_model import CODE_GEN_HISTORY, CONTINUATION_PROMPT, estimate_tokens, get_code_model
 from models.project import (
     ProjectCreate, ProjectUpdate, ProjectResponse, 
     GenerateCodeRequest, GenerateCodeResponse,
     ChatRequest, ChatResponse, ProjectFile, ChatMessage
 )
+from services.chat_session_manager import ChatSessionManager
+from services.ai_scheduler import AIScheduler, SchedulerBusyError
+from services.stream_parser import IncrementalProjectParser
+from services.generation_cache import GenerationCache
+from services.context_builder import ContextBuilder
+from services.single_flight import SingleFlight
+from services.ai_output_parser import AIOutput, output_from_data, parse_ai_output, strip_overlap
+from services.planned_generation import PlannedGenerator, parse_plan, reconcile_imports
+from services.metrics import AI_MODEL_DURATION, AI_PARSE_DURATION, AI_TOKENS, span
+
+# Characters of a streamed continuation buffered before checking it for repeated overlap
+CONTINUATION_HEAD_CHARS = 512
+
 
 class ProjectService:
     """Service for handling project operations"""
     
     def __init__(self):
-        self.ai_model = GenAICodeClass()
+        # Initial generation and chat edits can run on different models (AI_MODEL_GENERATE / AI_MODEL_CHAT)
+        self.ai_model = get_code_model("generate")
+        self.chat_model = get_code_model("chat")
+        self.sessions = ChatSessionManager(self.ai_model)
+        # Sessions belong to one model, so a separate chat model needs its own pool
+        self.chat_sessions = (
+            self.sessions if self.chat_model is self.ai_model else ChatSessionManager(self.chat_model)
+        )
+        self.scheduler = AIScheduler()
+        self.cache = GenerationCache()
+        self.context_builder = ContextBuilder()
+        self.flights = SingleFlight()
+        # File-group calls use the queue places reserved when the request was admitted (see _generate_planned)
+        self.planner = PlannedGenerator(
+            lambda prompt, user_key: self._send_unseeded(prompt, user_key, admitted=True),
+            queue_per_user=self.scheduler.max_queue_per_user
+        )
+        # Limits on resuming responses that stopped at max_output_tokens
+        self.max_continuations = int(os.getenv("GENERATION_MAX_CONTINUATIONS", "3"))
+        self.continuation_token_budget = int(os.getenv("GENERATION_CONTINUATION_TOKEN_BUDGET", "32000"))
+        self.seed_prompt_hash = hashlib.sha256(
+            json.dumps(CODE_GEN_HISTORY, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+    
+    @asynccontextmanager
+    async def _model_session(
+        self,
+        project_id: Optional[str] = None,
+        chat_history: Optional[List[Dict[str, Any]]] = None,
+        user_key: Optional[str] = None,
+        chat: bool = False
+    ):
+        """Hold a scheduler slot (and the project's session lock) and yield the chat session to use"""
+        if not project_id:
+            async with self.scheduler.slot(user_key):
+                yield (self.chat_model if chat else self.ai_model).start_session()
+            return
+        
+        session = (self.chat_sessions if chat else self.sessions).get_session(project_id, chat_history)
+        async with session.lock:
+            async with self.scheduler.slot(user_key):
+                yield session.chat_session
+    
+    async def _send_message(
+        self,
+        prompt: str,
+        project_id: Optional[str] = None,
+        chat_history: Optional[List[Dict[str, Any]]] = None,
+        user_key: Optional[str] = None,
+        chat: bool = False
+    ) -> str:
+        """Send a prompt through the scheduler to the project's session or a fresh one and return the response text"""
+        model = self.chat_model if chat else self.ai_model
+        async with self._model_session(project_id, chat_history, user_key, chat) as chat_session:
+            text = await self._send_in_session(model, prompt, chat_session)
         
-    async def generate_code(self, request: GenerateCodeRequest) -> GenerateCodeResponse:
+        if project_id:
+            (self.chat_sessions if chat else self.sessions).record_turn(project_id, prompt, text)
+        return text
+    
+    async def _send_unseeded(self, prompt: str, user_key: Optional[str] = None, admitted: bool = False) -> str:
+        """Send a prompt through the scheduler in a fresh session without the CODE_GEN_HISTORY seed
+
+        Used for the planner's prompts, which spell out their own response format, so the seed's few
+        thousand tokens are not resent with every call.
+        """
+        async with self.scheduler.slot(user_key, admitted):
+            return await self._send_in_session(self.ai_model, prompt, self.ai_model.start_session(seeded=False))
+    
+    async def _send_in_session(self, model, prompt: str, chat_session) -> str:
+        """Send a prompt in a session the caller holds a scheduler slot for
+
+        Responses cut off at max_output_tokens are continued in the same session and stitched together.
+        """
+        parser = IncrementalProjectParser()
+        ai_response = await self._call_model(model, prompt, chat_session)
+        parser.feed(ai_response.text)
+        
+        rounds = 0
+        while model.is_truncated(ai_response) and self._should_continue(parser, rounds):
+            ai_response = await self._call_model(
+                model, CONTINUATION_PROMPT, chat_session, model.continuation_config, "continuation"
+            )
+            parser.feed(strip_overlap(parser.text, ai_response.text))
+            rounds += 1
+        return parser.text
+    
+    async def _call_model(
+        self,
+        model,
+        prompt: str,
+        chat_session,
+        generation_config: Optional[Dict[str, Any]] = None,
+        call: str = "send"
+    ):
+        """One model call, traced with its latency and estimated token counts"""
+        with span(
+            "ai.model", AI_MODEL_DURATION, (model.model_name, call),
+            model=model.model_name, call=call, prompt_tokens=estimate_tokens(prompt)
+        ) as attributes:
+            response = await model.send_message_async(prompt, chat_session, generation_config)
+            attributes["response_tokens"] = estimate_tokens(response.text)
+        AI_TOKENS.inc(attributes["prompt_tokens"], (model.model_name, "prompt"))
+        AI_TOKENS.inc(attributes["response_tokens"], (model.model_name, "response"))
+        return response
+    
+    def _should_continue(self, parser: IncrementalProjectParser, rounds: int) -> bool:
+        """Whether a truncated response is worth another continuation round"""
+        return (
+            not parser.complete
+            and rounds < self.max_continuations
+            and estimate_tokens(parser.text) < self.continuation_token_budget
+        )
+        
+    async def generate_code(
+        self, request: GenerateCodeRequest, chat_history: Optional[List[Dict[str, Any]]] = None
+    ) -> GenerateCodeResponse:
         """Generate code using AI based on user prompt"""
         try:
-            # Send message to AI model
-            ai_response = self.ai_model.send_message(request.prompt)
+            # Generations without prior conversation depend only on the prompt, so they are cacheable
+            cache_key = self._cache_key(request) if not chat_history else None
+            if cache_key and not request.bypass_cache:
+                cached = await self.cache.get(cache_key)
+                if cached is not None:
+                    return GenerateCodeResponse.model_construct(**cached)
             
-            # Parse the JSON response from AI
-            response_data = json.loads(ai_response.text)
+            if cache_key:
+                # Identical generations already in flight (e.g. a double submit) share one model call
+                return await self.flights.do(
+                    (cache_key, request.project_id),
+                    lambda: self._generate(request, chat_history, cache_key)
+                )
+            return await self._generate(request, chat_history, None)
             
-            # Extract project information
-            project_title = response_data.get("project_title", "Untitled Project")
-            explanation = response_data.get("explanation", "")
-            files_data = response_data.get("files", {})
+        except SchedulerBusyError:
+            raise
+        except Exception as e:
+            raise Exception(f"Error generating code: {str(e)}")
+    
+    async def _generate(
+        self,
+        request: GenerateCodeRequest,
+        chat_history: Optional[List[Dict[str, Any]]],
+        cache_key: Optional[str]
+    ) -> GenerateCodeResponse:
+        """Call the model for a generation and cache the parsed result"""
+        if request.mode == "planned":
+            output = None
+            async for kind, _, value in self._generate_planned(request):
+                if kind == "output":
+                    output = value
+        else:
+            # Send message to the project's chat session, or a fresh one for standalone generations
+            response_text = await self._send_message(
+                request.prompt, request.project_id, chat_history, request.user_clerk_id
+            )
+            with span("ai.parse", AI_PARSE_DURATION):
+                output = parse_ai_output(response_text)
+        
+        if output is None:
+            return self._fallback_response(request.prompt)
+        
+        # The parser already type-checked every field, so the model is built without re-validation
+        payload = output.to_generate_dict()
+        if cache_key and output.complete:
+            await self.cache.set(cache_key, payload)
+        return GenerateCodeResponse.model_construct(**payload)
+    
+    async def generate_code_stream(
+        self, request: GenerateCodeRequest, chat_history: Optional[List[Dict[str, Any]]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Generate code, yielding the title, explanation and each file as soon as the model completes them"""
+        cache_key = self._cache_key(request) if not chat_history else None
+        if cache_key and not request.bypass_cache:
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                # Replay the cached result in the same event order the model would produce
+                yield {"event": "started"}
+                yield {"event": "field", "name": "projectTitle", "value": cached["project_title"]}
+                yield {"event": "field", "name": "explanation", "value": cached["explanation"]}
+                for name, file_info in cached["files"].items():
+                    yield {"event": "file", "name": name, "file": file_info}
+                yield {"event": "field", "name": "generatedFiles", "value": cached["generated_files"]}
+                yield {"event": "done", "response": cached}
+                return
+        
+        if request.mode == "planned":
+            output = None
+            # "started" comes from the planner once the planning call is admitted, so rejections are still HTTP errors
+            async for kind, name, value in self._generate_planned(request):
+                if kind == "output":
+                    output = value
+                elif kind == "started":
+                    yield {"event": "started"}
+                else:
+                    for event in self._stream_events([(kind, name, value)]):
+                        yield event
+            if output is not None:
+                payload = output.to_generate_dict()
+                if cache_key and output.complete:
+                    await self.cache.set(cache_key, payload)
+            else:
+                payload = self._fallback_response(request.prompt).dict()
+            yield {"event": "done", "response": payload}
+            return
+        
+        parser = IncrementalProjectParser()
+        
+        async with self._model_session(request.project_id, chat_history, request.user_clerk_id) as chat_session:
+            yield {"event": "started"}
             
-            # Convert files to the expected format
-            files = {}
-            generated_files = []
+            prompt, generation_config = request.prompt, None
+            rounds = 0
+            while True:
+                outcome: Dict[str, Any] = {}
+                # The head of a continuation is held back until any repeated overlap can be stripped
+                head: Optional[str] = "" if rounds else None
+                received = len(parser.text)
+                model_name = self.ai_model.model_name
+                with span(
+                    "ai.model", AI_MODEL_DURATION, (model_name, "stream"),
+                    model=model_name, call="stream", prompt_tokens=estimate_tokens(prompt)
+                ) as attributes:
+                    async for chunk in self.ai_model.stream_message_async(prompt, chat_session, outcome, generation_config):
+                        if head is not None:
+                            head += chunk
+                            if len(head) < CONTINUATION_HEAD_CHARS:
+                                continue
+                            chunk, head = strip_overlap(parser.text, head), None
+                        for event in self._stream_events(parser.feed(chunk)):
+                            yield event
+                    if head:
+                        for event in self._stream_events(parser.feed(strip_overlap(parser.text, head))):
+                            yield event
+                    attributes["response_tokens"] = estimate_tokens(parser.text[received:])
+                AI_TOKENS.inc(attributes["prompt_tokens"], (model_name, "prompt"))
+                AI_TOKENS.inc(attributes["response_tokens"], (model_name, "response"))
+                
+                if not outcome.get("truncated") or not self._should_continue(parser, rounds):
+                    break
+                prompt, generation_config = CONTINUATION_PROMPT, self.ai_model.continuation_config
+                rounds += 1
+        
+        if request.project_id:
+            self.sessions.record_turn(request.project_id, request.prompt, parser.text)
+        
+        # Assemble the final response from what the incremental parser already decoded
+        output = output_from_data(parser.result, complete=parser.complete)
+        if output.files or output.explanation:
+            payload = output.to_generate_dict()
+            if cache_key and output.complete:
+                await self.cache.set(cache_key, payload)
+        else:
+            payload = self._fallback_response(request.prompt).dict()
+        
+        yield {"event": "done", "response": payload}
+    
+    async def _generate_planned(self, request: GenerateCodeRequest) -> AsyncIterator[Tuple[str, str, Any]]:
+        """Plan the files, generate them concurrently and reconcile their imports
+
+        Yields ("started", "", None) once the scheduler admitted the request, the same ("field" | "file",
+        name, value) events as the incremental parser, then ("output", "", AIOutput or None) with the
+        merged result.
+        """
+        # The request is admitted (or rejected) once, for the planning call and all its file-group calls,
+        # which then wait in the reserved queue places
+        async with self.scheduler.reserve(request.user_clerk_id, self.planner.concurrency):
+            fallback_text = None
+            async with self.scheduler.slot(request.user_clerk_id, admitted=True):
+                yield "started", "", None
+                plan = parse_plan(await self._send_in_session(
+                    self.ai_model, self.planner.plan_prompt(request.prompt), self.ai_model.start_session(seeded=False)
+                ))
+                if plan is None:
+                    # Nothing to fan out, so fall back to a single call in a fresh seeded session, keeping the slot
+                    fallback_text = await self._send_in_session(
+                        self.ai_model, request.prompt, self.ai_model.start_session()
+                    )
+            if plan is None:
+                yield "output", "", parse_ai_output(fallback_text)
+                return
             
-            for filename, file_info in files_data.items():
-                if isinstance(file_info, dict) and "code" in file_info:
-                    files[filename] = {"code": file_info["code"]}
-                    generated_files.append(filename)
-                elif isinstance(file_info, str):
-                    files[filename] = {"code": file_info}
-                    generated_files.append(filename)
+            yield "field", "projectTitle", plan.title
+            yield "field", "explanation", plan.explanation
             
-            return GenerateCodeResponse(
-                project_title=project_title,
-                explanation=explanation,
-                files=files,
-                generated_files=generated_files
-            )
+            files: Dict[str, str] = {}
+            async for group_files in self.planner.generate_files(plan, request.user_clerk_id):
+                files.update(group_files)
+                for name, code in group_files.items():
+                    yield "file", name, {"code": code}
             
-        except json.JSONDecodeError as e:
-            # Fallback if AI doesn't return valid JSON
-            return GenerateCodeResponse(
-                project_title="Generated Project",
-                explanation=f"Generated code based on: {request.prompt}",
-                files={
-                    "App.js": {"code": "// Generated code will appear here\nexport default function App() {\n  return <div>Hello World</div>;\n}"}
-                },
-                generated_files=["App.js"]
-            )
-        except Exception as e:
-            raise Exception(f"Error generating code: {str(e)}")
+            # Files were written separately, so make their relative imports agree
+            reconciled, _ = reconcile_imports(files)
+            for name, code in reconciled.items():
+                if files.get(name) != code:
+                    yield "file", name, {"code": code}
+            yield "field", "generatedFiles", list(reconciled)
+            
+            # A result missing planned files is returned but, like truncated output, not cached
+            complete = all(path in reconciled for path in plan.specs)
+            yield "output", "", AIOutput(plan.title, plan.explanation, reconciled, complete)
     
-    async def chat_with_ai(self, request: ChatRequest, current_files: Dict[str, ProjectFile]) -> ChatResponse:
-        """Chat with AI about project modifications"""
+    def _stream_events(self, parsed: List[Any]) -> List[Dict[str, Any]]:
+        """Stream events for the fields and files the incremental parser just completed"""
+        return [
+            {"event": "file", "name": name, "file": value} if kind == "file"
+            else {"event": "field", "name": name, "value": value}
+            for kind, name, value in parsed
+        ]
+    
+    def _cache_key(self, request: GenerateCodeRequest) -> str:
+        """Cache key for a standalone generation under the current model configuration"""
+        model_config = {
+            "model_name": self.ai_model.model_name,
+            "generation_config": self.ai_model.generation_config,
+            "seed_prompt": self.seed_prompt_hash,
+        }
+        if request.mode != "single":
+            model_config["mode"] = request.mode
+        return self.cache.make_key(request.prompt, request.template, model_config)
+    
+    def _fallback_response(self, prompt: str) -> GenerateCodeResponse:
+        """Stub project returned when the AI doesn't produce valid JSON"""
+        return GenerateCodeResponse(
+            project_title="Generated Project",
+            explanation=f"Generated code based on: {prompt}",
+            files={
+                "App.js": {"code": "// Generated code will appear here\nexport default function App() {\n  return <div>Hello World</div>;\n}"}
+            },
+            generated_files=["App.js"]
+        )
+    
+    async def chat_with_ai(
+        self,
+        project_id: str,
+        request: ChatRequest,
+        current_files: Dict[str, ProjectFile],
+        chat_history: Optional[List[Dict[str, Any]]] = None,
+        user_key: Optional[str] = None
+    ) -> ChatResponse:
+        """Chat with AI about project modifications; session and context state are keyed by project_id"""
         try:
-            # Prepare context with current files
-            files_context = "\n\nCurrent project files:\n"
-            for filename, file_obj in current_files.items():
-                files_context += f"\n{filename}:\n```{file_obj.language}\n{file_obj.content}\n```\n"
+            # Prepare context with the most relevant files that fit the token budget
+            context = self.context_builder.build(request.message, current_files, project_id)
             
             # Create prompt with context
-            full_prompt = f"{request.message}{files_context}\n\nPlease provide your response and any updated files in the same JSON format."
+            full_prompt = f"{request.message}{context.text}\n\nPlease provide your response and any updated files in the same JSON format."
             
-            # Send to AI
-            ai_response = self.ai_model.send_message(full_prompt)
+            # Send to the project's pooled chat session
+            response_text = await self._send_message(
+                full_prompt, project_id, chat_history, user_key, chat=True
+            )
             
-            # Parse response
-            try:
-                response_data = json.loads(ai_response.text)
-                explanation = response_data.get("explanation", ai_response.text)
-                files_data = response_data.get("files", {})
-                
-                # Convert updated files
-                updated_files = {}
-                for filename, file_info in files_data.items():
-                    if isinstance(file_info, dict) and "code" in file_info:
-                        # Normalize filename by removing leading slash if present
-                        normalized_filename = filename.lstrip('/')
-                        # Determine language from file extension
-                        language = self._get_language_from_filename(normalized_filename)
-                        updated_files[normalized_filename] = ProjectFile(
-                            name=normalized_filename,
-                            content=file_info["code"],
-                            language=language
-                        )
-                
-                return ChatResponse(
-                    message=explanation,
-                    sender="ai",
-                    timestamp=datetime.now(),
-                    updated_files=updated_files if updated_files else None
-                )
-                
-            except json.JSONDecodeError:
+            # Parse response, keeping any complete files even if the output was cut short
+            with span("ai.parse", AI_PARSE_DURATION):
+                output = parse_ai_output(response_text)
+            if output is None:
                 # If not JSON, treat as plain text response
                 return ChatResponse(
-                    message=ai_response.text,
+                    message=response_text,
                     sender="ai",
                     timestamp=datetime.now(),
-                    updated_files=None
+                    updated_files=None,
+                    context_tokens=context.tokens,
+                    omitted_files=context.summarized + context.omitted or None
+                )
+            
+            # Convert updated files
+            updated_files = {}
+            for filename, code in output.files.items():
+                # Normalize filename by removing leading slash if present
+                normalized_filename = filename.lstrip('/')
+                # Determine language from file extension
+                language = self._get_language_from_filename(normalized_filename)
+                updated_files[normalized_filename] = ProjectFile.model_construct(
+                    name=normalized_filename,
+                    content=code,
+                    language=language
                 )
+            
+            self.context_builder.note_changed(project_id, list(updated_files))
+            return ChatResponse(
+                message=output.explanation or response_text,
+                sender="ai",
+                timestamp=datetime.now(),
+                updated_files=updated_files if updated_files else None,
+                context_tokens=context.tokens,
+                omitted_files=context.summarized + context.omitted or None
+            )
                 
+        except SchedulerBusyError:
+            raise
         except Exception as e:
             raise Exception(f"Error in chat: {str(e)}")
     
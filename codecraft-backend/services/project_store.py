@@ -0,0 +1,789 @@
+import asyncio
+import base64
+import bisect
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from services.blob_store import BlobStore, FileRecord, MessageRecord
+from services.version_history import VersionHistory
+
+
+class RevisionConflictError(Exception):
+    """Raised when a conditional write targets an outdated project revision"""
+
+    def __init__(self, current_revision: int):
+        super().__init__(f"Project has changed (current revision {current_revision})")
+        self.current_revision = current_revision
+
+
+class ProjectStore(ABC):
+    """Storage interface for projects, their files and chat history
+
+    Projects are exchanged as plain dicts with the ProjectResponse fields plus a
+    "revision" counter that increases on every write. "files" maps a path to
+    {"name", "content", "language"} and "chat_history" is a list of
+    {"id", "content", "sender", "timestamp"} in chronological order. Stores accept
+    these as dicts and return them as FileRecord / MessageRecord, which read the
+    same way (and as attributes, like ProjectFile / ChatMessage).
+    Returned data must be treated as read-only; all writes go through the store.
+    """
+
+    @abstractmethod
+    async def create_project(self, project: Dict[str, Any]) -> None:
+        """Insert a new project together with its initial files and chat messages"""
+
+    @abstractmethod
+    async def get_project(
+        self, project_id: str, include_files: bool = True, include_chat: bool = True
+    ) -> Optional[Dict[str, Any]]:
+        """Return a project, or None if it does not exist
+
+        Stores may leave "files" / "chat_history" empty when they are not requested.
+        """
+
+    @abstractmethod
+    async def get_file(self, project_id: str, path: str) -> Optional[FileRecord]:
+        """Return a single file of a project, or None if the project or file does not exist"""
+
+    @abstractmethod
+    async def get_files(self, project_id: str, paths: List[str]) -> Dict[str, FileRecord]:
+        """Return the requested files that exist, keyed by path"""
+
+    @abstractmethod
+    async def get_chat_page(
+        self, project_id: str, limit: int, before: Optional[int] = None
+    ) -> Optional[Tuple[List[MessageRecord], int]]:
+        """Return up to `limit` chat messages preceding position `before` (default: the end)
+
+        Messages are in chronological order. Returns (messages, total message count),
+        or None if the project does not exist.
+        """
+
+    @abstractmethod
+    async def list_user_projects(
+        self, user_clerk_id: str, include_files: bool = True, include_chat: bool = True
+    ) -> List[Dict[str, Any]]:
+        """Return every project owned by a user, newest first"""
+
+    @abstractmethod
+    async def list_user_project_summaries(
+        self, user_clerk_id: str, limit: int, cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Return one page of a user's project summaries, newest first, and the cursor for the next page
+
+        Summaries are {"id", "title", "template", "file_count", "updated_at"}.
+        """
+
+    @abstractmethod
+    async def apply_changes(
+        self,
+        project_id: str,
+        updated_at: datetime,
+        files: Optional[Dict[str, Dict[str, Any]]] = None,
+        messages: Optional[List[Dict[str, Any]]] = None,
+        deleted_files: Optional[List[str]] = None,
+        expected_revision: Optional[int] = None,
+        source: str = "update",
+    ) -> Optional[int]:
+        """Upsert/delete files and append chat messages in one transaction
+
+        Returns the new revision, or None if the project does not exist. When
+        expected_revision is given and does not match, nothing is written and
+        RevisionConflictError is raised. If any file actually changes, a version
+        numbered with the new revision is recorded, tagged with `source`.
+        """
+
+    @abstractmethod
+    async def list_versions(self, project_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Return the retained versions of a project's files, newest first, or None if the project does not exist
+
+        Versions are {"version", "created_at", "source", "changed_files", "deleted_files"};
+        the version number is the project revision that produced it.
+        """
+
+    @abstractmethod
+    async def get_version_files(
+        self, project_id: str, version: int, paths: Optional[List[str]] = None
+    ) -> Optional[Dict[str, FileRecord]]:
+        """Return the files as of a retained version (only `paths` if given), or None if there is no such version"""
+
+    @abstractmethod
+    async def delete_project(self, project_id: str) -> bool:
+        """Delete a project with its files and messages; False if it does not exist"""
+
+    def close(self) -> None:
+        """Release any resources held by the store"""
+
+
+class InMemoryProjectStore(ProjectStore):
+    """Process-local store, suitable for development and single-worker deployments
+
+    File contents live in a BlobStore, so identical files across projects and revisions are held once.
+    """
+
+    def __init__(self, max_versions: Optional[int] = None):
+        self.projects: Dict[str, Dict[str, Any]] = {}
+        self.blobs = BlobStore()
+        self.max_versions = max_versions or int(os.getenv("PROJECT_MAX_VERSIONS", "50"))
+        self.histories: Dict[str, VersionHistory] = {}
+        # user_clerk_id -> [(-updated_at timestamp, project_id)] kept sorted, newest first
+        self.user_index: Dict[str, List[Tuple[float, str]]] = {}
+
+    async def create_project(self, project: Dict[str, Any]) -> None:
+        self.projects[project["id"]] = {
+            **project,
+            "files": {path: self._file_record(path, file) for path, file in project["files"].items()},
+            "chat_history": [MessageRecord.from_dict(message) for message in project["chat_history"]],
+            "revision": 1,
+        }
+        history = self.histories[project["id"]] = VersionHistory(self.blobs, self.max_versions)
+        history.record(1, project["created_at"], "create", dict(self.projects[project["id"]]["files"]))
+        self._index_add(project)
+
+    async def get_project(
+        self, project_id: str, include_files: bool = True, include_chat: bool = True
+    ) -> Optional[Dict[str, Any]]:
+        # Everything is already resident, so there is nothing to skip loading
+        return self.projects.get(project_id)
+
+    async def get_file(self, project_id: str, path: str) -> Optional[FileRecord]:
+        project = self.projects.get(project_id)
+        return project["files"].get(path) if project else None
+
+    async def get_files(self, project_id: str, paths: List[str]) -> Dict[str, FileRecord]:
+        project = self.projects.get(project_id)
+        if project is None:
+            return {}
+        return {path: project["files"][path] for path in paths if path in project["files"]}
+
+    async def get_chat_page(
+        self, project_id: str, limit: int, before: Optional[int] = None
+    ) -> Optional[Tuple[List[MessageRecord], int]]:
+        project = self.projects.get(project_id)
+        if project is None:
+            return None
+
+        chat_history = project["chat_history"]
+        end = len(chat_history) if before is None else min(before, len(chat_history))
+        return chat_history[max(end - limit, 0):end], len(chat_history)
+
+    async def list_user_projects(
+        self, user_clerk_id: str, include_files: bool = True, include_chat: bool = True
+    ) -> List[Dict[str, Any]]:
+        return [self.projects[project_id] for _, project_id in self.user_index.get(user_clerk_id, [])]
+
+    async def list_user_project_summaries(
+        self, user_clerk_id: str, limit: int, cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        entries = self.user_index.get(user_clerk_id, [])
+        start = 0
+        if cursor:
+            updated_at, project_id = decode_cursor(cursor)
+            start = bisect.bisect_right(entries, (-updated_at.timestamp(), project_id))
+
+        page = entries[start:start + limit]
+        summaries = [_summary(self.projects[project_id]) for _, project_id in page]
+
+        next_cursor = None
+        if start + limit < len(entries) and summaries:
+            next_cursor = encode_cursor(summaries[-1]["updated_at"], summaries[-1]["id"])
+        return summaries, next_cursor
+
+    async def apply_changes(
+        self,
+        project_id: str,
+        updated_at: datetime,
+        files: Optional[Dict[str, Dict[str, Any]]] = None,
+        messages: Optional[List[Dict[str, Any]]] = None,
+        deleted_files: Optional[List[str]] = None,
+        expected_revision: Optional[int] = None,
+        source: str = "update",
+    ) -> Optional[int]:
+        project = self.projects.get(project_id)
+        if project is None:
+            return None
+        if expected_revision is not None and expected_revision != project["revision"]:
+            raise RevisionConflictError(project["revision"])
+
+        stored_files = project["files"]
+        changes: Dict[str, Optional[FileRecord]] = {}
+        for path, file in (files or {}).items():
+            current = stored_files.get(path)
+            if current is not None and current.content == file["content"] and current.language == file["language"]:
+                # Unchanged (e.g. a chat reply repeating a file): keep the existing record
+                continue
+            stored_files[path] = changes[path] = self._file_record(path, file)
+            if current is not None:
+                self.blobs.release(current.hash)
+        for path in deleted_files or []:
+            current = stored_files.pop(path, None)
+            if current is not None:
+                changes[path] = None
+                self.blobs.release(current.hash)
+        if messages:
+            project["chat_history"].extend(MessageRecord.from_dict(message) for message in messages)
+
+        self._index_remove(project)
+        project["updated_at"] = updated_at
+        project["revision"] += 1
+        self._index_add(project)
+        if changes:
+            self.histories[project_id].record(project["revision"], updated_at, source, changes)
+        return project["revision"]
+
+    async def list_versions(self, project_id: str) -> Optional[List[Dict[str, Any]]]:
+        history = self.histories.get(project_id)
+        return history.list() if history else None
+
+    async def get_version_files(
+        self, project_id: str, version: int, paths: Optional[List[str]] = None
+    ) -> Optional[Dict[str, FileRecord]]:
+        history = self.histories.get(project_id)
+        return history.files_at(version, paths) if history else None
+
+    async def delete_project(self, project_id: str) -> bool:
+        project = self.projects.pop(project_id, None)
+        if project is None:
+            return False
+        for file in project["files"].values():
+            self.blobs.release(file.hash)
+        self.histories.pop(project_id).release()
+        self._index_remove(project)
+        return True
+
+    def _file_record(self, path: str, file: Dict[str, Any]) -> FileRecord:
+        digest, content = self.blobs.put(file["content"])
+        return FileRecord(path, content, file["language"], digest)
+
+    def _index_add(self, project: Dict[str, Any]) -> None:
+        entries = self.user_index.setdefault(project["user_clerk_id"], [])
+        bisect.insort(entries, (-project["updated_at"].timestamp(), project["id"]))
+
+    def _index_remove(self, project: Dict[str, Any]) -> None:
+        entries = self.user_index.get(project["user_clerk_id"], [])
+        entry = (-project["updated_at"].timestamp(), project["id"])
+        position = bisect.bisect_left(entries, entry)
+        if position < len(entries) and entries[position] == entry:
+            del entries[position]
+        if not entries:
+            self.user_index.pop(project["user_clerk_id"], None)
+
+
+class SQLiteProjectStore(ProjectStore):
+    """SQLite store in WAL mode so several uvicorn workers can share one database file
+
+    Files and chat messages live in their own tables, indexed by (project_id, path)
+    and (project_id, timestamp) like the Convex schema. Versions store only the files
+    each one changed; the oldest retained version holds every file. Calls run in a
+    worker thread so the event loop is never blocked on disk I/O.
+    """
+
+    def __init__(self, path: str, max_versions: Optional[int] = None):
+        self.path = path
+        self.max_versions = max_versions or int(os.getenv("PROJECT_MAX_VERSIONS", "50"))
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("PRAGMA foreign_keys=ON")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS projects (
+                id TEXT PRIMARY KEY,
+                title TEXT NOT NULL,
+                description TEXT,
+                template TEXT NOT NULL,
+                user_clerk_id TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                revision INTEGER NOT NULL DEFAULT 1
+            );
+            CREATE TABLE IF NOT EXISTS project_files (
+                project_id TEXT NOT NULL REFERENCES projects (id) ON DELETE CASCADE,
+                path TEXT NOT NULL,
+                content TEXT NOT NULL,
+                language TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (project_id, path)
+            );
+            CREATE TABLE IF NOT EXISTS chat_messages (
+                id TEXT PRIMARY KEY,
+                project_id TEXT NOT NULL REFERENCES projects (id) ON DELETE CASCADE,
+                content TEXT NOT NULL,
+                sender TEXT NOT NULL,
+                timestamp TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS chat_messages_by_project_timestamp
+                ON chat_messages (project_id, timestamp);
+            CREATE INDEX IF NOT EXISTS projects_by_user_updated
+                ON projects (user_clerk_id, updated_at DESC, id);
+            CREATE TABLE IF NOT EXISTS project_versions (
+                project_id TEXT NOT NULL REFERENCES projects (id) ON DELETE CASCADE,
+                version INTEGER NOT NULL,
+                created_at TEXT NOT NULL,
+                source TEXT NOT NULL,
+                changed_files TEXT NOT NULL,
+                deleted_files TEXT NOT NULL,
+                PRIMARY KEY (project_id, version)
+            );
+            CREATE TABLE IF NOT EXISTS project_file_versions (
+                project_id TEXT NOT NULL REFERENCES projects (id) ON DELETE CASCADE,
+                path TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                content TEXT,
+                language TEXT,
+                PRIMARY KEY (project_id, path, version)
+            );
+        """)
+        # Databases created before revisions were tracked
+        columns = {row["name"] for row in self.db.execute("PRAGMA table_info(projects)")}
+        if "revision" not in columns:
+            self.db.execute("ALTER TABLE projects ADD COLUMN revision INTEGER NOT NULL DEFAULT 1")
+        self.db.commit()
+
+    async def create_project(self, project: Dict[str, Any]) -> None:
+        await asyncio.to_thread(self._create_project, project)
+
+    async def get_project(
+        self, project_id: str, include_files: bool = True, include_chat: bool = True
+    ) -> Optional[Dict[str, Any]]:
+        projects = await asyncio.to_thread(
+            self._load_projects, "id = ?", (project_id,), include_files, include_chat
+        )
+        return projects[0] if projects else None
+
+    async def get_file(self, project_id: str, path: str) -> Optional[FileRecord]:
+        return await asyncio.to_thread(self._get_file, project_id, path)
+
+    async def get_files(self, project_id: str, paths: List[str]) -> Dict[str, FileRecord]:
+        return await asyncio.to_thread(self._get_files, project_id, paths)
+
+    async def get_chat_page(
+        self, project_id: str, limit: int, before: Optional[int] = None
+    ) -> Optional[Tuple[List[MessageRecord], int]]:
+        return await asyncio.to_thread(self._get_chat_page, project_id, limit, before)
+
+    async def list_user_projects(
+        self, user_clerk_id: str, include_files: bool = True, include_chat: bool = True
+    ) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(
+            self._load_projects, "user_clerk_id = ? ORDER BY updated_at DESC, id", (user_clerk_id,),
+            include_files, include_chat
+        )
+
+    async def list_user_project_summaries(
+        self, user_clerk_id: str, limit: int, cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        return await asyncio.to_thread(self._list_user_project_summaries, user_clerk_id, limit, cursor)
+
+    async def apply_changes(
+        self,
+        project_id: str,
+        updated_at: datetime,
+        files: Optional[Dict[str, Dict[str, Any]]] = None,
+        messages: Optional[List[Dict[str, Any]]] = None,
+        deleted_files: Optional[List[str]] = None,
+        expected_revision: Optional[int] = None,
+        source: str = "update",
+    ) -> Optional[int]:
+        return await asyncio.to_thread(
+            self._apply_changes, project_id, updated_at, files, messages, deleted_files, expected_revision, source
+        )
+
+    async def list_versions(self, project_id: str) -> Optional[List[Dict[str, Any]]]:
+        return await asyncio.to_thread(self._list_versions, project_id)
+
+    async def get_version_files(
+        self, project_id: str, version: int, paths: Optional[List[str]] = None
+    ) -> Optional[Dict[str, FileRecord]]:
+        return await asyncio.to_thread(self._get_version_files, project_id, version, paths)
+
+    async def delete_project(self, project_id: str) -> bool:
+        return await asyncio.to_thread(self._delete_project, project_id)
+
+    def close(self) -> None:
+        with self.lock:
+            self.db.close()
+
+    def _create_project(self, project: Dict[str, Any]) -> None:
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT INTO projects (id, title, description, template, user_clerk_id, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    project["id"], project["title"], project["description"], project["template"],
+                    project["user_clerk_id"], _to_db_time(project["created_at"]), _to_db_time(project["updated_at"])
+                )
+            )
+            self._write_files(project["id"], project["files"], project["updated_at"])
+            self._write_messages(project["id"], project["chat_history"])
+            self._record_version(project["id"], 1, project["created_at"], "create", project["files"], [])
+
+    def _apply_changes(
+        self,
+        project_id: str,
+        updated_at: datetime,
+        files: Optional[Dict[str, Dict[str, Any]]],
+        messages: Optional[List[Dict[str, Any]]],
+        deleted_files: Optional[List[str]],
+        expected_revision: Optional[int],
+        source: str,
+    ) -> Optional[int]:
+        with self.lock, self.db:
+            query = "UPDATE projects SET updated_at = ?, revision = revision + 1 WHERE id = ?"
+            params: List[Any] = [_to_db_time(updated_at), project_id]
+            if expected_revision is not None:
+                query += " AND revision = ?"
+                params.append(expected_revision)
+
+            if self.db.execute(query, params).rowcount == 0:
+                row = self.db.execute("SELECT revision FROM projects WHERE id = ?", (project_id,)).fetchone()
+                if row is None:
+                    return None
+                raise RevisionConflictError(row["revision"])
+            revision = self.db.execute("SELECT revision FROM projects WHERE id = ?", (project_id,)).fetchone()[0]
+
+            # Only files whose content or language differ count as changes
+            current = self._get_files_locked(project_id, list(files or {}) + list(deleted_files or []))
+            files = {
+                path: file for path, file in (files or {}).items()
+                if path not in current
+                or (current[path].content, current[path].language) != (file["content"], file["language"])
+            }
+            deleted_files = [path for path in dict.fromkeys(deleted_files or []) if path in current]
+
+            if (files or deleted_files) and not self._has_versions(project_id):
+                # Projects stored before versions were tracked: snapshot the state being replaced
+                snapshot = self._get_all_files_locked(project_id)
+                self._record_version(project_id, revision - 1, updated_at, "snapshot", snapshot, [])
+
+            if files:
+                self._write_files(project_id, files, updated_at)
+            if deleted_files:
+                self.db.executemany(
+                    "DELETE FROM project_files WHERE project_id = ? AND path = ?",
+                    [(project_id, path) for path in deleted_files]
+                )
+            if messages:
+                self._write_messages(project_id, messages)
+            if files or deleted_files:
+                self._record_version(project_id, revision, updated_at, source, files, deleted_files)
+                self._compact_versions(project_id)
+            return revision
+
+    def _list_versions(self, project_id: str) -> Optional[List[Dict[str, Any]]]:
+        with self.lock:
+            if self.db.execute("SELECT 1 FROM projects WHERE id = ?", (project_id,)).fetchone() is None:
+                return None
+            rows = self.db.execute(
+                "SELECT version, created_at, source, changed_files, deleted_files FROM project_versions "
+                "WHERE project_id = ? ORDER BY version DESC",
+                (project_id,)
+            ).fetchall()
+        return [
+            {
+                "version": row["version"],
+                "created_at": _from_db_time(row["created_at"]),
+                "source": row["source"],
+                "changed_files": json.loads(row["changed_files"]),
+                "deleted_files": json.loads(row["deleted_files"]),
+            }
+            for row in rows
+        ]
+
+    def _get_version_files(
+        self, project_id: str, version: int, paths: Optional[List[str]]
+    ) -> Optional[Dict[str, FileRecord]]:
+        # Latest row per path at or before the version; NULL content marks a deletion
+        query = (
+            "SELECT f.path, f.content, f.language FROM project_file_versions f JOIN ("
+            "SELECT path, MAX(version) AS version FROM project_file_versions "
+            "WHERE project_id = ? AND version <= ? GROUP BY path"
+            ") latest ON f.path = latest.path AND f.version = latest.version "
+            "WHERE f.project_id = ? AND f.content IS NOT NULL"
+        )
+        params: List[Any] = [project_id, version, project_id]
+        if paths is not None:
+            query += f" AND f.path IN ({','.join('?' * len(paths))})"
+            params += paths
+
+        with self.lock:
+            exists = self.db.execute(
+                "SELECT 1 FROM project_versions WHERE project_id = ? AND version = ?", (project_id, version)
+            ).fetchone()
+            if exists is None:
+                return None
+            if paths is not None and not paths:
+                return {}
+            rows = self.db.execute(query, params).fetchall()
+        return {row["path"]: FileRecord(row["path"], row["content"], row["language"]) for row in rows}
+
+    def _has_versions(self, project_id: str) -> bool:
+        return self.db.execute(
+            "SELECT 1 FROM project_versions WHERE project_id = ? LIMIT 1", (project_id,)
+        ).fetchone() is not None
+
+    def _record_version(
+        self,
+        project_id: str,
+        version: int,
+        created_at: datetime,
+        source: str,
+        files: Dict[str, Dict[str, Any]],
+        deleted_files: List[str],
+    ) -> None:
+        self.db.execute(
+            "INSERT INTO project_versions (project_id, version, created_at, source, changed_files, deleted_files) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (project_id, version, _to_db_time(created_at), source, json.dumps(list(files)), json.dumps(deleted_files))
+        )
+        self.db.executemany(
+            "INSERT INTO project_file_versions (project_id, path, version, content, language) VALUES (?, ?, ?, ?, ?)",
+            [(project_id, path, version, file["content"], file["language"]) for path, file in files.items()]
+            + [(project_id, path, version, None, None) for path in deleted_files]
+        )
+
+    def _compact_versions(self, project_id: str) -> None:
+        """Fold versions beyond max_versions into the oldest retained one, which then holds every file"""
+        row = self.db.execute(
+            "SELECT version FROM project_versions WHERE project_id = ? ORDER BY version DESC LIMIT 1 OFFSET ?",
+            (project_id, self.max_versions - 1)
+        ).fetchone()
+        if row is None:
+            return
+        oldest = row["version"]
+        if self.db.execute(
+            "SELECT 1 FROM project_versions WHERE project_id = ? AND version < ? LIMIT 1", (project_id, oldest)
+        ).fetchone() is None:
+            return
+
+        # Keep only the latest older row per path, and none where the oldest version has its own row
+        self.db.execute(
+            "DELETE FROM project_file_versions WHERE project_id = ? AND version < ? AND ("
+            "version < (SELECT MAX(v.version) FROM project_file_versions v "
+            "WHERE v.project_id = project_file_versions.project_id AND v.path = project_file_versions.path "
+            "AND v.version <= ?) OR content IS NULL)",
+            (project_id, oldest, oldest)
+        )
+        self.db.execute(
+            "UPDATE project_file_versions SET version = ? WHERE project_id = ? AND version < ?",
+            (oldest, project_id, oldest)
+        )
+        self.db.execute(
+            "DELETE FROM project_file_versions WHERE project_id = ? AND version = ? AND content IS NULL",
+            (project_id, oldest)
+        )
+        self.db.execute("DELETE FROM project_versions WHERE project_id = ? AND version < ?", (project_id, oldest))
+
+    def _list_user_project_summaries(
+        self, user_clerk_id: str, limit: int, cursor: Optional[str]
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        query = (
+            "SELECT id, title, template, updated_at, "
+            "(SELECT COUNT(*) FROM project_files f WHERE f.project_id = p.id) AS file_count "
+            "FROM projects p WHERE user_clerk_id = ?"
+        )
+        params: List[Any] = [user_clerk_id]
+        if cursor:
+            updated_at, project_id = decode_cursor(cursor)
+            query += " AND (updated_at < ? OR (updated_at = ? AND id > ?))"
+            params += [_to_db_time(updated_at), _to_db_time(updated_at), project_id]
+
+        # Fetch one extra row to learn whether another page exists
+        query += " ORDER BY updated_at DESC, id LIMIT ?"
+        params.append(limit + 1)
+
+        with self.lock:
+            rows = self.db.execute(query, params).fetchall()
+
+        summaries = [
+            {
+                "id": row["id"],
+                "title": row["title"],
+                "template": row["template"],
+                "file_count": row["file_count"],
+                "updated_at": _from_db_time(row["updated_at"]),
+            }
+            for row in rows[:limit]
+        ]
+
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = encode_cursor(summaries[-1]["updated_at"], summaries[-1]["id"])
+        return summaries, next_cursor
+
+    def _get_files_locked(self, project_id: str, paths: List[str]) -> Dict[str, FileRecord]:
+        if not paths:
+            return {}
+        placeholders = ",".join("?" * len(paths))
+        rows = self.db.execute(
+            f"SELECT path, content, language FROM project_files WHERE project_id = ? AND path IN ({placeholders})",
+            (project_id, *paths)
+        ).fetchall()
+        return {row["path"]: FileRecord(row["path"], row["content"], row["language"]) for row in rows}
+
+    def _get_all_files_locked(self, project_id: str) -> Dict[str, FileRecord]:
+        rows = self.db.execute(
+            "SELECT path, content, language FROM project_files WHERE project_id = ?", (project_id,)
+        ).fetchall()
+        return {row["path"]: FileRecord(row["path"], row["content"], row["language"]) for row in rows}
+
+    def _get_file(self, project_id: str, path: str) -> Optional[FileRecord]:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT path, content, language FROM project_files WHERE project_id = ? AND path = ?",
+                (project_id, path)
+            ).fetchone()
+        if row is None:
+            return None
+        return FileRecord(row["path"], row["content"], row["language"])
+
+    def _get_files(self, project_id: str, paths: List[str]) -> Dict[str, FileRecord]:
+        with self.lock:
+            return self._get_files_locked(project_id, paths)
+
+    def _get_chat_page(
+        self, project_id: str, limit: int, before: Optional[int]
+    ) -> Optional[Tuple[List[MessageRecord], int]]:
+        with self.lock:
+            if self.db.execute("SELECT 1 FROM projects WHERE id = ?", (project_id,)).fetchone() is None:
+                return None
+
+            total = self.db.execute(
+                "SELECT COUNT(*) FROM chat_messages WHERE project_id = ?", (project_id,)
+            ).fetchone()[0]
+            end = total if before is None else min(before, total)
+            start = max(end - limit, 0)
+
+            rows = self.db.execute(
+                "SELECT id, content, sender, timestamp FROM chat_messages WHERE project_id = ? "
+                "ORDER BY timestamp, rowid LIMIT ? OFFSET ?",
+                (project_id, end - start, start)
+            ).fetchall()
+
+        messages = [
+            MessageRecord(row["id"], row["content"], row["sender"], _from_db_time(row["timestamp"]))
+            for row in rows
+        ]
+        return messages, total
+
+    def _delete_project(self, project_id: str) -> bool:
+        with self.lock, self.db:
+            cursor = self.db.execute("DELETE FROM projects WHERE id = ?", (project_id,))
+            return cursor.rowcount > 0
+
+    def _write_files(self, project_id: str, files: Dict[str, Dict[str, Any]], updated_at: datetime) -> None:
+        self.db.executemany(
+            "INSERT INTO project_files (project_id, path, content, language, updated_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (project_id, path) DO UPDATE SET "
+            "content = excluded.content, language = excluded.language, updated_at = excluded.updated_at",
+            [
+                (project_id, path, file["content"], file["language"], _to_db_time(updated_at))
+                for path, file in files.items()
+            ]
+        )
+
+    def _write_messages(self, project_id: str, messages: List[Dict[str, Any]]) -> None:
+        self.db.executemany(
+            "INSERT INTO chat_messages (id, project_id, content, sender, timestamp) VALUES (?, ?, ?, ?, ?)",
+            [
+                (message["id"], project_id, message["content"], message["sender"], _to_db_time(message["timestamp"]))
+                for message in messages
+            ]
+        )
+
+    def _load_projects(
+        self, where: str, params: tuple, include_files: bool = True, include_chat: bool = True
+    ) -> List[Dict[str, Any]]:
+        """Load matching projects, plus files and messages if requested, using one query per table"""
+        with self.lock:
+            rows = self.db.execute(f"SELECT * FROM projects WHERE {where}", params).fetchall()
+            if not rows:
+                return []
+
+            projects = {}
+            for row in rows:
+                projects[row["id"]] = {
+                    "id": row["id"],
+                    "title": row["title"],
+                    "description": row["description"],
+                    "template": row["template"],
+                    "files": {},
+                    "chat_history": [],
+                    "user_clerk_id": row["user_clerk_id"],
+                    "created_at": _from_db_time(row["created_at"]),
+                    "updated_at": _from_db_time(row["updated_at"]),
+                    "revision": row["revision"],
+                }
+
+            placeholders = ",".join("?" * len(projects))
+            ids = tuple(projects)
+
+            if include_files:
+                for row in self.db.execute(
+                    f"SELECT project_id, path, content, language FROM project_files WHERE project_id IN ({placeholders})",
+                    ids
+                ):
+                    projects[row["project_id"]]["files"][row["path"]] = FileRecord(
+                        row["path"], row["content"], row["language"]
+                    )
+
+            if include_chat:
+                for row in self.db.execute(
+                    f"SELECT id, project_id, content, sender, timestamp FROM chat_messages "
+                    f"WHERE project_id IN ({placeholders}) ORDER BY project_id, timestamp, rowid",
+                    ids
+                ):
+                    projects[row["project_id"]]["chat_history"].append(MessageRecord(
+                        row["id"], row["content"], row["sender"], _from_db_time(row["timestamp"])
+                    ))
+
+        return list(projects.values())
+
+
+def _summary(project: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": project["id"],
+        "title": project["title"],
+        "template": project["template"],
+        "file_count": len(project["files"]),
+        "updated_at": project["updated_at"],
+    }
+
+
+def encode_cursor(updated_at: datetime, project_id: str) -> str:
+    """Opaque pagination cursor pointing just after the given project"""
+    raw = json.dumps([_to_db_time(updated_at), project_id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Decode a pagination cursor, raising ValueError if it is malformed"""
+    try:
+        updated_at, project_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return _from_db_time(updated_at), project_id
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+
+
+def _to_db_time(value: datetime) -> str:
+    # Fixed-width ISO timestamps sort correctly as text
+    return value.isoformat(timespec="microseconds")
+
+
+def _from_db_time(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+def create_project_store() -> ProjectStore:
+    """Build the project store selected by the PROJECT_STORE environment variable"""
+    backend = os.getenv("PROJECT_STORE", "memory").lower()
+    if backend == "sqlite":
+        return SQLiteProjectStore(os.getenv("PROJECT_STORE_PATH", "codecraft.db"))
+    if backend == "memory":
+        return InMemoryProjectStore()
+    raise ValueError(f"Unknown PROJECT_STORE backend: {backend}")
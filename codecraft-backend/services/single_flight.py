@@ -0,0 +1,62 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Lets concurrent callers with the same key share one in-flight upstream call"""
+
+    def __init__(self):
+        self.calls: Dict[Hashable, asyncio.Task] = {}
+        self.waiters: Dict[asyncio.Task, int] = {}
+        self.counters = {"calls": 0, "shared": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn() for the first caller of a key and hand its result (or exception) to every concurrent caller"""
+        task = self.calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self.calls[key] = task
+            self.waiters[task] = 0
+            task.add_done_callback(lambda done: self._finished(key, done))
+            self.counters["calls"] += 1
+        else:
+            self.counters["shared"] += 1
+
+        self.waiters[task] += 1
+        try:
+            # Shielded so one caller going away does not cancel the call for the others
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # Cancel the upstream call only once nobody is waiting for it
+            if not task.done() and self.waiters.get(task) == 1:
+                task.cancel()
+            raise
+        finally:
+            if task in self.waiters:
+                self.waiters[task] -= 1
+
+    def forget(self, key: Optional[Hashable] = None) -> None:
+        """Stop handing out in-flight calls (for one key or all) so later callers start fresh ones"""
+        if key is None:
+            self.calls.clear()
+        else:
+            self.calls.pop(key, None)
+
+    def forget_where(self, predicate: Callable[[Hashable], bool]) -> None:
+        """Stop handing out the in-flight calls whose key matches, leaving the others shared"""
+        for key in [key for key in self.calls if predicate(key)]:
+            del self.calls[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Upstream calls made versus calls answered by sharing"""
+        return {**self.counters, "in_flight": len(self.calls)}
+
+    def _finished(self, key: Hashable, task: asyncio.Task) -> None:
+        if self.calls.get(key) is task:
+            del self.calls[key]
+        self.waiters.pop(task, None)
+        # Mark the exception as retrieved even if every caller was cancelled
+        if not task.cancelled():
+            task.exception()
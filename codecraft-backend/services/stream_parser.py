@@ -0,0 +1,118 @@
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# Inside a JSON string only quotes and backslashes change the scanner state
+_STRING_SPECIAL = re.compile(r'["\\]')
+
+
+class IncrementalProjectParser:
+    """Incrementally scans streamed project JSON and reports fields and files as soon as they complete"""
+
+    def __init__(self, files_key: str = "files"):
+        self.files_key = files_key
+        self.text = ""
+        self.pos = 0
+        self.started = False
+        self.complete = False
+        self.in_string = False
+        self.escape = False
+        self.string_start = 0
+        self.last_string: Optional[Tuple[int, int]] = None
+        self.stack: List[str] = []
+        self.keys: Dict[int, str] = {}
+        self.value_starts: Dict[int, int] = {}
+        self.result: Dict[str, Any] = {}
+
+    def feed(self, chunk: str) -> List[Tuple[str, str, Any]]:
+        """Consume a chunk of model output and return newly completed ("field" | "file", name, value) events"""
+        self.text += chunk
+        events: List[Tuple[str, str, Any]] = []
+        text = self.text
+        length = len(text)
+        i = self.pos
+
+        while i < length and not self.complete:
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                    i += 1
+                    continue
+                match = _STRING_SPECIAL.search(text, i)
+                if match is None:
+                    i = length
+                    break
+                i = match.start()
+                if text[i] == "\\":
+                    self.escape = True
+                else:
+                    self.in_string = False
+                    self.last_string = (self.string_start, i + 1)
+                i += 1
+                continue
+
+            char = text[i]
+
+            if not self.started:
+                # Skip anything before the opening brace, such as markdown fences
+                if char == "{":
+                    self.started = True
+                    self.stack.append("{")
+            elif char == '"':
+                self.in_string = True
+                self.string_start = i
+            elif char == "{" or char == "[":
+                self.stack.append(char)
+            elif char == ":":
+                depth = len(self.stack)
+                if self.stack[-1] == "{" and self.last_string is not None:
+                    try:
+                        self.keys[depth] = json.loads(text[self.last_string[0]:self.last_string[1]])
+                        self.value_starts[depth] = i + 1
+                    except ValueError:
+                        pass
+            elif char == ",":
+                depth = len(self.stack)
+                if self.stack[-1] == "{":
+                    self._complete_value(depth, i, events)
+            elif char == "}" or char == "]":
+                depth = len(self.stack)
+                if char == "}":
+                    self._complete_value(depth, i, events)
+                self.stack.pop()
+                if not self.stack:
+                    self.complete = True
+
+            i += 1
+
+        self.pos = i
+        return events
+
+    def _complete_value(self, depth: int, end: int, events: List[Tuple[str, str, Any]]) -> None:
+        """Parse the value that just finished at the given object depth"""
+        key = self.keys.pop(depth, None)
+        start = self.value_starts.pop(depth, None)
+        if key is None or start is None:
+            return
+
+        if depth == 1:
+            # The files object is reported entry by entry at depth 2 instead
+            if key == self.files_key:
+                self.result.setdefault(self.files_key, {})
+                return
+            value = self._loads(start, end)
+            if value is not None:
+                self.result[key] = value
+                events.append(("field", key, value))
+        elif depth == 2 and self.keys.get(1) == self.files_key:
+            value = self._loads(start, end)
+            if value is not None:
+                self.result.setdefault(self.files_key, {})[key] = value
+                events.append(("file", key, value))
+
+    def _loads(self, start: int, end: int) -> Any:
+        """Decode a completed value slice, ignoring malformed fragments"""
+        try:
+            return json.loads(self.text[start:end])
+        except ValueError:
+            return None
@@ -1,49 +1,247 @@
+import asyncio
+import json
+import random
+import time
 import httpx
 import os
-from typing import Optional, Dict, Any
+from collections import OrderedDict
+from typing import Optional, Dict, Any, AsyncIterator, List, Tuple
 from datetime import datetime
 from models.user import UserCreate, UserUpdate, UserResponse
+from services.single_flight import SingleFlight
+from services.metrics import CONVEX_DURATION, CONVEX_ERRORS, span
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+except ImportError:
+    h2 = None
+
+# Responses worth retrying for idempotent queries
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+
+# Clerk IDs looked up per Convex query in batch lookups
+BATCH_QUERY_SIZE = 100
+
+USER_NOT_FOUND = {
+    "success": False,
+    "error": "User not found",
+    "message": "User with provided Clerk ID does not exist"
+}
+
+class UserCache:
+    """TTL + LRU cache of user lookups by Clerk ID, including "not found" results"""
+    
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        ttl: Optional[float] = None,
+        negative_ttl: Optional[float] = None
+    ):
+        self.max_entries = max_entries or int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+        self.ttl = ttl or float(os.getenv("USER_CACHE_TTL", "300"))
+        self.negative_ttl = negative_ttl or float(os.getenv("USER_CACHE_NEGATIVE_TTL", "30"))
+        self.entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        # Bumped on every invalidation so lookups that started earlier do not re-cache stale data
+        self.generation = 0
+        self.counters = {"hits": 0, "negative_hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+    
+    def get(self, clerk_id: str) -> Optional[Dict[str, Any]]:
+        """Return the cached lookup result, or None on a miss"""
+        entry = self.entries.get(clerk_id)
+        if entry is not None:
+            expires_at, result = entry
+            if time.monotonic() < expires_at:
+                self.entries.move_to_end(clerk_id)
+                self.counters["hits" if result["success"] else "negative_hits"] += 1
+                return result
+            del self.entries[clerk_id]
+        
+        self.counters["misses"] += 1
+        return None
+    
+    def set(self, clerk_id: str, result: Dict[str, Any], generation: Optional[int] = None) -> None:
+        """Cache a found or not-found result, unless an invalidation happened since `generation`"""
+        if generation is not None and generation != self.generation:
+            return
+        ttl = self.ttl if result["success"] else self.negative_ttl
+        self.entries[clerk_id] = (time.monotonic() + ttl, result)
+        self.entries.move_to_end(clerk_id)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.counters["evictions"] += 1
+    
+    def invalidate(self, clerk_id: str) -> None:
+        """Drop a user's entry after a write"""
+        self.generation += 1
+        self.entries.pop(clerk_id, None)
+        self.counters["invalidations"] += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        hits = self.counters["hits"] + self.counters["negative_hits"]
+        lookups = hits + self.counters["misses"]
+        return {
+            **self.counters,
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+def format_user(user_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a Convex user document to the API's user fields"""
+    return {
+        "id": user_data.get("_id"),
+        "clerk_id": user_data.get("clerkId"),
+        "email": user_data.get("email"),
+        "first_name": user_data.get("firstName"),
+        "last_name": user_data.get("lastName"),
+        "image_url": user_data.get("imageUrl"),
+        "created_at": datetime.fromtimestamp(user_data.get("createdAt", 0) / 1000),
+        "updated_at": datetime.fromtimestamp(user_data.get("updatedAt", 0) / 1000),
+    }
 
 class ConvexUserService:
-    def __init__(self):
-        self.convex_url = os.getenv("CONVEX_URL", "https://rare-greyhound-374.convex.cloud")
+    def __init__(
+        self,
+        convex_url: Optional[str] = None,
+        client: Optional[httpx.AsyncClient] = None,
+        cache: Optional[UserCache] = None
+    ):
+        self.convex_url = (convex_url or os.getenv("CONVEX_URL", "https://rare-greyhound-374.convex.cloud")).rstrip("/")
         self.convex_deployment = os.getenv("CONVEX_DEPLOYMENT", "dev:rare-greyhound-374")
+        self.http2 = os.getenv("CONVEX_HTTP2", "true").lower() == "true" and h2 is not None
+        self.limits = httpx.Limits(
+            max_connections=int(os.getenv("CONVEX_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("CONVEX_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=float(os.getenv("CONVEX_KEEPALIVE_EXPIRY", "30")),
+        )
+        self.timeout = httpx.Timeout(
+            float(os.getenv("CONVEX_TIMEOUT", "10")),
+            connect=float(os.getenv("CONVEX_CONNECT_TIMEOUT", "5")),
+        )
+        self.query_retries = int(os.getenv("CONVEX_QUERY_RETRIES", "2"))
+        self.retry_backoff = float(os.getenv("CONVEX_RETRY_BACKOFF", "0.2"))
+        self.client = client
+        self.cache = cache or UserCache()
+        self.flights = SingleFlight()
+    
+    async def start(self) -> None:
+        """Open the shared connection pool (called from the app lifespan)"""
+        self._get_client()
+    
+    async def close(self) -> None:
+        """Close the shared connection pool"""
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the app-lifetime client, creating it on first use"""
+        if self.client is None or self.client.is_closed:
+            self.client = httpx.AsyncClient(
+                base_url=self.convex_url,
+                http2=self.http2,
+                limits=self.limits,
+                timeout=self.timeout,
+                headers={"Content-Type": "application/json"},
+            )
+        return self.client
+    
+    async def _query(self, path: str, args: Dict[str, Any]) -> httpx.Response:
+        """Run a Convex query, sharing one upstream call among concurrent identical queries"""
+        # Keyed by the users the query reads too (None for listings, which read every user), so a write
+        # only stops sharing of the queries it can affect
+        clerk_ids = args.get("clerkIds") or ([args["clerkId"]] if "clerkId" in args else None)
+        key = (path, json.dumps(args, sort_keys=True), frozenset(clerk_ids) if clerk_ids is not None else None)
+        return await self.flights.do(key, lambda: self._send_query(path, args))
+    
+    async def _send_query(self, path: str, args: Dict[str, Any]) -> httpx.Response:
+        """Send a Convex query, retrying transient failures with jittered exponential backoff"""
+        for attempt in range(self.query_retries + 1):
+            try:
+                response = await self._post("query", path, args)
+                if response.status_code not in RETRY_STATUS_CODES or attempt == self.query_retries:
+                    return response
+            except httpx.TransportError:
+                if attempt == self.query_retries:
+                    raise
+            await asyncio.sleep(random.uniform(0, self.retry_backoff * 2 ** attempt))
+    
+    async def _mutation(self, path: str, args: Dict[str, Any]) -> httpx.Response:
+        """Run a Convex mutation (never retried, since it may not be idempotent)"""
+        # Queries of this user already in flight may predate the write, so later callers must not join them.
+        # The cached entry is dropped after the write as well as before: a lookup that started in between may
+        # have read the old document, and the second invalidation stops it from caching that result.
+        clerk_id = args.get("clerkId")
+        
+        def affected(key) -> bool:
+            return clerk_id is None or key[2] is None or clerk_id in key[2]
+        
+        def invalidate() -> None:
+            if clerk_id is not None:
+                self.cache.invalidate(clerk_id)
+            self.flights.forget_where(affected)
+        
+        invalidate()
+        try:
+            return await self._post("mutation", path, args)
+        finally:
+            invalidate()
+    
+    async def _post(self, kind: str, path: str, args: Dict[str, Any]) -> httpx.Response:
+        """Call the Convex HTTP API once, recording a span and failures"""
+        with span(f"convex.{kind}", CONVEX_DURATION, (kind, path), function=path) as attributes:
+            try:
+                response = await self._get_client().post(f"/api/{kind}", json={"path": path, "args": args})
+            except httpx.TransportError:
+                CONVEX_ERRORS.inc(1, (kind, path))
+                raise
+            attributes["status"] = response.status_code
+        if response.status_code >= 400:
+            CONVEX_ERRORS.inc(1, (kind, path))
+        return response
     
     async def create_or_update_user(self, user_data: UserCreate) -> Dict[str, Any]:
         """Create or update user in Convex database"""
         try:
-            async with httpx.AsyncClient() as client:
-                payload = {
-                    "path": "users:createOrUpdateUser",
-                    "args": {
-                        "clerkId": user_data.clerk_id,
-                        "email": user_data.email,
-                        "firstName": user_data.first_name,
-                        "lastName": user_data.last_name,
-                        "imageUrl": user_data.image_url,
-                    }
+            response = await self._mutation(
+                "users:createOrUpdateUser",
+                {
+                    "clerkId": user_data.clerk_id,
+                    "email": user_data.email,
+                    "firstName": user_data.first_name,
+                    "lastName": user_data.last_name,
+                    "imageUrl": user_data.image_url,
+                    "returnUser": True,
                 }
+            )
+            
+            if response.status_code == 200:
+                result = response.json()
+                value = result.get("value")
                 
-                response = await client.post(
-                    f"{self.convex_url}/api/mutation",
-                    json=payload,
-                    headers={"Content-Type": "application/json"}
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
+                # The mutation returns the stored document, so the cache is filled without a re-read
+                if isinstance(value, dict):
+                    user = format_user(value)
+                    self.cache.set(user_data.clerk_id, {"success": True, "user": user})
                     return {
                         "success": True,
-                        "user_id": result.get("value"),
+                        "user_id": user["id"],
+                        "user": user,
                         "message": "User created/updated successfully"
                     }
-                else:
-                    return {
-                        "success": False,
-                        "error": f"Convex API error: {response.status_code}",
-                        "message": "Failed to create/update user"
-                    }
-                    
+                return {
+                    "success": True,
+                    "user_id": value,
+                    "message": "User created/updated successfully"
+                }
+            else:
+                return {
+                    "success": False,
+                    "error": f"Convex API error: {response.status_code}",
+                    "message": "Failed to create/update user"
+                }
+                
         except Exception as e:
             return {
                 "success": False,
@@ -52,51 +250,33 @@ class ConvexUserService:
             }
     
     async def get_user_by_clerk_id(self, clerk_id: str) -> Dict[str, Any]:
-        """Get user by Clerk ID from Convex database"""
+        """Get user by Clerk ID, served from the cache when possible"""
+        cached = self.cache.get(clerk_id)
+        if cached is not None:
+            return cached
+        
         try:
-            async with httpx.AsyncClient() as client:
-                payload = {
-                    "path": "users:getUserByClerkId",
-                    "args": {"clerkId": clerk_id}
-                }
-                
-                response = await client.post(
-                    f"{self.convex_url}/api/query",
-                    json=payload,
-                    headers={"Content-Type": "application/json"}
-                )
+            generation = self.cache.generation
+            response = await self._query("users:getUserByClerkId", {"clerkId": clerk_id})
+            
+            if response.status_code == 200:
+                result = response.json()
+                user_data = result.get("value")
                 
-                if response.status_code == 200:
-                    result = response.json()
-                    user_data = result.get("value")
-                    
-                    if user_data:
-                        return {
-                            "success": True,
-                            "user": {
-                                "id": user_data.get("_id"),
-                                "clerk_id": user_data.get("clerkId"),
-                                "email": user_data.get("email"),
-                                "first_name": user_data.get("firstName"),
-                                "last_name": user_data.get("lastName"),
-                                "image_url": user_data.get("imageUrl"),
-                                "created_at": datetime.fromtimestamp(user_data.get("createdAt", 0) / 1000),
-                                "updated_at": datetime.fromtimestamp(user_data.get("updatedAt", 0) / 1000),
-                            }
-                        }
-                    else:
-                        return {
-                            "success": False,
-                            "error": "User not found",
-                            "message": "User with provided Clerk ID does not exist"
-                        }
+                if user_data:
+                    user_result = {"success": True, "user": format_user(user_data)}
                 else:
-                    return {
-                        "success": False,
-                        "error": f"Convex API error: {response.status_code}",
-                        "message": "Failed to fetch user"
-                    }
-                    
+                    user_result = USER_NOT_FOUND
+                
+                self.cache.set(clerk_id, user_result, generation)
+                return user_result
+            else:
+                return {
+                    "success": False,
+                    "error": f"Convex API error: {response.status_code}",
+                    "message": "Failed to fetch user"
+                }
+                
         except Exception as e:
             return {
                 "success": False,
@@ -107,47 +287,117 @@ class ConvexUserService:
     async def get_all_users(self) -> Dict[str, Any]:
         """Get all users from Convex database"""
         try:
-            async with httpx.AsyncClient() as client:
-                payload = {
-                    "path": "users:getAllUsers",
-                    "args": {}
+            response = await self._query("users:getAllUsers", {})
+            
+            if response.status_code == 200:
+                result = response.json()
+                users_data = result.get("value", [])
+                
+                users = [format_user(user_data) for user_data in users_data]
+                
+                return {
+                    "success": True,
+                    "users": users,
+                    "count": len(users)
+                }
+            else:
+                return {
+                    "success": False,
+                    "error": f"Convex API error: {response.status_code}",
+                    "message": "Failed to fetch users"
                 }
                 
-                response = await client.post(
-                    f"{self.convex_url}/api/query",
-                    json=payload,
-                    headers={"Content-Type": "application/json"}
-                )
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "message": "Internal server error"
+            }
+    
+    async def list_users(self, limit: int, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """Get one page of users using Convex cursor pagination"""
+        try:
+            response = await self._query(
+                "users:listUsers",
+                {"paginationOpts": {"numItems": limit, "cursor": cursor}}
+            )
+            
+            if response.status_code == 200:
+                page = response.json().get("value", {})
+                return {
+                    "success": True,
+                    "users": [format_user(user_data) for user_data in page.get("page", [])],
+                    "next_cursor": None if page.get("isDone", True) else page.get("continueCursor")
+                }
+            else:
+                return {
+                    "success": False,
+                    "error": f"Convex API error: {response.status_code}",
+                    "message": "Failed to fetch users"
+                }
                 
-                if response.status_code == 200:
-                    result = response.json()
-                    users_data = result.get("value", [])
-                    
-                    users = []
-                    for user_data in users_data:
-                        users.append({
-                            "id": user_data.get("_id"),
-                            "clerk_id": user_data.get("clerkId"),
-                            "email": user_data.get("email"),
-                            "first_name": user_data.get("firstName"),
-                            "last_name": user_data.get("lastName"),
-                            "image_url": user_data.get("imageUrl"),
-                            "created_at": datetime.fromtimestamp(user_data.get("createdAt", 0) / 1000),
-                            "updated_at": datetime.fromtimestamp(user_data.get("updatedAt", 0) / 1000),
-                        })
-                    
-                    return {
-                        "success": True,
-                        "users": users,
-                        "count": len(users)
-                    }
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "message": "Internal server error"
+            }
+    
+    async def iter_users(self, page_size: int = 200) -> AsyncIterator[Dict[str, Any]]:
+        """Yield every user, holding only one page in memory at a time"""
+        cursor = None
+        while True:
+            result = await self.list_users(page_size, cursor)
+            if not result["success"]:
+                raise Exception(result.get("error", result["message"]))
+            for user in result["users"]:
+                yield user
+            cursor = result["next_cursor"]
+            if cursor is None:
+                return
+    
+    async def get_users_by_clerk_ids(self, clerk_ids: List[str]) -> Dict[str, Any]:
+        """Look up many users at once, from the cache where possible and otherwise in batched queries"""
+        try:
+            results: Dict[str, Dict[str, Any]] = {}
+            misses = []
+            for clerk_id in dict.fromkeys(clerk_ids):
+                cached = self.cache.get(clerk_id)
+                if cached is not None:
+                    results[clerk_id] = cached
                 else:
+                    misses.append(clerk_id)
+            
+            generation = self.cache.generation
+            chunks = [misses[i:i + BATCH_QUERY_SIZE] for i in range(0, len(misses), BATCH_QUERY_SIZE)]
+            responses = await asyncio.gather(
+                *[self._query("users:getUsersByClerkIds", {"clerkIds": chunk}) for chunk in chunks]
+            )
+            
+            for chunk, response in zip(chunks, responses):
+                if response.status_code != 200:
                     return {
                         "success": False,
                         "error": f"Convex API error: {response.status_code}",
                         "message": "Failed to fetch users"
                     }
-                    
+                # The query returns one entry (or null) per requested Clerk ID, in order
+                for clerk_id, user_data in zip(chunk, response.json().get("value", [])):
+                    user_result = {"success": True, "user": format_user(user_data)} if user_data else USER_NOT_FOUND
+                    self.cache.set(clerk_id, user_result, generation)
+                    results[clerk_id] = user_result
+            
+            users = []
+            missing = []
+            for clerk_id in dict.fromkeys(clerk_ids):
+                user_result = results.get(clerk_id, USER_NOT_FOUND)
+                if user_result["success"]:
+                    users.append(user_result["user"])
+                else:
+                    missing.append(clerk_id)
+            
+            return {"success": True, "users": users, "missing": missing}
+            
         except Exception as e:
             return {
                 "success": False,
@@ -158,31 +408,23 @@ class ConvexUserService:
     async def delete_user(self, clerk_id: str) -> Dict[str, Any]:
         """Delete user from Convex database"""
         try:
-            async with httpx.AsyncClient() as client:
-                payload = {
-                    "path": "users:deleteUser",
-                    "args": {"clerkId": clerk_id}
+            response = await self._mutation("users:deleteUser", {"clerkId": clerk_id})
+            
+            if response.status_code == 200:
+                result = response.json()
+                if result.get("value", {}).get("success"):
+                    self.cache.set(clerk_id, USER_NOT_FOUND)
+                return {
+                    "success": result.get("value", {}).get("success", False),
+                    "message": "User deleted successfully" if result.get("value", {}).get("success") else "User not found"
+                }
+            else:
+                return {
+                    "success": False,
+                    "error": f"Convex API error: {response.status_code}",
+                    "message": "Failed to delete user"
                 }
                 
-                response = await client.post(
-                    f"{self.convex_url}/api/mutation",
-                    json=payload,
-                    headers={"Content-Type": "application/json"}
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    return {
-                        "success": result.get("value", {}).get("success", False),
-                        "message": "User deleted successfully" if result.get("value", {}).get("success") else "User not found"
-                    }
-                else:
-                    return {
-                        "success": False,
-                        "error": f"Convex API error: {response.status_code}",
-                        "message": "Failed to delete user"
-                    }
-                    
         except Exception as e:
             return {
                 "success": False,
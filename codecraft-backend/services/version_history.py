@@ -0,0 +1,112 @@
+import bisect
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from services.blob_store import BlobStore, FileRecord
+
+
+class Version:
+    """One retained version: the files it changed (None for deleted files) and its metadata"""
+
+    __slots__ = ("version", "created_at", "source", "changes", "changed_files", "deleted_files")
+
+    def __init__(self, version: int, created_at: datetime, source: str, changes: Dict[str, Optional[FileRecord]]):
+        self.version = version
+        self.created_at = created_at
+        self.source = source
+        self.changes = changes
+        self.changed_files = [path for path, file in changes.items() if file is not None]
+        self.deleted_files = [path for path, file in changes.items() if file is None]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "created_at": self.created_at,
+            "source": self.source,
+            "changed_files": self.changed_files,
+            "deleted_files": self.deleted_files,
+        }
+
+
+class VersionHistory:
+    """File versions of one project as a full snapshot followed by deltas
+
+    The oldest retained version holds every file; each later version holds only the files it
+    changed, sharing FileRecords (and their blobs) with the live project and earlier versions.
+    Beyond max_versions the oldest delta is folded into the snapshot, so memory grows with what
+    changed rather than with project size times edits. Every record held by a version keeps a
+    reference on its blob.
+    """
+
+    __slots__ = ("versions", "max_versions", "blobs")
+
+    def __init__(self, blobs: BlobStore, max_versions: int):
+        self.versions: List[Version] = []
+        self.max_versions = max_versions
+        self.blobs = blobs
+
+    def record(self, version: int, created_at: datetime, source: str, changes: Dict[str, Optional[FileRecord]]) -> None:
+        """Add a version; the first one must contain every file"""
+        for file in changes.values():
+            if file is not None:
+                self.blobs.retain(file.hash)
+        self.versions.append(Version(version, created_at, source, changes))
+        while len(self.versions) > self.max_versions:
+            self._compact()
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Version summaries, newest first"""
+        return [version.summary() for version in reversed(self.versions)]
+
+    def files_at(self, version: int, paths: Optional[List[str]] = None) -> Optional[Dict[str, FileRecord]]:
+        """Files as of a retained version (only `paths` if given); None if the version is not retained"""
+        position = self._position(version)
+        if position is None:
+            return None
+
+        if paths is not None:
+            files = {}
+            for path in paths:
+                for entry in reversed(self.versions[:position + 1]):
+                    if path in entry.changes:
+                        if entry.changes[path] is not None:
+                            files[path] = entry.changes[path]
+                        break
+            return files
+
+        files = dict(self.versions[0].changes)
+        for entry in self.versions[1:position + 1]:
+            for path, file in entry.changes.items():
+                if file is None:
+                    files.pop(path, None)
+                else:
+                    files[path] = file
+        return files
+
+    def release(self) -> None:
+        """Drop every version's blob references (the project is being deleted)"""
+        for entry in self.versions:
+            for file in entry.changes.values():
+                if file is not None:
+                    self.blobs.release(file.hash)
+        self.versions = []
+
+    def _position(self, version: int) -> Optional[int]:
+        keys = [entry.version for entry in self.versions]
+        position = bisect.bisect_left(keys, version)
+        if position < len(keys) and keys[position] == version:
+            return position
+        return None
+
+    def _compact(self) -> None:
+        """Fold the oldest version into the next one, which becomes the full snapshot"""
+        oldest, successor = self.versions[0], self.versions[1]
+        snapshot = oldest.changes
+        for path, file in successor.changes.items():
+            previous = snapshot.pop(path, None)
+            if previous is not None:
+                self.blobs.release(previous.hash)
+            if file is not None:
+                snapshot[path] = file
+        # The successor's own change lists stay as they were for the version listing
+        successor.changes = snapshot
+        del self.versions[0]
@@ -0,0 +1,54 @@
+import os
+import sys
+
+# The app reads its configuration at import time: run it against the offline model and no Convex mirror
+os.environ.pop("GEMINI_API_KEY", None)
+os.environ.pop("PROFILE_TOKEN", None)
+os.environ["AI_BACKEND"] = "fake"
+os.environ["AI_FAKE_LATENCY"] = "0"
+os.environ["AI_FAKE_CHUNK_INTERVAL"] = "0"
+os.environ["CONVEX_PROJECT_SYNC"] = "false"
+os.environ["PROJECT_STORE"] = "memory"
+os.environ["REQUEST_LOG_SAMPLE_RATE"] = "0"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+from services.project_store import InMemoryProjectStore, SQLiteProjectStore  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    """An empty project store of each backend"""
+    if request.param == "memory":
+        project_store = InMemoryProjectStore(max_versions=5)
+    else:
+        project_store = SQLiteProjectStore(str(tmp_path / "projects.db"), max_versions=5)
+    yield project_store
+    project_store.close()
+
+
+@pytest.fixture
+async def client(store, monkeypatch):
+    """API client for the app, with the projects endpoints backed by `store`"""
+    import main
+    from endpoints import projects
+
+    monkeypatch.setattr(projects, "project_store", store)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as api:
+        yield api
+
+
+@pytest.fixture
+async def project_id(client):
+    """Id of a react-template project (App.js and index.js) created through the API"""
+    response = await client.post("/api/projects/create", json={"title": "Test", "user_clerk_id": "user-1"})
+    assert response.status_code == 200
+    return response.json()["id"]
@@ -0,0 +1,56 @@
+import json
+
+from services.ai_output_parser import parse_ai_output, strip_overlap
+
+PROJECT = {
+    "projectTitle": "Todo",
+    "explanation": "A todo list",
+    "files": {
+        "/App.js": {"code": "export default function App() { return \"{}\"; }"},
+        "/App.css": {"code": ".app { color: red; }"},
+    },
+    "generatedFiles": ["/App.js", "/App.css"],
+}
+TEXT = json.dumps(PROJECT, indent=2)
+
+
+def test_parses_complete_output():
+    output = parse_ai_output(TEXT)
+    assert output.complete
+    assert output.project_title == "Todo"
+    assert output.files == {path: file["code"] for path, file in PROJECT["files"].items()}
+
+
+def test_parses_output_inside_a_code_fence():
+    output = parse_ai_output(f"```json\n{TEXT}\n```")
+    assert output.complete
+    assert list(output.files) == ["/App.js", "/App.css"]
+
+
+def test_recovers_complete_files_from_truncated_output():
+    # Cut off in the middle of the second file
+    truncated = TEXT[:TEXT.index(".app {") + 3]
+    output = parse_ai_output(truncated)
+    assert output is not None
+    assert not output.complete
+    assert output.project_title == "Todo"
+    assert output.files == {"/App.js": PROJECT["files"]["/App.js"]["code"]}
+
+
+def test_returns_none_when_nothing_is_recoverable():
+    assert parse_ai_output("Sorry, I can't help with that.") is None
+    assert parse_ai_output('{"projectTitle": "Todo", "files": {"/App.js": {"co') is None
+
+
+def test_drops_malformed_file_entries():
+    output = parse_ai_output(json.dumps({"files": {"a.js": {"code": 1}, "b.js": "plain", "c.js": {"code": "ok"}}}))
+    assert output.files == {"b.js": "plain", "c.js": "ok"}
+    assert output.project_title == "Untitled Project"
+
+
+def test_strip_overlap_removes_repeated_text_and_fences():
+    previous = '{"files": {"/App.js": {"code": "export default function App() {'
+    continuation = '```json\nexport default function App() { return 1; }"}}}'
+    assert strip_overlap(previous, continuation) == ' return 1; }"}}}'
+    # Short coincidental matches are kept
+    assert strip_overlap("abc", "c and more") == "c and more"
@@ -0,0 +1,156 @@
+import asyncio
+
+import pytest
+from services.ai_scheduler import AIScheduler, SchedulerBusyError
+
+pytestmark = pytest.mark.anyio
+
+
+async def hold_slot(scheduler: AIScheduler, user_key: str, release: asyncio.Event, admitted: bool = False):
+    async with scheduler.slot(user_key, admitted):
+        await release.wait()
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def test_admits_up_to_max_in_flight_then_queues():
+    scheduler = AIScheduler(max_in_flight=2, max_queue_depth=10, max_queue_per_user=10)
+    release = asyncio.Event()
+    tasks = [asyncio.ensure_future(hold_slot(scheduler, f"user-{index}", release)) for index in range(3)]
+    await settle()
+
+    assert scheduler.stats()["in_flight"] == 2
+    assert scheduler.stats()["queued"] == 1
+    release.set()
+    await asyncio.gather(*tasks)
+    assert scheduler.stats()["in_flight"] == 0
+    assert scheduler.stats()["queued"] == 0
+
+
+async def test_rejects_with_429_over_the_per_user_queue_limit():
+    scheduler = AIScheduler(max_in_flight=1, max_queue_depth=10, max_queue_per_user=2)
+    release = asyncio.Event()
+    tasks = [asyncio.ensure_future(hold_slot(scheduler, "user-1", release)) for _ in range(3)]
+    await settle()
+
+    with pytest.raises(SchedulerBusyError) as busy:
+        await scheduler.acquire("user-1")
+    assert busy.value.status_code == 429
+
+    # Other users still get a place in the queue
+    tasks.append(asyncio.ensure_future(hold_slot(scheduler, "user-2", release)))
+    await settle()
+    assert scheduler.stats()["queued"] == 3
+    release.set()
+    await asyncio.gather(*tasks)
+
+
+async def test_rejects_with_503_when_the_queue_is_full():
+    scheduler = AIScheduler(max_in_flight=1, max_queue_depth=2, max_queue_per_user=10)
+    release = asyncio.Event()
+    tasks = [asyncio.ensure_future(hold_slot(scheduler, f"user-{index}", release)) for index in range(3)]
+    await settle()
+
+    with pytest.raises(SchedulerBusyError) as busy:
+        await scheduler.acquire("user-9")
+    assert busy.value.status_code == 503
+    release.set()
+    await asyncio.gather(*tasks)
+
+
+async def test_reserved_places_count_against_the_user_limit():
+    scheduler = AIScheduler(max_in_flight=1, max_queue_depth=10, max_queue_per_user=4)
+    release = asyncio.Event()
+    tasks = [asyncio.ensure_future(hold_slot(scheduler, "user-9", release))]
+    await settle()
+
+    async with scheduler.reserve("user-1", 3):
+        # One place is left for the user's other calls
+        tasks.append(asyncio.ensure_future(hold_slot(scheduler, "user-1", release)))
+        await settle()
+        with pytest.raises(SchedulerBusyError) as busy:
+            await scheduler.acquire("user-1")
+        assert busy.value.status_code == 429
+        with pytest.raises(SchedulerBusyError):
+            async with scheduler.reserve("user-1", 1):
+                pass
+
+        # Calls of the reserving request wait in its places instead of being rejected
+        tasks.extend(asyncio.ensure_future(hold_slot(scheduler, "user-1", release, admitted=True)) for _ in range(3))
+        await settle()
+        assert scheduler.stats()["queued"] == 4
+        assert scheduler.stats()["reserved"] == 0
+        release.set()
+        await asyncio.gather(*tasks)
+        assert scheduler.stats()["reserved"] == 3
+    assert scheduler.stats()["reserved"] == 0
+
+
+async def test_reservations_count_against_the_queue_depth():
+    scheduler = AIScheduler(max_in_flight=1, max_queue_depth=3, max_queue_per_user=10)
+    release = asyncio.Event()
+    holder = asyncio.ensure_future(hold_slot(scheduler, "user-1", release))
+    await settle()
+
+    async with scheduler.reserve("user-1", 3):
+        with pytest.raises(SchedulerBusyError) as busy:
+            await scheduler.acquire("user-2")
+        assert busy.value.status_code == 503
+    release.set()
+    await holder
+
+
+async def test_cancelled_reserved_waiter_gives_its_place_back():
+    scheduler = AIScheduler(max_in_flight=1, max_queue_depth=10, max_queue_per_user=10)
+    release = asyncio.Event()
+    holder = asyncio.ensure_future(hold_slot(scheduler, "user-1", release))
+    await settle()
+
+    async with scheduler.reserve("user-2", 2):
+        waiter = asyncio.ensure_future(hold_slot(scheduler, "user-2", release, admitted=True))
+        await settle()
+        assert scheduler.stats()["reserved"] == 1
+        waiter.cancel()
+        await settle()
+        assert scheduler.stats()["reserved"] == 2
+        assert scheduler.stats()["queued"] == 0
+    release.set()
+    await holder
+
+
+async def test_users_are_served_round_robin():
+    scheduler = AIScheduler(max_in_flight=1, max_queue_depth=10, max_queue_per_user=10)
+    order = []
+    gate = asyncio.Event()
+
+    async def call(user_key: str):
+        async with scheduler.slot(user_key):
+            order.append(user_key)
+            await gate.wait()
+
+    first = asyncio.ensure_future(call("busy"))
+    await settle()
+    tasks = [asyncio.ensure_future(call("busy")) for _ in range(3)] + [asyncio.ensure_future(call("quiet"))]
+    await settle()
+    gate.set()
+    await asyncio.gather(first, *tasks)
+    # The quiet user's single call is not stuck behind all of the busy user's queued calls
+    assert order.index("quiet") == 2
+
+
+async def test_cancelled_waiter_leaves_the_queue():
+    scheduler = AIScheduler(max_in_flight=1, max_queue_depth=10, max_queue_per_user=10)
+    release = asyncio.Event()
+    holder = asyncio.ensure_future(hold_slot(scheduler, "user-1", release))
+    waiter = asyncio.ensure_future(hold_slot(scheduler, "user-2", release))
+    await settle()
+
+    waiter.cancel()
+    await settle()
+    assert scheduler.stats()["queued"] == 0
+    release.set()
+    await holder
+    assert scheduler.stats()["in_flight"] == 0
@@ -0,0 +1,95 @@
+import json
+
+import httpx
+import pytest
+from services.convex_writer import ConvexBatchWriter
+
+pytestmark = pytest.mark.anyio
+
+
+def message(message_id: str, timestamp: str = "2026-01-01T00:00:00"):
+    return {"id": message_id, "content": "hi", "sender": "user", "timestamp": timestamp}
+
+
+def make_writer(handler) -> ConvexBatchWriter:
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://convex")
+    writer = ConvexBatchWriter(
+        convex_url="http://convex", client=client, max_batch_records=100, flush_interval=60, max_retries=1
+    )
+    writer.retry_backoff = 0
+    return writer
+
+
+def applied(request: httpx.Request) -> httpx.Response:
+    batches = json.loads(request.content)["args"]["batches"]
+    return httpx.Response(200, json={"value": [{"projectId": batch["projectId"], "applied": True} for batch in batches]})
+
+
+async def test_writes_are_batched_and_acked():
+    mutations = []
+
+    def handler(request):
+        mutations.append(json.loads(request.content))
+        return applied(request)
+
+    writer = make_writer(handler)
+    first = writer.enqueue("p1", "user-1", messages=[message("m1")])
+    second = writer.enqueue("p1", "user-1", files={"App.js": {"content": "x", "language": "javascript"}})
+    third = writer.enqueue("p2", "user-1", deleted_files=["old.js"])
+    await writer.flush()
+
+    assert await first is True and await second is True and await third is True
+    assert len(mutations) == 1
+    batches = {batch["projectId"]: batch for batch in mutations[0]["args"]["batches"]}
+    assert batches["p1"]["files"] == [{"path": "App.js", "content": "x", "language": "javascript"}]
+    assert batches["p2"]["deletedFiles"] == ["old.js"]
+    await writer.close()
+
+
+async def test_transient_failures_are_retried():
+    statuses = [503, 200]
+
+    def handler(request):
+        status = statuses.pop(0)
+        return applied(request) if status == 200 else httpx.Response(status, json={})
+
+    writer = make_writer(handler)
+    ack = writer.enqueue("p1", "user-1", messages=[message("m1")])
+    await writer.flush()
+
+    assert await ack is True
+    assert writer.stats()["mutations"] == 2
+    await writer.close()
+
+
+@pytest.mark.parametrize("response", [
+    httpx.Response(200, content=b"not json"),
+    httpx.Response(200, json={"value": [{"unexpected": True}]}),
+    httpx.Response(400, json={}),
+])
+async def test_failed_batch_fails_its_acks_and_later_batches_still_run(response):
+    def handler(request):
+        batches = json.loads(request.content)["args"]["batches"]
+        return response if batches[0]["projectId"] == "bad" else applied(request)
+
+    writer = make_writer(handler)
+    writer.max_batch_records = 1
+    bad = writer.enqueue("bad", "user-1", messages=[message("m1")])
+    good = writer.enqueue("good", "user-1", messages=[message("m2")])
+    await writer.flush()
+
+    with pytest.raises(Exception, match="Error writing to Convex"):
+        await bad
+    assert await good is True
+    assert writer.stats()["failed_records"] == 1
+    await writer.close()
+
+
+async def test_unencodable_batch_fails_its_acks():
+    writer = make_writer(applied)
+    ack = writer.enqueue("p1", "user-1", messages=[message("m1", timestamp="not a time")])
+    await writer.flush()
+
+    with pytest.raises(Exception, match="Error writing to Convex"):
+        await ack
+    await writer.close()
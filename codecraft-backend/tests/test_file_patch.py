@@ -0,0 +1,43 @@
+import pytest
+from services.file_patch import PatchError, apply_replace_range, apply_unified_diff, content_hash, make_unified_diff
+
+SOURCE = "line 1\nline 2\nline 3\nline 4\n"
+
+
+def test_replace_range():
+    assert apply_replace_range("hello world", 6, 11, "there") == "hello there"
+    assert apply_replace_range("abc", 3, 3, "d") == "abcd"
+    with pytest.raises(PatchError):
+        apply_replace_range("abc", 2, 5, "")
+    with pytest.raises(PatchError):
+        apply_replace_range("abc", 2, 1, "")
+
+
+def test_apply_unified_diff():
+    diff = "--- a/f\n+++ b/f\n@@ -2,2 +2,2 @@\n line 2\n-line 3\n+line three\n"
+    assert apply_unified_diff(SOURCE, diff) == "line 1\nline 2\nline three\nline 4\n"
+
+
+def test_apply_unified_diff_rejects_mismatched_context():
+    diff = "@@ -2,2 +2,2 @@\n line 2\n-line 9\n+line three\n"
+    with pytest.raises(PatchError):
+        apply_unified_diff(SOURCE, diff)
+    with pytest.raises(PatchError):
+        apply_unified_diff(SOURCE, "@@ nonsense\n")
+
+
+
+def test_content_hash_is_stable_and_distinct():
+    assert content_hash("a") == content_hash("a")
+    assert content_hash("a") != content_hash("b")
+
+
+@pytest.mark.parametrize("old, new", [
+    (SOURCE, SOURCE.replace("line 2", "second line")),
+    (SOURCE, "line 0\n" + SOURCE + "line 5"),
+    ("no newline", "no newline\nnow two"),
+    ("", "created\n"),
+    (SOURCE, ""),
+])
+def test_make_unified_diff_round_trips(old, new):
+    assert apply_unified_diff(old, make_unified_diff(old, new, "f.js")) == new
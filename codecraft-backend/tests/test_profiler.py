@@ -0,0 +1,31 @@
+import pytest
+from endpoints.admin import profiler
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_profiling_is_off_without_a_token(client, monkeypatch):
+    monkeypatch.setattr(profiler, "token", "")
+
+    response = await client.get("/api/projects/cache/stats", headers={"X-Profile": "1"})
+    assert response.status_code == 200
+    assert "x-profile-id" not in response.headers
+    assert (await client.get("/api/admin/profiles")).status_code == 404
+    assert (await client.get("/api/admin/profiles", headers={"X-Profile-Token": ""})).status_code == 404
+
+
+async def test_profiles_require_the_token(client, monkeypatch):
+    monkeypatch.setattr(profiler, "token", "secret")
+
+    response = await client.get("/api/projects/cache/stats", headers={"X-Profile": "wrong"})
+    assert "x-profile-id" not in response.headers
+    response = await client.get("/api/projects/cache/stats", headers={"X-Profile": "secret"})
+    profile_id = response.headers["x-profile-id"]
+
+    assert (await client.get("/api/admin/profiles")).status_code == 403
+    assert (await client.get("/api/admin/profiles", headers={"X-Profile-Token": "wrong"})).status_code == 403
+    listing = await client.get("/api/admin/profiles", headers={"X-Profile-Token": "secret"})
+    assert listing.status_code == 200
+    assert profile_id in [profile["id"] for profile in listing.json()]
+    response = await client.get(f"/api/admin/profiles/{profile_id}", headers={"X-Profile-Token": "secret"})
+    assert response.status_code == 200
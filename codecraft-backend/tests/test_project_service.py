@@ -0,0 +1,127 @@
+import asyncio
+import json
+
+import pytest
+from models.fake_model import FakeCodeBackend
+from models.project import GenerateCodeRequest
+from services.ai_scheduler import SchedulerBusyError
+from services.project_service import ProjectService
+
+pytestmark = pytest.mark.anyio
+
+PROJECT = json.dumps({
+    "projectTitle": "Todo",
+    "explanation": "A todo list",
+    "files": {"/App.js": {"code": "export default 1;"}, "/App.css": {"code": "body {}"}},
+    "generatedFiles": ["/App.js", "/App.css"],
+})
+PLAN = json.dumps({
+    "projectTitle": "Shop",
+    "explanation": "A shop",
+    "files": {"/A.js": {"spec": "a"}, "/B.js": {"spec": "b"}, "/C.js": {"spec": "c"}},
+})
+
+
+def group_fixture(path: str):
+    return {"match": f"Write only these files: {path}", "responses": [json.dumps({"files": {path: {"code": path}}})]}
+
+
+def make_service(fixtures, latency: float = 0.0) -> ProjectService:
+    service = ProjectService()
+    service.ai_model = FakeCodeBackend(fixtures=fixtures, latency=latency, chunk_interval=0)
+    return service
+
+
+async def test_truncated_generation_is_continued_and_stitched():
+    split = PROJECT.index("/App.css") + 3
+    service = make_service([{"match": "todo", "responses": [PROJECT[:split], PROJECT[split - 20:]]}])
+
+    response = await service.generate_code(GenerateCodeRequest(prompt="todo app", bypass_cache=True))
+    assert response.project_title == "Todo"
+    assert set(response.files) == {"/App.js", "/App.css"}
+    assert response.files["/App.css"]["code"] == "body {}"
+
+
+async def test_stream_reports_files_then_done():
+    service = make_service([{"match": "todo", "responses": [PROJECT]}])
+
+    events = [
+        event async for event in service.generate_code_stream(GenerateCodeRequest(prompt="todo app", bypass_cache=True))
+    ]
+    assert events[0] == {"event": "started"}
+    assert [event["name"] for event in events if event["event"] == "file"] == ["/App.js", "/App.css"]
+    assert events[-1]["event"] == "done"
+    assert events[-1]["response"]["generated_files"] == ["/App.js", "/App.css"]
+
+
+def planned_request(prompt: str = "shop") -> GenerateCodeRequest:
+    return GenerateCodeRequest(prompt=prompt, mode="planned", user_clerk_id="user-1", bypass_cache=True)
+
+
+async def test_planned_stream_is_rejected_before_it_starts():
+    service = make_service([{"match": "Plan the project", "responses": [PLAN]}])
+    service.scheduler.max_in_flight = 1
+    release = asyncio.Event()
+
+    async def hold():
+        async with service.scheduler.slot("user-1"):
+            await release.wait()
+
+    holders = [asyncio.ensure_future(hold()) for _ in range(service.scheduler.max_queue_per_user + 1)]
+    await asyncio.sleep(0)
+
+    events = service.generate_code_stream(planned_request())
+    with pytest.raises(SchedulerBusyError) as busy:
+        await events.__anext__()
+    assert busy.value.status_code == 429
+    release.set()
+    await asyncio.gather(*holders)
+
+
+async def test_overlapping_planned_generations_of_one_user_complete():
+    fixtures = [{"match": "Plan the project", "responses": [PLAN]}] + [group_fixture(path) for path in ("/A.js", "/B.js", "/C.js")]
+    service = make_service(fixtures, latency=0.01)
+    service.scheduler.max_in_flight = 1
+    # Room for both requests' reserved places and a call each
+    service.scheduler.max_queue_per_user = 2 * (service.planner.concurrency + 1)
+
+    async def run(prompt: str):
+        return [event async for event in service.generate_code_stream(planned_request(prompt))]
+
+    results = await asyncio.gather(run("shop one"), run("shop two"))
+    for events in results:
+        assert events[0] == {"event": "started"}
+        assert sorted(events[-1]["response"]["files"]) == ["/A.js", "/B.js", "/C.js"]
+
+
+async def test_planned_generation_is_rejected_while_the_users_places_are_reserved():
+    fixtures = [{"match": "Plan the project", "responses": [PLAN]}] + [group_fixture(path) for path in ("/A.js", "/B.js", "/C.js")]
+    service = make_service(fixtures, latency=0.01)
+    assert service.planner.concurrency < service.scheduler.max_queue_per_user
+
+    first = service.generate_code_stream(planned_request("shop one"))
+    assert await first.__anext__() == {"event": "started"}
+    second = service.generate_code_stream(planned_request("shop two"))
+    with pytest.raises(SchedulerBusyError) as busy:
+        await second.__anext__()
+    assert busy.value.status_code == 429
+
+    events = [event async for event in first]
+    assert sorted(events[-1]["response"]["files"]) == ["/A.js", "/B.js", "/C.js"]
+    assert service.scheduler.stats()["reserved"] == 0
+
+
+async def test_planned_calls_are_sent_without_the_seed_prompt():
+    fixtures = [{"match": "Plan the project", "responses": [PLAN]}] + [group_fixture(path) for path in ("/A.js", "/B.js", "/C.js")]
+    service = make_service(fixtures)
+    histories = []
+    send_message_async = service.ai_model.send_message_async
+
+    async def record(prompt, chat_session=None, generation_config=None):
+        histories.append(len(chat_session.history))
+        return await send_message_async(prompt, chat_session, generation_config)
+
+    service.ai_model.send_message_async = record
+    events = [event async for event in service.generate_code_stream(planned_request())]
+    assert sorted(events[-1]["response"]["files"]) == ["/A.js", "/B.js", "/C.js"]
+    assert histories == [0, 0, 0, 0]
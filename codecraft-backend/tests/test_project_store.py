@@ -0,0 +1,175 @@
+from datetime import datetime, timedelta
+
+import pytest
+from services.project_store import RevisionConflictError
+
+pytestmark = pytest.mark.anyio
+
+START = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def make_project(project_id: str, user_clerk_id: str = "user-1", created_at: datetime = START, files=None):
+    return {
+        "id": project_id,
+        "title": f"Project {project_id}",
+        "description": None,
+        "template": "react",
+        "files": files if files is not None else {
+            "App.js": {"name": "App.js", "content": "export default 1;\n", "language": "javascript"},
+            "App.css": {"name": "App.css", "content": "body {}\n", "language": "css"},
+        },
+        "chat_history": [
+            {"id": f"{project_id}-m1", "content": "hello", "sender": "user", "timestamp": created_at},
+        ],
+        "user_clerk_id": user_clerk_id,
+        "created_at": created_at,
+        "updated_at": created_at,
+    }
+
+
+def file(name: str, content: str, language: str = "javascript"):
+    return {"name": name, "content": content, "language": language}
+
+
+async def test_create_and_get_project(store):
+    await store.create_project(make_project("p1"))
+
+    project = await store.get_project("p1")
+    assert project["title"] == "Project p1"
+    assert project["revision"] == 1
+    assert project["files"]["App.js"]["content"] == "export default 1;\n"
+    assert project["files"]["App.css"]["language"] == "css"
+    assert [message["id"] for message in project["chat_history"]] == ["p1-m1"]
+    assert await store.get_project("missing") is None
+
+
+async def test_get_file(store):
+    await store.create_project(make_project("p1"))
+
+    assert (await store.get_file("p1", "App.js"))["content"] == "export default 1;\n"
+    assert await store.get_file("p1", "missing.js") is None
+    assert await store.get_file("missing", "App.js") is None
+
+
+async def test_apply_changes_bumps_revision(store):
+    await store.create_project(make_project("p1"))
+
+    revision = await store.apply_changes(
+        "p1", START + timedelta(minutes=1),
+        files={"App.js": file("App.js", "export default 2;\n"), "New.js": file("New.js", "new\n")},
+        deleted_files=["App.css"],
+        messages=[{"id": "m2", "content": "edit", "sender": "ai", "timestamp": START + timedelta(minutes=1)}],
+    )
+    assert revision == 2
+
+    project = await store.get_project("p1")
+    assert project["revision"] == 2
+    assert project["updated_at"] == START + timedelta(minutes=1)
+    assert set(project["files"]) == {"App.js", "New.js"}
+    assert project["files"]["App.js"]["content"] == "export default 2;\n"
+    assert [message["id"] for message in project["chat_history"]] == ["p1-m1", "m2"]
+
+
+async def test_apply_changes_to_missing_project(store):
+    assert await store.apply_changes("missing", START, files={"a.js": file("a.js", "x")}) is None
+
+
+async def test_conditional_write_conflict(store):
+    await store.create_project(make_project("p1"))
+    await store.apply_changes("p1", START, files={"App.js": file("App.js", "v2")}, expected_revision=1)
+
+    with pytest.raises(RevisionConflictError) as conflict:
+        await store.apply_changes("p1", START, files={"App.js": file("App.js", "stale")}, expected_revision=1)
+    assert conflict.value.current_revision == 2
+    assert (await store.get_file("p1", "App.js"))["content"] == "v2"
+
+
+async def test_list_user_projects_newest_first(store):
+    await store.create_project(make_project("p1"))
+    await store.create_project(make_project("p2", created_at=START + timedelta(minutes=1)))
+    await store.create_project(make_project("other", user_clerk_id="user-2"))
+
+    projects = await store.list_user_projects("user-1")
+    assert [project["id"] for project in projects] == ["p2", "p1"]
+    assert all(set(project["files"]) == {"App.js", "App.css"} for project in projects)
+    projects = await store.list_user_projects("user-1", include_files=False, include_chat=False)
+    assert [project["id"] for project in projects] == ["p2", "p1"]
+
+
+async def test_chat_page(store):
+    project = make_project("p1")
+    project["chat_history"] = [
+        {"id": f"m{index}", "content": str(index), "sender": "user", "timestamp": START + timedelta(seconds=index)}
+        for index in range(5)
+    ]
+    await store.create_project(project)
+
+    messages, total = await store.get_chat_page("p1", limit=2)
+    assert total == 5
+    assert [message["id"] for message in messages] == ["m3", "m4"]
+    messages, _ = await store.get_chat_page("p1", limit=2, before=3)
+    assert [message["id"] for message in messages] == ["m1", "m2"]
+    assert await store.get_chat_page("missing", limit=2) is None
+
+
+async def test_delete_project(store):
+    await store.create_project(make_project("p1"))
+
+    assert await store.delete_project("p1") is True
+    assert await store.get_project("p1") is None
+    assert await store.list_versions("p1") is None
+    assert await store.list_user_projects("user-1") == []
+    assert await store.delete_project("p1") is False
+
+
+async def test_user_project_summaries_are_paged_newest_first(store):
+    for index in range(5):
+        await store.create_project(make_project(f"p{index}", created_at=START + timedelta(minutes=index)))
+    await store.create_project(make_project("other", user_clerk_id="user-2"))
+    # Writing a project moves it to the front
+    await store.apply_changes("p0", START + timedelta(hours=1), files={"App.js": file("App.js", "x")})
+
+    page, cursor = await store.list_user_project_summaries("user-1", limit=3)
+    assert [summary["id"] for summary in page] == ["p0", "p4", "p3"]
+    assert page[0]["file_count"] == 2
+    page, cursor = await store.list_user_project_summaries("user-1", limit=3, cursor=cursor)
+    assert [summary["id"] for summary in page] == ["p2", "p1"]
+    assert cursor is None
+
+
+async def test_versions_record_only_real_changes(store):
+    await store.create_project(make_project("p1"))
+    await store.apply_changes("p1", START, files={"App.js": file("App.js", "v2")}, source="patch")
+    # Same content again: a new revision, but no new version
+    await store.apply_changes("p1", START, files={"App.js": file("App.js", "v2")})
+    await store.apply_changes("p1", START, deleted_files=["App.css"], source="chat")
+
+    versions = await store.list_versions("p1")
+    assert [(version["version"], version["source"]) for version in versions] == [
+        (4, "chat"), (2, "patch"), (1, "create")
+    ]
+    assert versions[0]["deleted_files"] == ["App.css"]
+    assert versions[1]["changed_files"] == ["App.js"]
+
+    first = await store.get_version_files("p1", 1)
+    assert first["App.js"]["content"] == "export default 1;\n"
+    assert set(first) == {"App.js", "App.css"}
+    assert set(await store.get_version_files("p1", 4)) == {"App.js"}
+    assert await store.get_version_files("p1", 3) is None
+    selected = await store.get_version_files("p1", 2, ["App.css", "missing.js"])
+    assert list(selected) == ["App.css"]
+    assert selected["App.css"]["content"] == "body {}\n"
+
+
+async def test_versions_are_compacted_beyond_the_limit(store):
+    await store.create_project(make_project("p1"))
+    for index in range(2, 9):
+        await store.apply_changes("p1", START, files={f"f{index}.js": file(f"f{index}.js", str(index))})
+
+    versions = await store.list_versions("p1")
+    assert [version["version"] for version in versions] == [8, 7, 6, 5, 4]
+    assert await store.get_version_files("p1", 3) is None
+    # The oldest retained version still holds every file that existed at that point
+    oldest = await store.get_version_files("p1", 4)
+    assert set(oldest) == {"App.js", "App.css", "f2.js", "f3.js", "f4.js"}
+    assert oldest["f3.js"]["content"] == "3"
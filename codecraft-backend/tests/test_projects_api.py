@@ -0,0 +1,209 @@
+import pytest
+from services.file_patch import content_hash
+
+pytestmark = pytest.mark.anyio
+
+APP_JS = "export default function App() {\n  return <div>Hello World</div>;\n}"
+
+
+async def patch(client, project_id, *operations, headers=None):
+    return await client.patch(
+        f"/api/projects/{project_id}/files", json={"operations": list(operations)}, headers=headers or {}
+    )
+
+
+async def test_create_get_and_delete(client, project_id):
+    response = await client.get(f"/api/projects/{project_id}")
+    assert response.status_code == 200
+    assert response.headers["etag"] == '"1"'
+    assert set(response.json()["files"]) == {"App.js", "index.js"}
+
+    response = await client.get(f"/api/projects/{project_id}", params={"fields": "id,title"})
+    assert response.json() == {"id": project_id, "title": "Test"}
+
+    response = await client.get("/api/projects/user/user-1")
+    assert [project["id"] for project in response.json()] == [project_id]
+    response = await client.get("/api/projects/user/user-1/summaries")
+    assert [summary["id"] for summary in response.json()["items"]] == [project_id]
+    assert (await client.get("/api/projects/user/user-1/summaries", params={"cursor": "bad"})).status_code == 400
+
+    assert (await client.delete(f"/api/projects/{project_id}")).status_code == 200
+    assert (await client.get(f"/api/projects/{project_id}")).status_code == 404
+    assert (await client.delete(f"/api/projects/{project_id}")).status_code == 404
+
+
+async def test_get_single_file(client, project_id):
+    response = await client.get(f"/api/projects/{project_id}/files/App.js")
+    assert response.status_code == 200
+    assert response.json()["content"] == APP_JS
+    assert (await client.get(f"/api/projects/{project_id}/files/missing.js")).status_code == 404
+    assert (await client.get("/api/projects/missing/files/App.js")).status_code == 404
+
+
+async def test_project_etag_revalidation(client, project_id):
+    response = await client.get(f"/api/projects/{project_id}", headers={"If-None-Match": '"1"'})
+    assert response.status_code == 304
+    assert response.headers["etag"] == '"1"'
+
+    await patch(client, project_id, {"op": "set", "path": "App.js", "text": "changed"})
+    response = await client.get(f"/api/projects/{project_id}", headers={"If-None-Match": '"1"'})
+    assert response.status_code == 200
+    assert response.headers["etag"] == '"2"'
+
+
+async def test_file_etag_is_the_content_hash(client, project_id):
+    response = await client.get(f"/api/projects/{project_id}/files/App.js")
+    assert response.json()["content"] == APP_JS
+    etag = response.headers["etag"]
+    assert etag == f'"{content_hash(APP_JS)}"'
+
+    response = await client.get(f"/api/projects/{project_id}/files/App.js", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+
+async def test_chat_history_page(client, project_id):
+    response = await client.get(f"/api/projects/{project_id}/chat")
+    assert response.json() == {"messages": [], "total": 0, "next_before": None}
+    assert (await client.get("/api/projects/missing/chat")).status_code == 404
+
+
+async def test_put_files_honours_if_match(client, project_id):
+    body = {"files": {"App.js": {"name": "App.js", "content": "v2", "language": "javascript"}}}
+
+    response = await client.put(f"/api/projects/{project_id}/files", json=body, headers={"If-Match": '"1"'})
+    assert response.status_code == 200
+    assert response.headers["etag"] == '"2"'
+    assert response.json()["files"]["App.js"]["content"] == "v2"
+
+    response = await client.put(f"/api/projects/{project_id}/files", json=body, headers={"If-Match": '"1"'})
+    assert response.status_code == 412
+    assert response.headers["etag"] == '"2"'
+
+    response = await client.put("/api/projects/missing/files", json=body)
+    assert response.status_code == 404
+
+
+async def test_patch_operations(client, project_id):
+    diff = "@@ -2,1 +2,1 @@\n-  return <div>Hello World</div>;\n+  return <div>Hi</div>;\n"
+    response = await patch(
+        client, project_id,
+        {"op": "set", "path": "styles.css", "text": "body {}"},
+        {"op": "replace_range", "path": "index.js", "start": 0, "end": 0, "text": "// entry\n"},
+        {"op": "unified_diff", "path": "App.js", "diff": diff},
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["revision"] == 2
+    assert body["file_hashes"]["styles.css"] == content_hash("body {}")
+    assert response.headers["etag"] == '"2"'
+
+    project = (await client.get(f"/api/projects/{project_id}")).json()
+    assert project["files"]["styles.css"]["language"] == "css"
+    assert project["files"]["index.js"]["content"].startswith("// entry\nimport React")
+    assert "Hi" in project["files"]["App.js"]["content"]
+    assert body["file_hashes"]["App.js"] == content_hash(project["files"]["App.js"]["content"])
+
+    response = await patch(client, project_id, {"op": "delete", "path": "styles.css"})
+    assert response.json()["file_hashes"] == {"styles.css": None}
+    assert (await client.get(f"/api/projects/{project_id}/files/styles.css")).status_code == 404
+
+
+async def test_patch_base_hash_conflict(client, project_id):
+    response = await patch(client, project_id, {"op": "set", "path": "App.js", "text": "x", "base_hash": "stale"})
+    assert response.status_code == 409
+
+    response = await patch(
+        client, project_id, {"op": "set", "path": "App.js", "text": "x", "base_hash": content_hash(APP_JS)}
+    )
+    assert response.status_code == 200
+
+
+async def test_patch_stale_if_match(client, project_id):
+    await patch(client, project_id, {"op": "set", "path": "App.js", "text": "v2"})
+
+    response = await patch(client, project_id, {"op": "set", "path": "App.js", "text": "v3"}, headers={"If-Match": '"1"'})
+    assert response.status_code == 412
+    assert response.headers["etag"] == '"2"'
+    assert (await client.get(f"/api/projects/{project_id}/files/App.js")).json()["content"] == "v2"
+
+    response = await patch(client, project_id, {"op": "set", "path": "App.js", "text": "v3"}, headers={"If-Match": "nope"})
+    assert response.status_code == 412
+
+
+@pytest.mark.parametrize("operation", [
+    {"op": "set", "path": "App.js", "content": "misnamed field"},
+    {"op": "set", "path": "App.js"},
+    {"op": "replace_range", "path": "App.js", "text": "no start"},
+    {"op": "unified_diff", "path": "App.js"},
+    {"op": "rename", "path": "App.js"},
+])
+async def test_patch_rejects_invalid_operations(client, project_id, operation):
+    response = await patch(client, project_id, operation)
+    assert response.status_code == 422
+    assert (await client.get(f"/api/projects/{project_id}/files/App.js")).json()["content"] == APP_JS
+
+
+async def test_patch_errors_leave_the_project_unchanged(client, project_id):
+    response = await patch(
+        client, project_id,
+        {"op": "set", "path": "new.js", "text": "x"},
+        {"op": "replace_range", "path": "App.js", "start": 0, "end": 10_000, "text": ""},
+    )
+    assert response.status_code == 422
+    assert (await patch(client, project_id, {"op": "delete", "path": "missing.js"})).status_code == 404
+    assert (await client.get(f"/api/projects/{project_id}")).headers["etag"] == '"1"'
+    assert (await client.get(f"/api/projects/{project_id}/files/new.js")).status_code == 404
+
+
+async def test_chat_updates_files_and_history(client, project_id):
+    response = await client.post(
+        f"/api/projects/{project_id}/chat", json={"message": "Add a sidebar", "project_id": project_id}
+    )
+    assert response.status_code == 200
+    assert response.json()["updated_files"]
+
+    project = (await client.get(f"/api/projects/{project_id}")).json()
+    assert [message["sender"] for message in project["chat_history"]] == ["user", "ai"]
+    assert project["chat_history"][0]["content"] == "Add a sidebar"
+
+
+async def test_chat_session_is_keyed_by_the_url_project(client, project_id):
+    from endpoints.projects import project_service
+
+    other = (await client.post("/api/projects/create", json={"title": "Other", "user_clerk_id": "user-1"})).json()["id"]
+    response = await client.post(f"/api/projects/{project_id}/chat", json={"message": "x", "project_id": other})
+    assert response.status_code == 400
+
+    response = await client.post(f"/api/projects/{project_id}/chat", json={"message": "x", "project_id": project_id})
+    assert response.status_code == 200
+    assert project_id in project_service.chat_sessions.sessions
+    assert other not in project_service.chat_sessions.sessions
+
+
+async def test_put_files_on_a_project_deleted_mid_request(client, store, project_id, monkeypatch):
+    async def deleted(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(store, "get_project", deleted)
+    body = {"files": {"App.js": {"name": "App.js", "content": "v2", "language": "javascript"}}}
+    response = await client.put(f"/api/projects/{project_id}/files", json=body)
+    assert response.status_code == 404
+
+
+async def test_chat_on_a_project_deleted_mid_request(client, store, project_id, monkeypatch):
+    from endpoints import projects
+
+    chat_with_ai = projects.project_service.chat_with_ai
+    mirrored = []
+
+    async def chat_then_delete(*args, **kwargs):
+        response = await chat_with_ai(*args, **kwargs)
+        await store.delete_project(project_id)
+        return response
+
+    monkeypatch.setattr(projects.project_service, "chat_with_ai", chat_then_delete)
+    monkeypatch.setattr(projects, "_mirror_to_convex", lambda *args, **kwargs: mirrored.append(args))
+    response = await client.post(f"/api/projects/{project_id}/chat", json={"message": "x", "project_id": project_id})
+    assert response.status_code == 404
+    assert mirrored == []
+    assert project_id not in projects.project_service.chat_sessions.sessions
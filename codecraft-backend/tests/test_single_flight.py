@@ -0,0 +1,97 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from models.user import UserCreate
+from services.single_flight import SingleFlight
+from services.user_service import ConvexUserService
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_concurrent_callers_share_one_call():
+    flights = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    results = await asyncio.gather(*(flights.do("key", fetch) for _ in range(5)))
+    assert results == [1] * 5
+    assert flights.stats() == {"calls": 1, "shared": 4, "in_flight": 0}
+    # Finished calls are not reused
+    assert await flights.do("key", fetch) == 2
+
+
+async def test_errors_reach_every_caller():
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream down")
+
+    results = await asyncio.gather(*(flights.do("key", fail) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+async def test_one_caller_leaving_does_not_cancel_the_others():
+    flights = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "value"
+
+    leaving = asyncio.ensure_future(flights.do("key", fetch))
+    staying = asyncio.ensure_future(flights.do("key", fetch))
+    await asyncio.sleep(0)
+    leaving.cancel()
+    assert await staying == "value"
+
+
+async def test_forgotten_calls_are_not_joined():
+    flights = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        call = calls
+        await asyncio.sleep(0.01)
+        return call
+
+    first = asyncio.ensure_future(flights.do("key", fetch))
+    await asyncio.sleep(0)
+    flights.forget("key")
+    second = await flights.do("key", fetch)
+    assert await first == 1
+    assert second == 2
+
+
+async def test_user_writes_only_stop_sharing_of_that_user():
+    requests = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests.append((body["path"], body["args"].get("clerkId")))
+        await asyncio.sleep(0.05)
+        user = {"_id": "id", "clerkId": body["args"].get("clerkId", "a"), "email": "a@example.com", "createdAt": 0, "updatedAt": 0}
+        return httpx.Response(200, json={"value": user})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://convex")
+    service = ConvexUserService(convex_url="http://convex", client=client)
+
+    before = [asyncio.ensure_future(service._query("users:getUserByClerkId", {"clerkId": clerk_id})) for clerk_id in "ab"]
+    await asyncio.sleep(0.01)
+    write = asyncio.ensure_future(service.create_or_update_user(UserCreate(clerk_id="a", email="a@example.com")))
+    await asyncio.sleep(0.01)
+    after = [asyncio.ensure_future(service._query("users:getUserByClerkId", {"clerkId": clerk_id})) for clerk_id in "ab"]
+    await asyncio.gather(*before, write, *after)
+    await client.aclose()
+
+    lookups = [clerk_id for path, clerk_id in requests if path == "users:getUserByClerkId"]
+    # "a" is fetched again after the write; the lookup of "b" is still shared
+    assert sorted(lookups) == ["a", "a", "b"]
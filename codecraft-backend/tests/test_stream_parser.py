@@ -0,0 +1,36 @@
+import json
+
+from services.stream_parser import IncrementalProjectParser
+
+PROJECT = {
+    "projectTitle": "Todo",
+    "explanation": "A todo list",
+    "files": {
+        "/App.js": {"code": "export default function App() { return \"{}\"; }"},
+        "/App.css": {"code": ".app { color: red; }"},
+    },
+    "generatedFiles": ["/App.js", "/App.css"],
+}
+TEXT = json.dumps(PROJECT, indent=2)
+
+
+def test_reports_entries_as_they_complete():
+    parser = IncrementalProjectParser()
+    events = []
+    for start in range(0, len(TEXT), 7):
+        events.extend(parser.feed(TEXT[start:start + 7]))
+
+    assert [(kind, name) for kind, name, _ in events] == [
+        ("field", "projectTitle"), ("field", "explanation"),
+        ("file", "/App.js"), ("file", "/App.css"), ("field", "generatedFiles"),
+    ]
+    assert parser.complete
+    assert parser.result["files"]["/App.css"] == PROJECT["files"]["/App.css"]
+
+
+def test_ignores_braces_and_escapes_in_strings():
+    parser = IncrementalProjectParser()
+    text = json.dumps({"files": {"a.js": {"code": "const s = \"}\\\"{\";"}}})
+    events = parser.feed(text)
+    assert events == [("file", "a.js", {"code": "const s = \"}\\\"{\";"})]
+    assert parser.complete
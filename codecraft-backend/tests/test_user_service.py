@@ -0,0 +1,58 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from models.user import UserCreate
+from services.user_service import ConvexUserService
+
+pytestmark = pytest.mark.anyio
+
+
+def make_service(users):
+    """User service backed by a fake Convex where writes take 10ms and reads answer 30ms after reading"""
+    async def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        clerk_id = body["args"]["clerkId"]
+        if body["path"] == "users:getUserByClerkId":
+            user = users.get(clerk_id)
+            await asyncio.sleep(0.03)
+            return httpx.Response(200, json={"value": user})
+        await asyncio.sleep(0.01)
+        if body["path"] == "users:deleteUser":
+            return httpx.Response(200, json={"value": {"success": users.pop(clerk_id, None) is not None}})
+        users[clerk_id] = {"_id": "id", "clerkId": clerk_id, "email": body["args"]["email"], "createdAt": 0, "updatedAt": 0}
+        return httpx.Response(200, json={"value": users[clerk_id]})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://convex")
+    return ConvexUserService(convex_url="http://convex", client=client)
+
+
+async def test_lookup_during_a_create_does_not_cache_the_missing_user():
+    service = make_service({})
+
+    write = asyncio.ensure_future(service.create_or_update_user(UserCreate(clerk_id="a", email="a@example.com")))
+    await asyncio.sleep(0.005)
+    # Reads the user before the write lands, but answers after it
+    lookup = await service.get_user_by_clerk_id("a")
+    await write
+    assert lookup["success"] is False
+
+    result = await service.get_user_by_clerk_id("a")
+    assert result["success"] is True
+    assert result["user"]["email"] == "a@example.com"
+    await service.close()
+
+
+async def test_lookup_during_a_delete_does_not_cache_the_deleted_user():
+    users = {"a": {"_id": "id", "clerkId": "a", "email": "a@example.com", "createdAt": 0, "updatedAt": 0}}
+    service = make_service(users)
+
+    write = asyncio.ensure_future(service.delete_user("a"))
+    await asyncio.sleep(0.005)
+    lookup = await service.get_user_by_clerk_id("a")
+    assert (await write)["success"] is True
+    assert lookup["success"] is True
+
+    assert (await service.get_user_by_clerk_id("a"))["success"] is False
+    await service.close()
@@ -0,0 +1,95 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def set_file(client, project_id, path, text):
+    response = await client.patch(
+        f"/api/projects/{project_id}/files", json={"operations": [{"op": "set", "path": path, "text": text}]}
+    )
+    assert response.status_code == 200
+    return response.json()["revision"]
+
+
+async def test_list_versions(client, project_id):
+    await set_file(client, project_id, "App.js", "v2\n")
+    await client.patch(f"/api/projects/{project_id}/files", json={"operations": [{"op": "delete", "path": "index.js"}]})
+
+    versions = (await client.get(f"/api/projects/{project_id}/versions")).json()
+    assert [(version["version"], version["source"]) for version in versions] == [
+        (3, "patch"), (2, "patch"), (1, "create")
+    ]
+    assert versions[0]["deleted_files"] == ["index.js"]
+    assert versions[1]["changed_files"] == ["App.js"]
+    assert (await client.get("/api/projects/missing/versions")).status_code == 404
+
+
+async def test_file_at_version(client, project_id):
+    await set_file(client, project_id, "App.js", "v2\n")
+
+    response = await client.get(f"/api/projects/{project_id}/versions/1/files/App.js")
+    assert response.status_code == 200
+    assert "Hello World" in response.json()["content"]
+    assert "immutable" in response.headers["cache-control"]
+    response = await client.get(f"/api/projects/{project_id}/versions/2/files/App.js")
+    assert response.json()["content"] == "v2\n"
+
+    assert (await client.get(f"/api/projects/{project_id}/versions/1/files/missing.js")).status_code == 404
+    assert (await client.get(f"/api/projects/{project_id}/versions/9/files/App.js")).status_code == 404
+
+
+async def test_diff_between_versions(client, project_id):
+    await set_file(client, project_id, "App.js", "line 1\nline 2\n")
+    await set_file(client, project_id, "App.js", "line 1\nline two\n")
+    await set_file(client, project_id, "new.css", "body {}\n")
+
+    diff = (await client.get(f"/api/projects/{project_id}/versions/diff", params={"from": 2, "to": 3})).json()
+    assert diff["from_version"] == 2 and diff["to_version"] == 3
+    assert [(entry["path"], entry["status"]) for entry in diff["files"]] == [("App.js", "modified")]
+    assert "-line 2\n+line two\n" in diff["files"][0]["diff"]
+
+    # Without `to` the diff runs against the current files
+    diff = (await client.get(f"/api/projects/{project_id}/versions/diff", params={"from": 3})).json()
+    assert diff["to_version"] is None
+    assert [(entry["path"], entry["status"]) for entry in diff["files"]] == [("new.css", "added")]
+
+    response = await client.get(f"/api/projects/{project_id}/versions/diff", params={"from": 9})
+    assert response.status_code == 404
+    response = await client.get(f"/api/projects/{project_id}/versions/diff", params={"from": 1, "to": 9})
+    assert response.status_code == 404
+
+
+async def test_restore_version(client, project_id):
+    original = (await client.get(f"/api/projects/{project_id}")).json()["files"]
+    await set_file(client, project_id, "App.js", "v2\n")
+    await set_file(client, project_id, "extra.js", "extra\n")
+
+    response = await client.post(f"/api/projects/{project_id}/versions/1/restore", headers={"If-Match": '"3"'})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["revision"] == 4
+    assert body["file_hashes"]["extra.js"] is None
+    assert set(body["file_hashes"]) == {"App.js", "extra.js"}
+    assert response.headers["etag"] == '"4"'
+
+    files = (await client.get(f"/api/projects/{project_id}")).json()["files"]
+    assert files == original
+    versions = (await client.get(f"/api/projects/{project_id}/versions")).json()
+    assert versions[0]["version"] == 4 and versions[0]["source"] == "restore"
+
+    # Restoring the state the project is already in writes nothing
+    response = await client.post(f"/api/projects/{project_id}/versions/1/restore")
+    assert response.status_code == 200
+    assert response.json()["revision"] == 4
+    assert response.json()["file_hashes"] == {}
+
+
+async def test_restore_honours_if_match(client, project_id):
+    await set_file(client, project_id, "App.js", "v2\n")
+
+    response = await client.post(f"/api/projects/{project_id}/versions/1/restore", headers={"If-Match": '"1"'})
+    assert response.status_code == 412
+    assert response.headers["etag"] == '"2"'
+    assert (await client.get(f"/api/projects/{project_id}/files/App.js")).json()["content"] == "v2\n"
+
+    assert (await client.post(f"/api/projects/{project_id}/versions/9/restore")).status_code == 404
@@ -199,6 +199,121 @@ export const addChatMessage = mutation({
   },
 });
 
+// Apply buffered chat messages and file changes for many backend projects in one mutation
+export const applyBatch = mutation({
+  args: {
+    batches: v.array(v.object({
+      projectId: v.string(),
+      userClerkId: v.string(),
+      title: v.optional(v.string()),
+      files: v.array(v.object({
+        path: v.string(),
+        content: v.string(),
+        language: v.string(),
+      })),
+      deletedFiles: v.array(v.string()),
+      messages: v.array(v.object({
+        messageId: v.string(),
+        role: v.union(v.literal("user"), v.literal("assistant")),
+        content: v.string(),
+        timestamp: v.number(),
+      })),
+    })),
+  },
+  handler: async (ctx, args) => {
+    const now = Date.now();
+    const results = [];
+
+    for (const batch of args.batches) {
+      const user = await ctx.db
+        .query("users")
+        .withIndex("by_clerk_id", (q) => q.eq("clerkId", batch.userClerkId))
+        .first();
+      let project = await ctx.db
+        .query("projects")
+        .withIndex("by_backend_id", (q) => q.eq("backendId", batch.projectId))
+        .first();
+
+      let projectId: Id<"projects">;
+      if (project) {
+        projectId = project._id;
+      } else if (user) {
+        projectId = await ctx.db.insert("projects", {
+          name: batch.title ?? "Untitled Project",
+          userId: user._id,
+          backendId: batch.projectId,
+          createdAt: now,
+          updatedAt: now,
+        });
+      } else {
+        // Projects are owned by users; skip writes for owners not synced to Convex yet
+        results.push({ projectId: batch.projectId, applied: false });
+        continue;
+      }
+
+      // Upsert files by path
+      for (const file of batch.files) {
+        const existing = await ctx.db
+          .query("projectFiles")
+          .withIndex("by_project_path", (q) => q.eq("projectId", projectId).eq("path", file.path))
+          .first();
+        if (existing) {
+          await ctx.db.patch(existing._id, {
+            content: file.content,
+            language: file.language,
+            updatedAt: now,
+          });
+        } else {
+          await ctx.db.insert("projectFiles", {
+            projectId,
+            path: file.path,
+            content: file.content,
+            language: file.language,
+            createdAt: now,
+            updatedAt: now,
+          });
+        }
+      }
+
+      for (const path of batch.deletedFiles) {
+        const existing = await ctx.db
+          .query("projectFiles")
+          .withIndex("by_project_path", (q) => q.eq("projectId", projectId).eq("path", path))
+          .first();
+        if (existing) {
+          await ctx.db.delete(existing._id);
+        }
+      }
+
+      // Insert messages that were not already written by an earlier attempt
+      for (const message of batch.messages) {
+        const existing = await ctx.db
+          .query("chatMessages")
+          .withIndex("by_message_id", (q) => q.eq("messageId", message.messageId))
+          .first();
+        if (!existing) {
+          await ctx.db.insert("chatMessages", {
+            projectId,
+            role: message.role,
+            content: message.content,
+            timestamp: message.timestamp,
+            userId: user?._id,
+            messageId: message.messageId,
+          });
+        }
+      }
+
+      await ctx.db.patch(projectId, {
+        updatedAt: now,
+        ...(batch.title !== undefined ? { name: batch.title } : {}),
+      });
+      results.push({ projectId: batch.projectId, applied: true });
+    }
+
+    return results;
+  },
+});
+
 // Delete a project
 export const deleteProject = mutation({
   args: { projectId: v.id("projects") },
@@ -18,11 +18,14 @@ export default defineSchema({
     name: v.string(),
     description: v.optional(v.string()),
     userId: v.id("users"),
+    // Id of the project in the backend store, for projects mirrored from the backend
+    backendId: v.optional(v.string()),
     createdAt: v.number(),
     updatedAt: v.number(),
   })
     .index("by_user", ["userId"])
-    .index("by_created_at", ["createdAt"]),
+    .index("by_created_at", ["createdAt"])
+    .index("by_backend_id", ["backendId"]),
 
   projectFiles: defineTable({
     projectId: v.id("projects"),
@@ -41,7 +44,10 @@ export default defineSchema({
     content: v.string(),
     timestamp: v.number(),
     userId: v.optional(v.id("users")),
+    // Backend message id, so retried batch writes do not duplicate messages
+    messageId: v.optional(v.string()),
   })
     .index("by_project", ["projectId"])
-    .index("by_project_timestamp", ["projectId", "timestamp"]),
+    .index("by_project_timestamp", ["projectId", "timestamp"])
+    .index("by_message_id", ["messageId"]),
 });
\ No newline at end of file
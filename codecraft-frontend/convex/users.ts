@@ -1,4 +1,5 @@
 import { v } from "convex/values";
+import { paginationOptsValidator } from "convex/server";
 import { mutation, query } from "./_generated/server";
 
 // Create or update user
@@ -9,6 +10,8 @@ export const createOrUpdateUser = mutation({
     firstName: v.optional(v.string()),
     lastName: v.optional(v.string()),
     imageUrl: v.optional(v.string()),
+    // Return the stored user document instead of its id
+    returnUser: v.optional(v.boolean()),
   },
   handler: async (ctx, args) => {
     const existingUser = await ctx.db
@@ -27,7 +30,7 @@ export const createOrUpdateUser = mutation({
         imageUrl: args.imageUrl,
         updatedAt: now,
       });
-      return existingUser._id;
+      return args.returnUser ? await ctx.db.get(existingUser._id) : existingUser._id;
     } else {
       // Create new user
       const userId = await ctx.db.insert("users", {
@@ -39,7 +42,7 @@ export const createOrUpdateUser = mutation({
         createdAt: now,
         updatedAt: now,
       });
-      return userId;
+      return args.returnUser ? await ctx.db.get(userId) : userId;
     }
   },
 });
@@ -73,6 +76,29 @@ export const getAllUsers = query({
   },
 });
 
+// Get one page of users (cursor pagination)
+export const listUsers = query({
+  args: { paginationOpts: paginationOptsValidator },
+  handler: async (ctx, args) => {
+    return await ctx.db.query("users").order("asc").paginate(args.paginationOpts);
+  },
+});
+
+// Get many users by Clerk ID; returns one entry (or null) per requested ID, in order
+export const getUsersByClerkIds = query({
+  args: { clerkIds: v.array(v.string()) },
+  handler: async (ctx, args) => {
+    return await Promise.all(
+      args.clerkIds.map((clerkId) =>
+        ctx.db
+          .query("users")
+          .withIndex("by_clerk_id", (q) => q.eq("clerkId", clerkId))
+          .first()
+      )
+    );
+  },
+});
+
 // Delete user
 export const deleteUser = mutation({
   args: { clerkId: v.string() },
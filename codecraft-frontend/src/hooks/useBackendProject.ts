@@ -1,5 +1,6 @@
 import { useState, useCallback } from 'react';
-import { backendApi, Project, ProjectFile, ChatMessage } from '@/services/backendApi';
+import { backendApi, BackendApiError, Project, ProjectFile, ChatMessage } from '@/services/backendApi';
+import { filePatchOperation } from '@/lib/filePatch';
 
 export interface UseBackendProjectReturn {
   currentProject: Project | null;
@@ -121,7 +122,9 @@ export function useBackendProject(): UseBackendProjectReturn {
               timestamp: chatResponse.timestamp
             }
           ],
-          updated_at: new Date().toISOString()
+          updated_at: new Date().toISOString(),
+          // The chat turn moved the project to a revision we have not seen; base hashes still guard each file
+          revision: undefined
         };
         setCurrentProject(updatedProject);
       } else {
@@ -140,6 +143,29 @@ export function useBackendProject(): UseBackendProjectReturn {
     setError(null);
 
     try {
+      if (currentProject?.id === projectId) {
+        // Only send files whose content actually changed
+        const changedFiles = files.filter(file => {
+          const existing = currentProject.files[file.name];
+          return !existing || existing.content !== file.content || existing.language !== file.language;
+        });
+        if (changedFiles.length === 0) {
+          return;
+        }
+
+        // Send only the edited range of each file, checked against the content and revision it was made on
+        const operations = await Promise.all(
+          changedFiles.map(file => filePatchOperation(currentProject.files[file.name], file))
+        );
+        const result = await backendApi.patchProjectFiles(projectId, operations, currentProject.revision);
+        const mergedFiles = { ...currentProject.files };
+        changedFiles.forEach(file => {
+          mergedFiles[file.name] = file;
+        });
+        setCurrentProject({ ...currentProject, files: mergedFiles, updated_at: result.updated_at, revision: result.revision });
+        return;
+      }
+
       // Convert array to object format expected by backend
       const filesObject: Record<string, ProjectFile> = {};
       files.forEach(file => {
@@ -149,11 +175,17 @@ export function useBackendProject(): UseBackendProjectReturn {
       const updatedProject = await backendApi.updateProjectFiles(projectId, filesObject);
       setCurrentProject(updatedProject);
     } catch (err) {
+      if (err instanceof BackendApiError && (err.status === 409 || err.status === 412)) {
+        // Someone else changed the project since it was loaded: show their version rather than overwrite it
+        await loadProject(projectId);
+        setError('The project was changed elsewhere and has been reloaded; please reapply your edits');
+        return;
+      }
       setError(err instanceof Error ? err.message : 'Failed to update files');
     } finally {
       setIsLoading(false);
     }
-  }, []);
+  }, [currentProject, loadProject]);
 
   const deleteProject = useCallback(async (projectId: string) => {
     setIsLoading(true);
@@ -0,0 +1,52 @@
+import type { FilePatchOperation, ProjectFile } from '@/services/backendApi';
+
+// SHA-256 hex digest of a file's content, the same value the backend uses for base_hash and file ETags
+export async function contentHash(content: string): Promise<string> {
+  const digest = await crypto.subtle.digest('SHA-256', new TextEncoder().encode(content));
+  return Array.from(new Uint8Array(digest), byte => byte.toString(16).padStart(2, '0')).join('');
+}
+
+// Smallest single range edit turning `before` into `after`. Offsets count code points,
+// like the backend's string indices, so surrogate pairs are never split.
+export function replacedRange(before: string, after: string): { start: number; end: number; text: string } {
+  const oldChars = Array.from(before);
+  const newChars = Array.from(after);
+
+  let prefix = 0;
+  while (prefix < oldChars.length && prefix < newChars.length && oldChars[prefix] === newChars[prefix]) {
+    prefix++;
+  }
+  let suffix = 0;
+  while (
+    suffix < oldChars.length - prefix &&
+    suffix < newChars.length - prefix &&
+    oldChars[oldChars.length - 1 - suffix] === newChars[newChars.length - 1 - suffix]
+  ) {
+    suffix++;
+  }
+
+  return {
+    start: prefix,
+    end: oldChars.length - suffix,
+    text: newChars.slice(prefix, newChars.length - suffix).join(''),
+  };
+}
+
+// Patch operation for one changed file: only the edited range, guarded by the hash of the
+// content it was made against, or the whole file when it is new
+export async function filePatchOperation(
+  existing: ProjectFile | undefined,
+  file: ProjectFile
+): Promise<FilePatchOperation> {
+  if (!existing) {
+    return { path: file.name, op: 'set', text: file.content, language: file.language };
+  }
+
+  return {
+    path: file.name,
+    op: 'replace_range',
+    ...replacedRange(existing.content, file.content),
+    base_hash: await contentHash(existing.content),
+    language: file.language,
+  };
+}
@@ -23,12 +23,14 @@ export interface Project {
   user_clerk_id: string;
   created_at: string;
   updated_at: string;
+  revision?: number; // from the ETag, sent back as If-Match on edits
 }
 
 export interface GenerateCodeRequest {
   prompt: string;
   project_id?: string;
   template?: string;
+  mode?: 'single' | 'planned';
 }
 
 export interface GenerateCodeResponse {
@@ -46,6 +48,23 @@ export interface CreateProjectRequest {
   initial_prompt?: string;
 }
 
+export interface FilePatchOperation {
+  path: string;
+  op: 'replace_range' | 'unified_diff' | 'set' | 'delete';
+  start?: number;
+  end?: number;
+  text?: string;
+  diff?: string;
+  base_hash?: string;
+  language?: string;
+}
+
+export interface ProjectFilesPatchResponse {
+  revision: number;
+  updated_at: string;
+  file_hashes: Record<string, string | null>;
+}
+
 export interface ChatRequest {
   message: string;
   project_id: string;
@@ -56,28 +75,53 @@ export interface ChatResponse {
   sender: string;
   timestamp: string;
   updated_files?: Record<string, ProjectFile>;
+  context_tokens?: number;
+  omitted_files?: string[];
+}
+
+export class BackendApiError extends Error {
+  constructor(message: string, public status: number) {
+    super(message);
+    this.name = 'BackendApiError';
+  }
+}
+
+// Project revision named by an ETag header such as "3"
+function revisionFromEtag(etag: string | null): number | undefined {
+  const match = etag?.match(/^(?:W\/)?"(\d+)"$/);
+  return match ? Number(match[1]) : undefined;
 }
 
 class BackendApiService {
-  private async request<T>(endpoint: string, options: RequestInit = {}): Promise<T> {
+  private async send(endpoint: string, options: RequestInit = {}): Promise<Response> {
     const url = `${BACKEND_URL}${endpoint}`;
     
     const response = await fetch(url, {
+      ...options,
       headers: {
         'Content-Type': 'application/json',
         ...options.headers,
       },
-      ...options,
     });
 
     if (!response.ok) {
       const errorData = await response.json().catch(() => ({ detail: 'Unknown error' }));
-      throw new Error(errorData.detail || `HTTP error! status: ${response.status}`);
+      throw new BackendApiError(errorData.detail || `HTTP error! status: ${response.status}`, response.status);
     }
 
+    return response;
+  }
+
+  private async request<T>(endpoint: string, options: RequestInit = {}): Promise<T> {
+    const response = await this.send(endpoint, options);
     return response.json();
   }
 
+  private async requestProject(endpoint: string, options: RequestInit = {}): Promise<Project> {
+    const response = await this.send(endpoint, options);
+    return { ...(await response.json()), revision: revisionFromEtag(response.headers.get('ETag')) };
+  }
+
   async generateCode(request: GenerateCodeRequest): Promise<GenerateCodeResponse> {
     return this.request<GenerateCodeResponse>('/api/projects/generate', {
       method: 'POST',
@@ -97,16 +141,29 @@ class BackendApiService {
   }
 
   async getProject(projectId: string): Promise<Project> {
-    return this.request<Project>(`/api/projects/${projectId}`);
+    return this.requestProject(`/api/projects/${projectId}`);
   }
 
   async updateProjectFiles(projectId: string, files: Record<string, ProjectFile>): Promise<Project> {
-    return this.request<Project>(`/api/projects/${projectId}/files`, {
+    return this.requestProject(`/api/projects/${projectId}/files`, {
       method: 'PUT',
       body: JSON.stringify({ files }),
     });
   }
 
+  // Fails with 412 if the project is no longer at `revision`, or 409 if a file no longer matches its base_hash
+  async patchProjectFiles(
+    projectId: string,
+    operations: FilePatchOperation[],
+    revision?: number
+  ): Promise<ProjectFilesPatchResponse> {
+    return this.request<ProjectFilesPatchResponse>(`/api/projects/${projectId}/files`, {
+      method: 'PATCH',
+      headers: revision !== undefined ? { 'If-Match': `"${revision}"` } : {},
+      body: JSON.stringify({ operations }),
+    });
+  }
+
   async chatWithProject(projectId: string, message: string): Promise<ChatResponse> {
     return this.request<ChatResponse>(`/api/projects/${projectId}/chat`, {
       method: 'POST',